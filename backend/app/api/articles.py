@@ -2,128 +2,154 @@
 Search API for Wikipedia articles
 """
 
-import time
 from logging import getLogger
 from typing import List
 
-import torch
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sentence_transformers import SentenceTransformer
-from sqlalchemy import func, or_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Query
 
-from .. import models, schemas
+from .. import schemas
+from ..common import metrics
+from ..common.concurrency import OverloadedError, SingleFlight, get_limiter
+from ..common.config_loader import load_config
 from ..common.log_setter import setup_logger
-from ..database import SessionLocal
+from ..database import AsyncSessionLocal
+from ..services import hybrid_search
+from ..services.hybrid_search import CANDIDATE_LIMIT
 
 # ========== Logging Config ==========
 logger = getLogger(__name__)
-logger = setup_logger(logger=logger, log_level="DEBUG")
+logger = setup_logger(logger=logger, config=load_config(layer="logger"))
 
 # ========== Constants ==========
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-logger.info(f"Using device: {DEVICE}")
-
+MAX_PAGE_SIZE = 50
+
+SEARCH_FIELDS = (
+    "id",
+    "wiki_id",
+    "title",
+    "summary",
+    "content",
+    "snippet",
+    "created_at",
+    "updated_at",
+)
+DEFAULT_FIELDS = ("id", "wiki_id", "title", "content", "created_at", "updated_at")
+# Returned with `snippet`: where the match is in it
+SNIPPET_MATCH_FIELDS = ("match_start", "match_length")
+DEFAULT_SNIPPET_FIELDS = ("id", "wiki_id", "title", "snippet", *SNIPPET_MATCH_FIELDS)
 
 # Create endpoint group independent from main.py
 router = APIRouter()
 
-# Load model
-model = SentenceTransformer(MODEL_NAME, device=DEVICE)
+# Coalesces identical in-flight searches / caps concurrent ones (per worker)
+search_flight = SingleFlight()
+search_limiter = get_limiter("search")
 
 
-def get_db():
+def parse_fields(fields: str | None, snippet: bool) -> List[str]:
     """
-    Dependency to get a SessionLocal object.
-
-    Yields a database session that should be used as a dependency
-    for endpoints that require database access. The session is
-    properly closed after it is no longer needed.
+    Parse comma-separated `fields` into a validated, ordered list of columns.
     """
+    if not fields:
+        return list(DEFAULT_SNIPPET_FIELDS if snippet else DEFAULT_FIELDS)
 
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in selected if f not in SEARCH_FIELDS]
+    if invalid or not selected:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid fields: {invalid}. Choose from {list(SEARCH_FIELDS)}",
+        )
 
-@router.get("/search", response_model=List[schemas.Article])
-# Response model = List[schemas.Article]:
-# This indicates that this API response is a list of Article schema object
-def search_articles(
+    # `snippet` field is meaningless without snippet mode and vice versa
+    if snippet and "snippet" not in selected:
+        selected.append("snippet")
+    if not snippet and "snippet" in selected:
+        selected.remove("snippet")
+    if snippet:
+        selected.extend(SNIPPET_MATCH_FIELDS)
+
+    return selected
+
+
+@router.get(
+    "/search",
+    response_model=List[schemas.ArticleSearchResult],
+    response_model_exclude_unset=True,
+)
+# Response model = List[schemas.ArticleSearchResult]:
+# This indicates that this API response is a list of (projected) Article objects
+async def search_articles(
     q: str = Query(..., min_length=2, description="Search query (2 < characters)"),
-    db: Session = Depends(get_db),  # Dependency injection
+    fields: str | None = Query(
+        None,
+        description=f"Comma-separated fields to return. Any of {', '.join(SEARCH_FIELDS)}",
+    ),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    offset: int = Query(
+        0, ge=0, lt=CANDIDATE_LIMIT, description="Number of results to skip"
+    ),
+    snippet: bool = Query(
+        False,
+        description="Return a plain-text window around the match, with the match's "
+        "offsets in it, instead of the full content",
+    ),
+    snippet_size: int = Query(
+        200, ge=20, le=2000, description="Snippet window size in characters"
+    ),
+    category: str | None = Query(
+        None,
+        description="Only return articles in this category or its subcategories",
+    ),
 ):
     """
     Perform a hybrid search using both keyword (pg_trgm) and semantic (pg_vector).
+    Exact title or redirect matches are answered (or boosted) first.
+
+    Identical concurrent searches share one execution, and executions are
+    capped by `concurrency.search` in config.yaml (429 / 503 when saturated).
     """
     logger.info("--- Search request received ---")
-    logger.info(f"Query: {q}")
+    logger.info("Query: %s", q)
 
-    # Stage 1: Keyword Search (limit to 100)
-    try:
-        logger.info("[Step 1/6] Starting keyword search (pg_trgm)...")
-        start_time = time.time()
-        trigram_similarity = func.greatest(
-            func.similarity(models.Article.title, q),
-            func.similarity(models.Article.content, q),
-        ).label("trigram_similarity")
-
-        candidates = (
-            db.query(models.Article.id)  # get only ID for faster query
-            .filter(
-                or_(models.Article.title.op("%")(q), models.Article.content.op("%")(q))
-            )
-            .order_by(trigram_similarity.desc())
-            .limit(100)
-            .all()
-        )
+    selected_fields = parse_fields(fields, snippet)
 
-        candidate_ids = [article_id for article_id, in candidates]
+    metrics.SEARCH_REQUESTS_TOTAL.inc()
 
-        logger.info(
-            f"[Step 2/6] Keyword search found {len(candidate_ids)} candidates \
-                in {time.time() - start_time:.2f} seconds."
-        )
-        if not candidate_ids:
-            logger.warning("Keyword search returned no results")
-            return []
+    q = " ".join(q.split())
+    options = {
+        "limit": limit,
+        "offset": offset,
+        "include_content": "content" in selected_fields,
+        "snippet_size": snippet_size if snippet else 0,
+        "category": category,
+    }
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error during keword search stage: {e}"
-        )
+    async def run_search():
+        # Own session: the search may outlive the request that started it
+        async with search_limiter, AsyncSessionLocal() as db:
+            # Exact title / redirect fast path, then keyword search (pg_trgm) +
+            # semantic re-ranking (pg_vector, or the in-process ANN sidecar)
+            return await hybrid_search.search(db, q, **options)
 
-    # Stage 2: Semantic Search (limit to 10)
+    key = (q, *options.values())
     try:
-        logger.info("[Step 3/6] Vectorizing query...")
-        start_time = time.time()
+        if search_flight.in_flight(key):
+            metrics.SEARCH_COALESCED_TOTAL.inc()
+        rows = await search_flight.do(key, run_search)
 
-        query_vector = model.encode(q, convert_to_tensor=False, device=DEVICE)
-        logger.info(
-            f"[Step 4/6] Query vectorized successfully in {time.time() - start_time:.2f} seconds."
-        )
+    except OverloadedError as e:
+        metrics.ADMISSION_REJECTED_TOTAL.labels(
+            endpoint="search", reason=e.reason
+        ).inc()
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
 
-        # Usin l2_distance (<->) to sort by similarity
-        logger.info("[Step 5/6] Starting semantic search (pg_vector re-ranking)...")
-        start_time = time.time()
-        final_articles = (
-            db.query(models.Article)
-            .filter(models.Article.id.in_(candidate_ids))
-            .order_by(models.Article.content_vector.l2_distance(query_vector))
-            .limit(10)
-            .all()
-        )
+    except Exception as e:
+        metrics.ERRORS_TOTAL.labels(endpoint="search", stage="search").inc()
+        raise HTTPException(status_code=500, detail=f"Error during search: {e}")
 
-        logger.info(
-            f"[Step 6/6] Semantic search complete in \
-                {time.time() - start_time:.2f} seconds. Returning results."
-        )
-        return final_articles
+    if not rows:
+        logger.warning("Hybrid search returned no results")
+        return []
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error during semantic search stage: {e}"
-        )
+    return [{field: row[field] for field in selected_fields} for row in rows]
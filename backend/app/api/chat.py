@@ -2,120 +2,519 @@
 Process conversation between user and Dify.
 """
 
+import base64
+import binascii
+import contextlib
+import json
 import time
+from datetime import datetime, timezone
 from logging import getLogger
+from typing import Any, AsyncIterator, Callable, Dict
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exists, func, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
 from .. import models, schemas
+from ..common import metrics
+from ..common.concurrency import AdmissionLimiter, OverloadedError, get_limiter
+from ..common.config_loader import load_config
 from ..common.log_setter import setup_logger
-from ..database import SessionLocal
-from ..services.dify_client import DifyClient
+from ..common.ttl_cache import TTLCache
+from ..database import AsyncSessionLocal, get_async_db
+from ..services import chat_writer, semantic_cache
+from ..services.dify_client import (
+    ANSWER_EVENTS,
+    DifyError,
+    DifyUnavailableError,
+    get_dify_client,
+)
 
 logger = getLogger(__name__)
-logger = setup_logger(logger=logger, log_level="DEBUG")
+logger = setup_logger(logger=logger, config=load_config(layer="logger"))
+
+# ========== Config ==========
+config = load_config().get("chat") or {}
+
+# ========== Constants ==========
+MAX_HISTORY_PAGE_SIZE = 100
 
 # Create independent endpoint group
 router = APIRouter()
 
+# Caps concurrent Dify calls per worker (`concurrency.chat` in config.yaml)
+chat_limiter = get_limiter("chat")
+
+# session_id -> Dify conversation_id, written through on every saved turn.
+# A session keeps its conversation, so entries never go stale; sessions
+# without a conversation yet are not cached.
+conversation_cache = TTLCache(
+    maxsize=(config.get("conversation_cache") or {}).get("maxsize", 10000),
+    ttl=(config.get("conversation_cache") or {}).get("ttl", 3600),
+)
+
+
+# Sessions answered from the semantic cache (no Dify conversation yet), so
+# their next turn skips the cache even before a write-behind flush
+cache_answered_sessions = TTLCache(
+    maxsize=(config.get("conversation_cache") or {}).get("maxsize", 10000),
+    ttl=(config.get("conversation_cache") or {}).get("ttl", 3600),
+)
+
+
+async def get_conversation_id(db: AsyncSession, session_id: str) -> str | None:
+    """Dify conversation_id of the latest assistant message in the session"""
+    conversation_id = conversation_cache.get(session_id)
+    if conversation_id is not None:
+        metrics.CONVERSATION_CACHE_HITS.inc()
+        return conversation_id
+
+    metrics.CONVERSATION_CACHE_MISSES.inc()
+    # Served by the (session_id, role, created_at) index
+    conversation_id = await db.scalar(
+        select(models.ChatMessage.dify_conversation_id)
+        .filter(models.ChatMessage.session_id == session_id)
+        .filter(models.ChatMessage.role == "assistant")
+        .order_by(models.ChatMessage.created_at.desc())
+        .limit(1)
+    )
+
+    if conversation_id:
+        conversation_cache.set(session_id, conversation_id)
+    return conversation_id or None
 
-def get_db():
+
+async def is_first_turn(db: AsyncSession, session_id: str) -> bool:
+    """Whether the session has no saved (or queued) message yet"""
+    if cache_answered_sessions.get(session_id):
+        return False
+    # Served by the (session_id, role, created_at) index
+    return not await db.scalar(
+        select(exists().where(models.ChatMessage.session_id == session_id))
+    )
+
+
+async def save_turn(
+    session_id: str,
+    user_query: str,
+    answer: str,
+    conversation_id: str | None,
+    asked_at: datetime,
+) -> schemas.ChatMessage:
+    """
+    Save the user message and the assistant answer of one turn, or hand
+    them to the write-behind writer (`chat.persistence` in config.yaml).
+    Uses its own session: the request-scoped one is gone once streaming starts.
     """
-    Dependency to get a SessionLocal object.
+    rows = [
+        {
+            "session_id": session_id,
+            "role": "user",
+            "content": user_query,
+            "created_at": asked_at,
+        },
+        {
+            "session_id": session_id,
+            "role": "assistant",
+            "content": answer,
+            "dify_conversation_id": conversation_id,
+            "created_at": datetime.now(timezone.utc),
+        },
+    ]
+
+    # Before the write: the next turn must not depend on it being flushed
+    if conversation_id:
+        conversation_cache.set(session_id, conversation_id)
+
+    writer = chat_writer.get_writer()
+    if writer is not None and await writer.put(rows):
+        return schemas.ChatMessage.model_validate(rows[1])
+
+    async with AsyncSessionLocal() as db:
+        user_message, assistant_message = (models.ChatMessage(**row) for row in rows)
+        db.add_all([user_message, assistant_message])
+
+        with metrics.CHAT_COMMIT_SECONDS.time():
+            await db.commit()
+
+        return schemas.ChatMessage.model_validate(assistant_message)
+
+
+def to_sse(data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events message"""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    Yields a database session that should be used as a dependency
-    for endpoints that require database access. The session is
-    properly closed after it is no longer needed.
+
+async def lookup_cached_answer(
+    request: schemas.ChatRequest, first_turn: bool
+) -> tuple[str | None, Any]:
+    """
+    Semantic cache lookup for the first message of a session. Later turns
+    never use it, even when the session has no Dify conversation because
+    its first answer came from the cache: a follow-up such as "tell me
+    more" could match another user's answer.
+
+    Returns:
+        tuple[str | None, Any]: (cached answer, query vector to store the
+            fresh answer under on a miss; None when not cacheable)
     """
+    if not first_turn or request.bypass_cache:
+        return None, None
+
+    query_vector = await semantic_cache.embed(request.query)
+    if query_vector is None:
+        return None, None
+
+    return semantic_cache.get_answer(query_vector), query_vector
+
+
+async def save_cached_turn(
+    session_id: str, user_query: str, answer: str, asked_at: datetime
+) -> schemas.ChatMessage:
+    """Save a turn answered from the semantic cache (it has no conversation)"""
+    cache_answered_sessions.set(session_id, True)
+    return await save_turn(session_id, user_query, answer, None, asked_at)
+
+
+async def stream_cached_answer(
+    session_id: str, user_query: str, answer: str, asked_at: datetime
+) -> AsyncIterator[str]:
+    """Replay a cached answer as one `message` event and save the turn"""
+    yield to_sse({"event": "message", "answer": answer})
+    message = await save_cached_turn(session_id, user_query, answer, asked_at)
+    yield to_sse({"event": "message_end", **message.model_dump(mode="json")})
+
+
+def release_once(limiter: AdmissionLimiter) -> Callable[[], None]:
+    """Releases a held `limiter` slot; later calls do nothing"""
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            limiter.release()
 
-    db = SessionLocal()
+    return release
+
+
+async def release_when_done(
+    stream: AsyncIterator[str], release: Callable[[], None]
+) -> AsyncIterator[str]:
+    """Pass `stream` through, then release the limiter slot it holds"""
     try:
-        yield db
+        async with contextlib.aclosing(stream) as chunks:
+            async for chunk in chunks:
+                yield chunk
     finally:
-        db.close
+        release()
+
+
+async def relay_dify_stream(
+    session_id: str,
+    user_query: str,
+    conversation_id: str | None,
+    query_vector: Any = None,
+) -> AsyncIterator[str]:
+    """
+    Relay Dify answer chunks as SSE as they arrive, then save the turn
+    on `message_end`. Emits `message` / `message_end` / `error` events.
+    The answer is added to the semantic cache when `query_vector` is given.
+    """
+    asked_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    answer = []
+    error_message = "Failed to get response from Dify"
+
+    stream = get_dify_client().stream_chat(
+        user_input=user_query,
+        user_id=session_id,
+        conversation_id=conversation_id,
+    )
+
+    try:
+        # aclosing: release the Dify connection as soon as we stop reading
+        async with contextlib.aclosing(stream) as events:
+            async for data in events:
+                event = data.get("event")
+
+                if event in ANSWER_EVENTS and data.get("answer"):
+                    if not answer:
+                        metrics.CHAT_FIRST_TOKEN_SECONDS.observe(
+                            time.perf_counter() - started
+                        )
+                    answer.append(data["answer"])
+                    yield to_sse({"event": "message", "answer": data["answer"]})
+
+                elif event == "message_end":
+                    metrics.DIFY_REQUEST_SECONDS.observe(time.perf_counter() - started)
+                    if query_vector is not None and answer:
+                        semantic_cache.put_answer(
+                            query_vector, user_query, "".join(answer)
+                        )
+                    message = await save_turn(
+                        session_id,
+                        user_query,
+                        "".join(answer),
+                        data.get("conversation_id") or conversation_id,
+                        asked_at,
+                    )
+                    yield to_sse(
+                        {"event": "message_end", **message.model_dump(mode="json")}
+                    )
+                    return
+
+                elif event == "error":
+                    logger.error(f"Dify stream error: {data}")
+                    break
+
+    except DifyUnavailableError as e:
+        logger.error(f"Dify is unavailable: {e}")
+        error_message = "Dify is temporarily unavailable"
+
+    except DifyError as e:
+        logger.error(f"Error calling Dify API: {e}")
+
+    # Stream failed or ended without `message_end`: nothing is saved
+    metrics.ERRORS_TOTAL.labels(endpoint="chat_stream", stage="dify").inc()
+    yield to_sse({"event": "error", "message": error_message})
 
 
 @router.post("/", response_model=schemas.ChatMessage)
-def handle_chat_message(request: schemas.ChatRequest, db: Session = Depends(get_db)):
+async def handle_chat_message(
+    request: schemas.ChatRequest, db: AsyncSession = Depends(get_async_db)
+):
     """
     Recieve message from user, talk with Dify,
     and save conversation to DB
     """
     logger.info("--- Chat request received ---")
-    logger.info(f"Session ID: {request.session_id}, Query: '{request.query}'")
+    logger.info("Session ID: %s, Query: '%s'", request.session_id, request.query)
 
     session_id = request.session_id
     user_query = request.query
 
     # 1. Get conversation_id from the latest history of th session
-    last_assisant_message = (
-        db.query(models.ChatMessage)
-        .filter(models.ChatMessage.session_id == session_id)
-        .filter(models.ChatMessage.role == "assistant")
-        .order_by(models.ChatMessage.created_at.desc())
-        .first()
+    conversation_id_for_dify = await get_conversation_id(db, session_id)
+    first_turn = conversation_id_for_dify is None and (
+        semantic_cache.is_enabled() and await is_first_turn(db, session_id)
     )
 
-    conversation_id_for_dify = (
-        last_assisant_message.dify_conversation_id
-        if last_assisant_message and last_assisant_message.dify_conversation_id
-        else None
-    )
+    # Release the pooled connection while waiting on Dify
+    await db.close()
 
     if conversation_id_for_dify:
         logger.debug(
-            f"Continuing conversation. Dify conversation_id: {conversation_id_for_dify}"
+            "Continuing conversation. Dify conversation_id: %s",
+            conversation_id_for_dify,
         )
     else:
         logger.debug("Starting new conversation.")
 
-    # 2. Save user message to DB
-    user_message = models.ChatMessage(
-        session_id=session_id, role="user", content=user_query
-    )
-    db.add(user_message)
+    # 2. The user message is saved together with the answer
+    asked_at = datetime.now(timezone.utc)
 
-    # 3. Call Dify client
-    dify_client = DifyClient()
+    # Near-duplicate of a recently answered first question: skip Dify
+    cached_answer, query_vector = await lookup_cached_answer(request, first_turn)
+    if cached_answer is not None:
+        logger.debug("Answered from the semantic cache.")
+        return await save_cached_turn(session_id, user_query, cached_answer, asked_at)
 
+    # 3. Call Dify client
     logger.debug("Calling DifyClient.chat()... This may take a while.")
-    start_time = time.time()
 
-    assistant_response_content, new_conversation_id = dify_client.chat(
-        user_input=user_query,
-        user_id=session_id,
-        conversation_id=conversation_id_for_dify,
-    )
+    try:
+        async with chat_limiter:
+            with metrics.DIFY_REQUEST_SECONDS.time():
+                (
+                    assistant_response_content,
+                    new_conversation_id,
+                ) = await get_dify_client().chat(
+                    user_input=user_query,
+                    user_id=session_id,
+                    conversation_id=conversation_id_for_dify,
+                )
+    except OverloadedError as e:
+        metrics.ADMISSION_REJECTED_TOTAL.labels(endpoint="chat", reason=e.reason).inc()
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except DifyUnavailableError as e:
+        metrics.ERRORS_TOTAL.labels(endpoint="chat", stage="dify").inc()
+        logger.error(f"Dify is unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Dify is temporarily unavailable")
+    except DifyError as e:
+        logger.error(f"Error calling Dify API: {e}")
+        assistant_response_content, new_conversation_id = None, None
 
-    end_time = time.time()
-    logger.debug(f"DifyClient.chat() finished in {end_time - start_time:.2f} seconds.")
-    logger.debug(f"Response from Dify client (content): '{assistant_response_content}'")
+    # Lazy %-formatting: nothing is rendered unless DEBUG is enabled (and sampled)
+    logger.debug(
+        "Response from Dify client (content): '%s'", assistant_response_content
+    )
     logger.debug(
-        f"Response from Dify client (new_conversation_id): {new_conversation_id}"
+        "Response from Dify client (new_conversation_id): %s", new_conversation_id
     )
 
     if not assistant_response_content:
-        db.rollback()
-        logger.error(
-            "Assistant response content is empty. Rolling back and raising HTTPException."
-        )
+        metrics.ERRORS_TOTAL.labels(endpoint="chat", stage="dify").inc()
+        logger.error("Assistant response content is empty. Raising HTTPException.")
         raise HTTPException(status_code=500, detail="Failed to get response from Dify")
 
-    # 4. Save response from Dify to db as object
-    assistant_message = models.ChatMessage(
-        session_id=session_id,
-        role="assistant",
-        content=assistant_response_content,
-        dify_conversation_id=(
-            new_conversation_id if new_conversation_id else conversation_id_for_dify
-        ),
+    if query_vector is not None:
+        semantic_cache.put_answer(query_vector, user_query, assistant_response_content)
+
+    # 4. Save the turn (or queue it in write-behind mode) and
+    # return response to frontend
+    return await save_turn(
+        session_id,
+        user_query,
+        assistant_response_content,
+        new_conversation_id if new_conversation_id else conversation_id_for_dify,
+        asked_at,
     )
-    db.add(assistant_message)
 
-    # 5. Commit and refresh
-    db.commit()
-    db.refresh(assistant_message)
 
-    # 4. Return response to frontend
-    return schemas.ChatMessage.model_validate(assistant_message)
+@router.post("/stream")
+async def handle_chat_stream(
+    request: schemas.ChatRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Same as `handle_chat_message`, but streams the answer as Server-Sent
+    Events while Dify generates it. The turn is saved once it is complete.
+    """
+    logger.info("--- Chat stream request received ---")
+    logger.info("Session ID: %s, Query: '%s'", request.session_id, request.query)
+
+    conversation_id_for_dify = await get_conversation_id(db, request.session_id)
+    first_turn = conversation_id_for_dify is None and (
+        semantic_cache.is_enabled() and await is_first_turn(db, request.session_id)
+    )
+
+    # Release the pooled connection before streaming
+    await db.close()
+
+    cached_answer, query_vector = await lookup_cached_answer(request, first_turn)
+    background = None
+    if cached_answer is not None:
+        stream = stream_cached_answer(
+            request.session_id,
+            request.query,
+            cached_answer,
+            datetime.now(timezone.utc),
+        )
+    else:
+        # Hold a Dify slot for the whole stream (released when it ends).
+        # Acquired here so an overload is still a 429, not a broken stream
+        try:
+            await chat_limiter.acquire()
+        except OverloadedError as e:
+            metrics.ADMISSION_REJECTED_TOTAL.labels(
+                endpoint="chat_stream", reason=e.reason
+            ).inc()
+            raise HTTPException(
+                status_code=e.status_code, detail=str(e), headers=e.headers
+            )
+        release = release_once(chat_limiter)
+        stream = release_when_done(
+            relay_dify_stream(
+                request.session_id,
+                request.query,
+                conversation_id_for_dify,
+                query_vector,
+            ),
+            release,
+        )
+        # The generator's finally never runs if the client leaves before
+        # the body is started; the background task releases the slot then
+        background = BackgroundTask(release)
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        background=background,
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    """Opaque keyset cursor for the position of a message"""
+    raw = json.dumps([created_at.isoformat(), message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid cursor: {e}")
+
+
+@router.get("/{session_id}/messages", response_model=schemas.ChatHistoryPage)
+async def get_chat_history(
+    session_id: str,
+    limit: int = Query(
+        20, ge=1, le=MAX_HISTORY_PAGE_SIZE, description="Messages per page"
+    ),
+    before: str | None = Query(
+        None, description="`next_cursor` of the previous page (older messages)"
+    ),
+    max_chars: int | None = Query(
+        None, ge=1, description="Truncate each message to this many characters"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    A session's messages, newest first, with keyset pagination on
+    (created_at, id): every page is an index seek on
+    (session_id, created_at, id) plus limit + 1 heap fetches, however long
+    the history is.
+    """
+    message = models.ChatMessage
+    content = message.content
+    truncated = literal(False)
+    if max_chars is not None:
+        # Cut in Postgres so long answers are not transferred
+        content = func.left(message.content, max_chars)
+        truncated = func.length(message.content) > max_chars
+
+    query = (
+        select(
+            message.id,
+            message.role,
+            content.label("content"),
+            message.created_at,
+            truncated.label("truncated"),
+        )
+        .filter(message.session_id == session_id)
+        .order_by(message.created_at.desc(), message.id.desc())
+        # One extra row tells whether there is another page
+        .limit(limit + 1)
+    )
+    if before is not None:
+        created_at, message_id = decode_cursor(before)
+        query = query.filter(
+            tuple_(message.created_at, message.id) < tuple_(created_at, message_id)
+        )
+
+    rows = (await db.execute(query)).all()
+    page = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
+    return schemas.ChatHistoryPage(
+        messages=[
+            schemas.ChatHistoryMessage(
+                id=row.id,
+                role=row.role,
+                content=row.content,
+                truncated=row.truncated,
+                created_at=row.created_at,
+            )
+            for row in page
+        ],
+        next_cursor=next_cursor,
+    )
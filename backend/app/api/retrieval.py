@@ -0,0 +1,226 @@
+"""
+Dify External Knowledge API.
+
+Lets Dify use the Wikipedia articles as an external knowledge base, so
+retrieval runs on our hybrid search instead of a copy indexed by Dify.
+Register `http://<api host>/api/knowledge` as the endpoint and
+RETRIEVAL_API_KEY as the API key in Dify.
+
+knowledge_id:
+- "wikipedia": all articles
+- "category:<name>": articles in the category and its subcategories
+"""
+
+import asyncio
+import os
+import secrets
+from logging import getLogger
+
+from fastapi import APIRouter, Depends, Header, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from ..common import metrics
+from ..common.concurrency import OverloadedError, get_limiter
+from ..common.config_loader import load_config
+from ..common.log_setter import setup_logger
+from ..common.title_normalizer import category_name
+from ..common.wiki_text import passage
+from ..database import get_async_db
+from ..services import embedder, hybrid_search
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger, config=load_config(layer="logger"))
+
+# ========== Config ==========
+config = load_config().get("retrieval") or {}
+
+# ========== Constants ==========
+RETRIEVAL_API_KEY = os.getenv("RETRIEVAL_API_KEY")
+KNOWLEDGE_ID = "wikipedia"
+CATEGORY_KNOWLEDGE_PREFIX = "category:"
+ARTICLE_URL = "https://ja.wikipedia.org/?curid={wiki_id}"
+
+# Error codes defined by the External Knowledge API
+INVALID_AUTHORIZATION_HEADER = 1001
+AUTHORIZATION_FAILED = 1002
+KNOWLEDGE_NOT_FOUND = 2001
+# Not defined by the API; Dify shows error_msg for any code
+INVALID_REQUEST = 1000
+SEARCH_OVERLOADED = 3001
+SEARCH_FAILED = 3002
+
+
+def error_response(
+    status_code: int,
+    error_code: int,
+    error_msg: str,
+    headers: dict[str, str] | None = None,
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error_code": error_code, "error_msg": error_msg},
+        headers=headers,
+    )
+
+
+def validation_message(error: RequestValidationError) -> str:
+    """`loc: msg` of each problem, e.g. 'retrieval_setting.top_k: Field required'"""
+    messages = []
+    for problem in error.errors():
+        # A JSON decode error's loc is the character position
+        loc = [] if problem["type"] == "json_invalid" else problem["loc"]
+        field = ".".join(str(part) for part in loc if part != "body")
+        messages.append(f"{field}: {problem['msg']}" if field else problem["msg"])
+    return "; ".join(messages)
+
+
+class KnowledgeRoute(APIRoute):
+    """
+    Answers invalid request bodies in the External Knowledge API error
+    format instead of FastAPI's 422 `{"detail": [...]}`. The key is checked
+    first, so callers without it learn nothing about the schema.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            except RequestValidationError as e:
+                error = check_authorization(request.headers.get("authorization"))
+                if error is not None:
+                    return error
+                return error_response(422, INVALID_REQUEST, validation_message(e))
+
+        return route_handler
+
+
+router = APIRouter(route_class=KnowledgeRoute)
+
+
+def check_authorization(authorization: str | None) -> JSONResponse | None:
+    """Error response for a missing / wrong Bearer key, None if authorized"""
+    scheme, _, api_key = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not api_key:
+        return error_response(
+            403,
+            INVALID_AUTHORIZATION_HEADER,
+            "Invalid Authorization header format. Expected 'Bearer <api-key>' format.",
+        )
+
+    if not RETRIEVAL_API_KEY or not secrets.compare_digest(
+        api_key.encode(), RETRIEVAL_API_KEY.encode()
+    ):
+        return error_response(403, AUTHORIZATION_FAILED, "Authorization failed")
+
+    return None
+
+
+def parse_knowledge_id(knowledge_id: str) -> tuple[bool, str | None]:
+    """
+    Returns:
+        tuple[bool, str | None]: (known knowledge_id, category to filter on)
+    """
+    if knowledge_id == KNOWLEDGE_ID:
+        return True, None
+    if knowledge_id.startswith(CATEGORY_KNOWLEDGE_PREFIX):
+        category = knowledge_id[len(CATEGORY_KNOWLEDGE_PREFIX) :]
+        if category.strip():
+            return True, category_name(category)
+    return False, None
+
+
+def to_score(distance: float | None) -> float:
+    """
+    L2 distance between unit vectors -> cosine similarity (1 - d^2 / 2),
+    clamped to Dify's 0..1 score range.
+    """
+    if distance is None:
+        return 0.0
+    return min(max(1.0 - distance * distance / 2, 0.0), 1.0)
+
+
+@router.post("/retrieval", response_model=schemas.RetrievalResponse)
+async def retrieve(
+    request: schemas.RetrievalRequest,
+    authorization: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    External Knowledge API retrieval: top_k passages of the hybrid search
+    with a score of at least `score_threshold`.
+    """
+    error = check_authorization(authorization)
+    if error is not None:
+        return error
+
+    known, category = parse_knowledge_id(request.knowledge_id)
+    if not known:
+        return error_response(
+            404,
+            KNOWLEDGE_NOT_FOUND,
+            f"The knowledge does not exist: {request.knowledge_id}",
+        )
+
+    settings = request.retrieval_setting
+    top_k = min(settings.top_k, config.get("max_top_k", 20))
+
+    try:
+        # Shares the search endpoint's concurrency cap
+        async with get_limiter("search"):
+            with metrics.SEARCH_ENCODE_SECONDS.time():
+                # CPU-bound: keep it off the event loop
+                query_vector = await asyncio.to_thread(embedder.encode, request.query)
+
+            rows = await hybrid_search.ranked_search(
+                db,
+                request.query,
+                query_vector,
+                limit=top_k,
+                include_content=True,
+                category=category,
+            )
+    except OverloadedError as e:
+        metrics.ADMISSION_REJECTED_TOTAL.labels(
+            endpoint="retrieval", reason=e.reason
+        ).inc()
+        return error_response(
+            e.status_code, SEARCH_OVERLOADED, str(e), headers=e.headers
+        )
+    except Exception:
+        metrics.ERRORS_TOTAL.labels(endpoint="retrieval", stage="search").inc()
+        logger.exception("Retrieval search failed")
+        return error_response(500, SEARCH_FAILED, "Search failed")
+
+    # Passages for the LLM: plaintext, not the wiki markup of the body
+    passage_size = config.get("passage_size", 1000)
+    rows = [
+        row for row in rows if to_score(row["distance"]) >= settings.score_threshold
+    ]
+    passages = await asyncio.to_thread(
+        lambda: [
+            passage(row["content"] or "", request.query, passage_size) for row in rows
+        ]
+    )
+
+    records = [
+        schemas.RetrievalRecord(
+            content=content,
+            score=to_score(row["distance"]),
+            title=row["title"],
+            metadata={
+                "path": ARTICLE_URL.format(wiki_id=row["wiki_id"]),
+                "article_id": row["id"],
+                "wiki_id": row["wiki_id"],
+            },
+        )
+        for row, content in zip(rows, passages)
+    ]
+
+    return schemas.RetrievalResponse(records=records)
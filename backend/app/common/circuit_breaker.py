@@ -0,0 +1,45 @@
+import time
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency is down.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: calls are rejected for `reset_timeout` seconds.
+    half-open: one probe call is let through per `reset_timeout`; success
+    closes the breaker, failure keeps it open.
+
+    Not thread-safe: meant to be used from a single event loop.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        if self._opened_at is None:
+            return True
+
+        now = time.monotonic()
+        if now - self._opened_at >= self.reset_timeout:
+            # Half-open: let this call probe, hold back the rest for another period
+            self._opened_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self.is_open or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -0,0 +1,134 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .config_loader import load_config
+
+# ========== Config ==========
+config = load_config().get("concurrency") or {}
+
+
+class OverloadedError(Exception):
+    """
+    Request turned away by an `AdmissionLimiter`.
+
+    `reason` is "queue_full" (fast fail, 429) or "queue_timeout" (waited
+    `queue_timeout` seconds without getting a slot, 503).
+    """
+
+    def __init__(self, message: str, reason: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+class AdmissionLimiter:
+    """
+    Caps concurrent executions of an expensive operation.
+
+    Up to `max_concurrent` callers run at once and up to `max_queue` more
+    wait for a slot; anyone beyond that is rejected right away, so a burst
+    turns into quick 429s instead of an ever longer queue in front of
+    Postgres or Dify. Per worker process; single event loop only.
+    """
+
+    def __init__(
+        self, max_concurrent: int, max_queue: int = 0, queue_timeout: float = 5.0
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def acquire(self):
+        """
+        Raises:
+            OverloadedError: Queue full, or no slot within `queue_timeout`
+        """
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+
+        if self._waiting >= self.max_queue:
+            raise OverloadedError(
+                "Too many requests in progress", "queue_full", 429, retry_after=1
+            )
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OverloadedError(
+                "Timed out waiting for capacity",
+                "queue_timeout",
+                503,
+                retry_after=int(self.queue_timeout) or 1,
+            )
+        finally:
+            self._waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for `key` is running,
+    later callers await its result (or exception) instead of starting their
+    own. The call runs in its own task, so it completes even if the caller
+    that started it goes away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        self._flights.pop(key, None)
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+
+        # shield: a cancelled caller must not cancel the shared call
+        return await asyncio.shield(task)
+
+
+# ========== Shared limiters ==========
+_limiters: Dict[str, AdmissionLimiter] = {}
+
+
+def get_limiter(name: str) -> AdmissionLimiter:
+    """Limiter for `concurrency.<name>` in config.yaml (one per worker)"""
+    if name not in _limiters:
+        settings = config.get(name) or {}
+        _limiters[name] = AdmissionLimiter(
+            max_concurrent=settings.get("max_concurrent", 16),
+            max_queue=settings.get("max_queue", 64),
+            queue_timeout=settings.get("queue_timeout", 5.0),
+        )
+    return _limiters[name]
@@ -1,12 +1,132 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+import threading
 from logging import Formatter, StreamHandler, handlers
 from typing import Any, Dict, Optional
 
+from app.common.config_loader import load_config
 from app.common.param_resolver import resolve_param
 
 FORMAT = "%(levelname)-8s %(asctime)s - [%(filename)s:%(lineno)d]\t%(message)s"
 
+# ========== Shared queue ==========
+# Loggers only enqueue records (QueueHandler); one background thread
+# (QueueListener) formats them and does the console / file I/O.
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_handler: Optional[handlers.QueueHandler] = None
+_listener: Optional[handlers.QueueListener] = None
+_file_filters: Dict[str, "LoggerNameFilter"] = {}
+_lock = threading.Lock()
+
+
+class JsonFormatter(Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DebugSampler(logging.Filter):
+    """Keep a `rate` share of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class LoggerNameFilter(logging.Filter):
+    """
+    Pass records of the registered loggers and their children, so a file
+    handler on the shared listener only writes the loggers set up with its
+    `save_path`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.names: frozenset = frozenset()
+
+    def add(self, name: str):
+        # Frozenset swap, like the listener's handlers
+        self.names = self.names | {name}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        name = record.name
+        while True:
+            if name in self.names:
+                return True
+            if "." not in name:
+                return False
+            name = name.rsplit(".", 1)[0]
+
+
+def _make_formatter(settings: Dict[str, Any]) -> Formatter:
+    if settings.get("format", "text") == "json":
+        return JsonFormatter()
+    return Formatter(FORMAT)
+
+
+def _get_queue_handler(
+    logger_name: str, save_path: Optional[str]
+) -> handlers.QueueHandler:
+    """
+    The process-wide queue handler. Starts the listener on first use and
+    adds a rotating file handler the first time each `save_path` is seen;
+    that handler only writes the loggers set up with this `save_path`.
+    """
+    global _queue_handler, _listener
+
+    with _lock:
+        settings = load_config(layer="logger") or {}
+        formatter = _make_formatter(settings)
+
+        if _queue_handler is None:
+            st_handler = StreamHandler()
+            st_handler.setFormatter(formatter)
+
+            _listener = handlers.QueueListener(_queue, st_handler)
+            _listener.start()
+            # Flush what is still queued on interpreter exit
+            atexit.register(_listener.stop)
+
+            _queue_handler = handlers.QueueHandler(_queue)
+            sample_rate = settings.get("debug_sample_rate", 1.0)
+            if sample_rate < 1.0:
+                _queue_handler.addFilter(DebugSampler(sample_rate))
+
+        if save_path is not None:
+            if save_path not in _file_filters:
+                _file_filters[save_path] = LoggerNameFilter()
+                fl_handler = handlers.RotatingFileHandler(
+                    filename=save_path,
+                    maxBytes=10 * 1024 * 1024,
+                    backupCount=5,
+                    encoding="utf-8",
+                )
+                fl_handler.setFormatter(formatter)
+                fl_handler.addFilter(_file_filters[save_path])
+                # Tuple swap: the listener thread never sees a half-updated list
+                _listener.handlers = (*_listener.handlers, fl_handler)
+            _file_filters[save_path].add(logger_name)
+
+    return _queue_handler
+
 
 def setup_logger(
     logger: logging.Logger,
@@ -18,6 +138,10 @@ def setup_logger(
     """
     Setup logger
 
+    Records go through a queue to a single background writer, so logging
+    on the request path never waits on console or disk I/O. Calling this
+    again for the same logger (e.g. on re-import) does not add handlers.
+
     Args:
         logger (logging.Logger): Logger object
 
@@ -44,29 +168,14 @@ def setup_logger(
         param_name="save_path",
     )
 
-    if save_path is not None and not os.path.exists(_save_path):
-        with open(_save_path, "w"):
-            pass
-
-    logger = _set_log_level(logger, _log_level)
-
-    formatter = Formatter(FORMAT)
-
-    st_handler = StreamHandler()
-    st_handler.setFormatter(formatter)
-    logger.addHandler(st_handler)
-
     if _save_path is not None:
-        fl_handler = handlers.RotatingFileHandler(
-            filename=_save_path,
-            maxBytes=10 * 1024 * 1024,
-            backupCount=5,
-            encoding="utf-8",
-        )
+        os.makedirs(os.path.dirname(_save_path) or ".", exist_ok=True)
 
-        fl_handler.setFormatter(formatter)
+    logger = _set_log_level(logger, _log_level)
 
-        logger.addHandler(fl_handler)
+    queue_handler = _get_queue_handler(logger.name, _save_path)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
 
     return logger
 
@@ -0,0 +1,138 @@
+"""
+Prometheus metrics for the API.
+
+Metric children with fixed labels are bound once at import time, so the hot
+path only pays for a lock and an add per observation.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Sub-millisecond to multi-second latencies
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# ========== Histograms ==========
+SEARCH_STAGE_SECONDS = Histogram(
+    "search_stage_seconds",
+    "Latency of each article search stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+SEARCH_ENCODE_SECONDS = SEARCH_STAGE_SECONDS.labels(stage="encode")
+SEARCH_KEYWORD_SECONDS = SEARCH_STAGE_SECONDS.labels(stage="keyword")
+SEARCH_RERANK_SECONDS = SEARCH_STAGE_SECONDS.labels(stage="rerank")
+# Exact title / redirect fast path
+SEARCH_TITLE_SECONDS = SEARCH_STAGE_SECONDS.labels(stage="title")
+# Keyword search and re-rank executed together as one statement
+SEARCH_HYBRID_QUERY_SECONDS = SEARCH_STAGE_SECONDS.labels(stage="hybrid_query")
+
+DIFY_REQUEST_SECONDS = Histogram(
+    "dify_request_seconds",
+    "Latency of Dify chat-messages calls",
+    buckets=LATENCY_BUCKETS,
+)
+
+# Streaming chat: request received -> first answer chunk relayed
+CHAT_FIRST_TOKEN_SECONDS = Histogram(
+    "chat_first_token_seconds",
+    "Time to first answer chunk of streamed chat responses",
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_seconds",
+    "Latency of database commits on the request path",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_COMMIT_SECONDS = DB_COMMIT_SECONDS.labels(operation="chat_message")
+# Write-behind mode (services/chat_writer.py)
+CHAT_BATCH_COMMIT_SECONDS = DB_COMMIT_SECONDS.labels(operation="chat_message_batch")
+
+# ========== Counters ==========
+SEARCH_REQUESTS_TOTAL = Counter("search_requests_total", "Article search requests")
+SEARCH_TITLE_HITS_TOTAL = Counter(
+    "search_title_hits_total", "Searches answered or boosted by an exact title"
+)
+SEARCH_COALESCED_TOTAL = Counter(
+    "search_coalesced_total", "Searches that joined an identical in-flight search"
+)
+SEARCH_CANDIDATES_TOTAL = Counter(
+    "search_candidates_total", "Keyword stage candidates passed to re-ranking"
+)
+
+CACHE_HITS_TOTAL = Counter("cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES_TOTAL = Counter("cache_misses_total", "Cache misses", ["cache"])
+# session_id -> Dify conversation_id
+CONVERSATION_CACHE_HITS = CACHE_HITS_TOTAL.labels(cache="conversation")
+CONVERSATION_CACHE_MISSES = CACHE_MISSES_TOTAL.labels(cache="conversation")
+# First-turn chat answers (services/semantic_cache.py)
+SEMANTIC_CACHE_HITS = CACHE_HITS_TOTAL.labels(cache="semantic")
+SEMANTIC_CACHE_MISSES = CACHE_MISSES_TOTAL.labels(cache="semantic")
+
+DIFY_RETRIES_TOTAL = Counter("dify_retries_total", "Retried Dify requests")
+CHAT_WRITER_REJECTED_TOTAL = Counter(
+    "chat_writer_rejected_total",
+    "Turns written synchronously because the write-behind queue was full",
+)
+
+ADMISSION_REJECTED_TOTAL = Counter(
+    "admission_rejected_total",
+    "Requests turned away by concurrency limits",
+    ["endpoint", "reason"],
+)
+
+ERRORS_TOTAL = Counter(
+    "errors_total", "Errors by endpoint and stage", ["endpoint", "stage"]
+)
+
+# ========== Gauges ==========
+DIFY_CIRCUIT_OPEN = Gauge(
+    "dify_circuit_open",
+    "1 while the Dify circuit breaker is open",
+    multiprocess_mode="max",
+)
+CHAT_WRITER_QUEUE_SIZE = Gauge(
+    "chat_writer_queue_size",
+    "Turns waiting in the write-behind queue",
+    multiprocess_mode="livesum",
+)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Render all metrics in Prometheus text format.
+    Aggregates across workers when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,40 @@
+import unicodedata
+from typing import List
+
+CATEGORY_PREFIXES = ("Category:", "カテゴリ:")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a title or query for exact lookups:
+    NFKC (full-width -> half-width), underscores as spaces,
+    collapsed whitespace and case folding.
+    """
+    title = unicodedata.normalize("NFKC", title).replace("_", " ")
+    return " ".join(title.split()).casefold()
+
+
+def canonical_title(title: str) -> str:
+    """
+    Title as MediaWiki stores it: underscores as spaces,
+    collapsed whitespace and an upper-case first letter.
+    """
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def category_name(name: str) -> str:
+    """Category key as stored in `categorylinks.cl_to` ("Category:" prefix removed)"""
+    name = name.strip()
+    for prefix in CATEGORY_PREFIXES:
+        if name[: len(prefix)].casefold() == prefix.casefold():
+            name = name[len(prefix) :]
+            break
+    return canonical_title(name)
+
+
+def title_variants(query: str) -> List[str]:
+    """Spellings of `query` to try against the exact `articles.title` index"""
+    variants = [query, canonical_title(query)]
+    variants.append(canonical_title(unicodedata.normalize("NFKC", query)))
+    return list(dict.fromkeys(v for v in variants if v))
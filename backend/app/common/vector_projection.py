@@ -0,0 +1,172 @@
+"""
+Reduction of embedding vectors to the dimension stored in
+`articles.content_vector` (`embedding.projection` config).
+
+    none:     the model's vectors are stored as they are (MODEL_DIM)
+    pca:      projected on the top `dim` principal components of a sample of
+              article vectors (fitted by scripts/projector.py)
+    truncate: the first `dim` components, for Matryoshka-trained models
+              whose leading dimensions carry most of the information
+
+Projected vectors are L2-normalized again, so `<->` on them still ranks like
+cosine similarity. Each fitted projection is stored as a version in
+`vector_projections`; articles and queries must use the same one, so the
+API loads it at startup (services/embedder.py) and has to be restarted
+after a new fit.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from .config_loader import load_config
+
+# ========== Config ==========
+config = (load_config().get("embedding") or {}).get("projection") or {}
+
+# ========== Constants ==========
+# Output dimension of sentence-transformers/all-MiniLM-L6-v2
+MODEL_DIM = 384
+METHODS = ("none", "pca", "truncate")
+
+
+def settings() -> Dict[str, Any]:
+    """`embedding.projection` config with defaults filled in"""
+    options = {
+        "method": config.get("method", "none"),
+        "dim": config.get("dim", 128),
+        "sample_size": config.get("sample_size", 50000),
+    }
+    if options["method"] not in METHODS:
+        raise ValueError(f"embedding.projection.method must be one of {METHODS}")
+    if options["method"] != "none" and not 0 < options["dim"] <= MODEL_DIM:
+        raise ValueError(f"embedding.projection.dim must be in 1..{MODEL_DIM}")
+    return options
+
+
+def stored_dim() -> int:
+    """Dimension of `articles.content_vector`"""
+    options = settings()
+    return MODEL_DIM if options["method"] == "none" else options["dim"]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class Projection:
+    """
+    One version of the projection: `mean` and `components`
+    (source_dim x dim) for pca, neither for truncate.
+    """
+
+    method: str
+    dim: int
+    source_dim: int = MODEL_DIM
+    mean: Optional[np.ndarray] = None
+    components: Optional[np.ndarray] = None
+    version: Optional[int] = None
+    # Share of the sample's variance kept (pca)
+    explained_variance: Optional[float] = None
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Projects one vector or a (n, source_dim) batch; float32"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "pca":
+            projected = (vectors - self.mean) @ self.components
+        else:
+            projected = vectors[..., : self.dim]
+        return normalize(projected).astype(np.float32)
+
+    @classmethod
+    def fit(cls, method: str, dim: int, sample: np.ndarray) -> "Projection":
+        """Fits `method` on a (n, source_dim) sample of model vectors"""
+        sample = np.asarray(sample, dtype=np.float32)
+        source_dim = sample.shape[1]
+        if method == "truncate":
+            return cls(method, dim, source_dim)
+        if len(sample) < dim:
+            raise ValueError(f"PCA to {dim} dims needs at least {dim} sample vectors")
+
+        mean = sample.mean(axis=0)
+        # Rows of vt are the principal axes, by decreasing singular value
+        _, singular_values, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        variance = singular_values**2
+        return cls(
+            method,
+            dim,
+            source_dim,
+            mean=mean,
+            components=np.ascontiguousarray(vt[:dim].T),
+            explained_variance=float(variance[:dim].sum() / variance.sum()),
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Columns of a `vector_projections` row"""
+        return {
+            "method": self.method,
+            "source_dim": self.source_dim,
+            "dim": self.dim,
+            "mean": None if self.mean is None else self.mean.tobytes(),
+            "components": (
+                None if self.components is None else self.components.tobytes()
+            ),
+            "explained_variance": self.explained_variance,
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "Projection":
+        """From a `VectorProjection` (or a row with its columns)"""
+        mean = components = None
+        if row.mean is not None:
+            mean = np.frombuffer(row.mean, dtype=np.float32)
+        if row.components is not None:
+            components = np.frombuffer(row.components, dtype=np.float32).reshape(
+                row.source_dim, row.dim
+            )
+        return cls(
+            row.method,
+            row.dim,
+            row.source_dim,
+            mean=mean,
+            components=components,
+            version=row.version,
+            explained_variance=row.explained_variance,
+        )
+
+    def matches(self, options: Dict[str, Any]) -> bool:
+        """Whether this version was made with the given settings"""
+        return self.method == options["method"] and self.dim == options["dim"]
+
+
+def active_projection(db) -> Optional[Projection]:
+    """
+    Projection `articles.content_vector` is stored with (the latest version);
+    None when `method` is none.
+
+    Args:
+        db: Sync SQLAlchemy session
+
+    Raises:
+        RuntimeError: No version was fitted with the current settings
+    """
+    # models.py imports this module for the column's dimension
+    from ..models import VectorProjection
+
+    options = settings()
+    if options["method"] == "none":
+        return None
+    row = db.scalars(
+        select(VectorProjection).order_by(VectorProjection.version.desc()).limit(1)
+    ).first()
+    projection = None if row is None else Projection.from_row(row)
+    if projection is None or not projection.matches(options):
+        raise RuntimeError(
+            f"No {options['method']} projection to {options['dim']} dims has been "
+            "fitted. Run scripts/projector.py first."
+        )
+    return projection
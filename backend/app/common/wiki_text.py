@@ -0,0 +1,67 @@
+"""
+Plaintext of wiki markup: the summary stored as `articles.summary` and the
+passages returned to Dify (api/retrieval.py).
+
+A rough, regex-based strip (templates, tables, references, files, links,
+emphasis, headings): good enough for a result preview, not a full renderer.
+"""
+
+import re
+
+TEMPLATE_PATTERN = re.compile(r"\{\{[^{}]*\}\}")
+TABLE_PATTERN = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+REF_PATTERN = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+FILE_LINK_PATTERN = re.compile(
+    r"\[\[\s*(?:File|Image|ファイル|画像|Category|カテゴリ)\s*:[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]",
+    re.IGNORECASE,
+)
+LINK_PATTERN = re.compile(r"\[\[(?:[^\]|]*\|)?([^\]]*)\]\]")
+EXTERNAL_LINK_PATTERN = re.compile(r"\[https?://\S+\s*([^\]]*)\]")
+EMPHASIS_PATTERN = re.compile(r"'{2,}")
+HEADING_PATTERN = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.MULTILINE)
+LIST_PREFIX_PATTERN = re.compile(r"^[*#:;]+\s*", re.MULTILINE)
+SPACE_PATTERN = re.compile(r"\s+")
+
+
+def strip_markup(text: str) -> str:
+    text = COMMENT_PATTERN.sub("", text)
+    text = REF_PATTERN.sub("", text)
+    # Innermost templates first: they nest
+    while True:
+        stripped = TEMPLATE_PATTERN.sub("", text)
+        if stripped == text:
+            break
+        text = stripped
+    text = TABLE_PATTERN.sub("", text)
+    text = FILE_LINK_PATTERN.sub("", text)
+    text = LINK_PATTERN.sub(r"\1", text)
+    text = EXTERNAL_LINK_PATTERN.sub(r"\1", text)
+    text = TAG_PATTERN.sub("", text)
+    text = EMPHASIS_PATTERN.sub("", text)
+    text = HEADING_PATTERN.sub(r"\1", text)
+    text = LIST_PREFIX_PATTERN.sub("", text)
+    return SPACE_PATTERN.sub(" ", text).strip()
+
+
+def summarize(text: str, max_chars: int) -> str:
+    """The first `max_chars` characters of the article's plaintext"""
+    # Only the lead matters: skip stripping the whole (possibly huge) body
+    lead = text[: max_chars * 20]
+    return strip_markup(lead)[:max_chars]
+
+
+def passage(text: str, query: str, max_chars: int) -> str:
+    """
+    `max_chars` characters of the article's plaintext: centered on the first
+    occurrence of `query` in its lead, or the start of the lead when the
+    query does not appear verbatim (the usual case for a question).
+    """
+    # Same bound as summarize: a window of the body, not the whole of it
+    plaintext = strip_markup(text[: max_chars * 20])
+    start = plaintext.find(query) if query else -1
+    if start < 0:
+        return plaintext[:max_chars]
+    start = max(min(start - max_chars // 2, len(plaintext) - max_chars), 0)
+    return plaintext[start : start + max_chars]
@@ -7,23 +7,76 @@ This module defines the configuration for the database connection.
 import os
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from pgvector.asyncpg import register_vector
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from .common.config_loader import load_config
+
 # Load environment variables from .env
 load_dotenv()
 
 # Get database connection details from environment variables
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool settings for the API (async engine)
+config = load_config().get("database") or {}
+
+
+def _to_async_url(url: str) -> str:
+    """Use the asyncpg driver for a postgresql:// (or +psycopg2) URL"""
+    scheme, rest = url.split("://", 1)
+    return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgresql") else url
+
+
 # `create_engine` is the entrypoint for the database
+# The sync engine is used by the data pipeline scripts
 engine = create_engine(DATABASE_URL)
 
 # `sessionmaker` configures the database conversations (sessions)
 # Each session is an independent transaction
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The API uses an asyncpg-backed engine so waiting on Postgres
+# does not tie up threadpool workers
+async_engine = create_async_engine(
+    os.getenv("ASYNC_DATABASE_URL") or _to_async_url(DATABASE_URL),
+    pool_size=config.get("pool_size", 10),
+    max_overflow=config.get("max_overflow", 20),
+    pool_timeout=config.get("pool_timeout", 30),
+    pool_recycle=config.get("pool_recycle", 1800),
+    pool_pre_ping=config.get("pool_pre_ping", True),
+    # Server-side prepared statements cached per connection
+    connect_args={
+        "prepared_statement_cache_size": config.get("statement_cache_size", 256)
+    },
+)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector(dbapi_connection, connection_record):
+    """Register the pgvector codec so numpy arrays bind as `vector`"""
+    dbapi_connection.run_async(register_vector)
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
 # `declarative_base` offers a base class for the creation of each DB table
 # All DB models should inherit from this class
 Base = declarative_base()
+
+
+async def get_async_db():
+    """
+    Dependency to get an AsyncSession object.
+
+    Yields a database session that should be used as a dependency
+    for endpoints that require database access. The session is
+    properly closed after it is no longer needed.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,14 +1,19 @@
+import asyncio
+from contextlib import asynccontextmanager
 from logging import getLogger
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy import text
 
-from . import models
-from .api import articles, chat
+from .api import articles, chat, retrieval
+from .common import metrics
 from .common.config_loader import load_config
 from .common.log_setter import setup_logger
-from .database import SessionLocal, engine
+from .database import async_engine
+from .services import ann_index, chat_writer, embedder
+from .services.dify_client import close_dify_client, get_dify_client
 
 # ========== Logging Config ==========
 logger = getLogger(__name__)
@@ -16,11 +21,64 @@ config = load_config(layer="logger")
 logger = setup_logger(logger, config=config)
 
 
+# ========== Lifespan ==========
+async def _check_database():
+    """Check database connection (schema management lives in scripts/setup_db.py)"""
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1;"))
+        logger.info("Database connection successful")
+    except Exception as e:
+        logger.error(f"Database connection failed: {e}")
+
+
+def _load_model():
+    try:
+        embedder.load_model(warmup=True)
+    except Exception as e:
+        logger.error(f"Failed to load embedding model: {e}", exc_info=True)
+    # Separate from the model: retried by the first queries if it fails
+    try:
+        embedder.load_projection()
+    except Exception as e:
+        logger.error(f"Failed to load the vector projection: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start up without blocking on the model: the server accepts requests
+    right away and `/ready` reports once the model is loaded and warmed up.
+    """
+    await _check_database()
+    # Open the ANN sidecar (if enabled) before the first search
+    await asyncio.to_thread(ann_index.get_index)
+    # Shared Dify connection pool
+    get_dify_client()
+    # Background writer for chat messages (write-behind mode only)
+    chat_writer.start_writer()
+
+    model_task = None
+    if load_config(layer="embedding").get("load_on_startup", True):
+        model_task = asyncio.create_task(asyncio.to_thread(_load_model))
+
+    yield
+
+    if model_task is not None and not model_task.done():
+        model_task.cancel()
+
+    await close_dify_client()
+    # Flush queued chat messages before the engine goes away
+    await chat_writer.stop_writer()
+    await async_engine.dispose()
+
+
 #  ========== FastAPI Config ==========
 app = FastAPI(
     title="Dify Chatbot API",
     description="Dify Chatbot - Wikipedia knowledge base API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Allow Cross-Origin Shareing (CORS)
@@ -45,31 +103,11 @@ app.add_middleware(
 # tags: for grouping API documents
 app.include_router(articles.router, prefix="/api/articles", tags=["Articles"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
+# Dify External Knowledge API: Dify calls <endpoint>/retrieval
+app.include_router(retrieval.router, prefix="/api/knowledge", tags=["Knowledge"])
 
 
 # ========== Routers ==========
-# Event handler when starting the API
-@app.on_event("startup")
-def on_startup():
-    """When starting the API, check database connection"""
-
-    models.Base.metadata.create_all(bind=engine)  # Create DB tables from models module
-
-    try:
-        with SessionLocal() as db:
-            logger.info("Database connection successful")
-
-            logger.info("Checking extensions...")
-            # Check pg_trgm extension
-            db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
-            # Check pg_vector extension
-            db.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
-            logger.info('"pg_trgm" and "vector" extension enabled')
-
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-
-
 # GET request endpoint for root URL("/")
 @app.get("/")
 def read_root():
@@ -78,3 +116,29 @@ def read_root():
     working correctly.
     """
     return {"status": "ok", "message": "Welcome to Dify Chatbot API!"}
+
+
+@app.get("/ready")
+def read_ready():
+    """
+    Readiness check: 200 once the embedding model is loaded and warmed up
+    and the vector projection is loaded, 503 until then.
+    """
+    if not embedder.is_ready() and embedder.get_status()["model_loaded"]:
+        # Retry a failed projection lookup (rate limited): the database may be back
+        try:
+            embedder.load_projection()
+        except RuntimeError:
+            pass
+    status = embedder.get_status()
+    if not embedder.is_ready():
+        state = "loading" if status["projection_error"] is None else "unavailable"
+        return JSONResponse(status_code=503, content={"status": state, **status})
+    return {"status": "ready", **status}
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
@@ -5,15 +5,31 @@ This module is used to define the database models for the application.
 """
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Text
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.sql import func
 
+from .common.vector_projection import stored_dim
 from .database import Base
 
 
 class Article(Base):
     """
     Table model for Wikipedia articles
+
+    Only the small, hot columns used by search; the full text lives in
+    `ArticleBody` and is fetched by id when a result needs it.
     """
 
     # Define table name
@@ -25,9 +41,11 @@ class Article(Base):
         BigInteger, unique=True, nullable=False, index=True
     )  # Wikipedia article ID
     title = Column(String(255), nullable=False, index=True)
-    content = Column(Text, nullable=False)
-    # 384 dimension vector
-    content_vector = Column(Vector(384), nullable=True)
+    # Plaintext lead of the article (common/wiki_text.py)
+    summary = Column(Text, nullable=False, server_default="")
+    # 384 dimension vector, or fewer with `embedding.projection`
+    # (common/vector_projection.py)
+    content_vector = Column(Vector(stored_dim()), nullable=True)
     created_at = Column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
@@ -39,17 +57,114 @@ class Article(Base):
         return f"<Article(id={self.id}, title='{self.title}')>"
 
 
+class ArticleBody(Base):
+    """
+    Table model for article bodies (wiki markup), kept out of `articles` so
+    scans of the hot columns do not drag in TOAST pages. scripts/setup_db.py
+    sets the column's TOAST compression (`articles.body_compression`).
+    """
+
+    __tablename__ = "article_bodies"
+
+    article_id = Column(
+        Integer, ForeignKey("articles.id", ondelete="CASCADE"), primary_key=True
+    )
+    content = Column(Text, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<ArticleBody(article_id={self.article_id}, length={len(self.content)})>"
+        )
+
+
+class Redirect(Base):
+    """
+    Table model for Wikipedia redirects (alias title -> target article)
+    """
+
+    __tablename__ = "redirects"
+
+    id = Column(Integer, primary_key=True)
+    alias = Column(String(255), nullable=False)
+    # See common/title_normalizer.normalize_title
+    alias_normalized = Column(String(255), nullable=False, index=True)
+    target_wiki_id = Column(BigInteger, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<Redirect(alias='{self.alias}', target_wiki_id={self.target_wiki_id})>"
+
+
+class ArticleDuplicate(Base):
+    """
+    Table model for near-duplicate articles left out of `articles` at ingest
+    (scripts/deduplicator.py) and the article kept in their place
+    """
+
+    __tablename__ = "article_duplicates"
+
+    wiki_id = Column(BigInteger, primary_key=True)
+    title = Column(String(255), nullable=False)
+    canonical_wiki_id = Column(BigInteger, nullable=False, index=True)
+    # Estimated Jaccard similarity of the two wikitexts
+    similarity = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<ArticleDuplicate(wiki_id={self.wiki_id}, "
+            f"canonical_wiki_id={self.canonical_wiki_id})>"
+        )
+
+
+class VectorProjection(Base):
+    """
+    Table model for the versions of the projection applied to article and
+    query vectors (common/vector_projection.py, fitted by scripts/projector.py).
+    The latest version is the one `articles.content_vector` holds.
+    """
+
+    __tablename__ = "vector_projections"
+
+    version = Column(Integer, primary_key=True)
+    # pca / truncate
+    method = Column(String(16), nullable=False)
+    source_dim = Column(Integer, nullable=False)
+    dim = Column(Integer, nullable=False)
+    # float32 arrays (pca only): mean (source_dim), components (source_dim x dim)
+    mean = Column(LargeBinary, nullable=True)
+    components = Column(LargeBinary, nullable=True)
+    explained_variance = Column(Float, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    def __repr__(self):
+        return (
+            f"<VectorProjection(version={self.version}, method='{self.method}', "
+            f"dim={self.dim})>"
+        )
+
+
 class ChatMessage(Base):
     """
     Table model for chat messages
     """
 
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Latest message of a role in a session (conversation_id lookup)
+        Index(
+            "ix_chat_messages_session_role_created", "session_id", "role", "created_at"
+        ),
+        # Keyset pagination of a session's history. Not covering: each row's
+        # role and content are still read from the heap (content is TOASTed
+        # text, too large to INCLUDE)
+        Index("ix_chat_messages_session_created_id", "session_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     # Which conversation this message belongs to
-    session_id = Column(String(255), nullable=False, index=True)
+    session_id = Column(String(255), nullable=False)
 
     # Type of message: 'user' or 'assistant'
     role = Column(String(50), nullable=False)
@@ -77,3 +192,19 @@ class CategoryLink(Base):
     id = Column(Integer, primary_key=True)
     cl_from = Column(Integer, nullable=False, index=True)
     cl_to = Column(String(255), nullable=False, index=True)
+
+
+class CategoryMembership(Base):
+    """
+    Precomputed category membership (scripts/category_builder.py):
+    articles in the category and its subcategories, up to `depth` levels down
+    """
+
+    __tablename__ = "category_members"
+
+    category = Column(String(255), primary_key=True)
+    article_ids = Column(ARRAY(Integer), nullable=False)  # articles.id, sorted
+    depth = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<CategoryMembership(category='{self.category}', size={len(self.article_ids)})>"
@@ -3,12 +3,14 @@ Define type and structure of request and response with pydantic
 """
 
 from datetime import datetime
+from typing import Any, Dict, List
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ArticleBase(BaseModel):
     title: str
+    summary: str | None = None
     content: str | None = None  # Consider null content
 
 
@@ -21,6 +23,32 @@ class Article(ArticleBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ArticleSearchResult(BaseModel):
+    """
+    Search hit. Only the requested `fields` are set.
+
+    In snippet mode `snippet` is a window of the article's wiki markup
+    around the first match of the query, as plain unescaped text: it
+    contains no highlight markup, and any tags in it (`<ref>`, `<br />`,
+    ...) are the article's own. The match is `snippet[match_start :
+    match_start + match_length]` (offsets in characters, i.e. code
+    points); both are None when the query does not appear in the body
+    and the snippet is the start of the article. Escape the text before
+    rendering it as HTML.
+    """
+
+    id: int | None = None
+    wiki_id: int | None = None
+    title: str | None = None
+    summary: str | None = None
+    content: str | None = None
+    snippet: str | None = None
+    match_start: int | None = None
+    match_length: int | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
 class ChatMessageBase(BaseModel):
     role: str
     content: str
@@ -31,13 +59,59 @@ class ChatMessageCreate(ChatMessageBase):
 
 
 class ChatMessage(ChatMessageBase):
-    id: int
+    # None until written when chat messages are persisted write-behind
+    id: int | None = None
     session_id: str
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class ChatHistoryMessage(BaseModel):
+    """History entry; `truncated` is set when `content` was cut to `max_chars`"""
+
+    id: int
+    role: str
+    content: str
+    truncated: bool = False
+    created_at: datetime
+
+
+class ChatHistoryPage(BaseModel):
+    """
+    Page of a session's messages, newest first.
+    Pass `next_cursor` as `before` to get the next (older) page.
+    """
+
+    messages: List[ChatHistoryMessage]
+    next_cursor: str | None = None
+
+
 class ChatRequest(BaseModel):
     session_id: str
     query: str
+    # Always ask Dify, even if the semantic cache has a similar question
+    bypass_cache: bool = False
+
+
+# ========== Dify External Knowledge API ==========
+class RetrievalSetting(BaseModel):
+    top_k: int = Field(..., ge=1)
+    score_threshold: float = Field(0.0, ge=0.0, le=1.0)
+
+
+class RetrievalRequest(BaseModel):
+    knowledge_id: str
+    query: str
+    retrieval_setting: RetrievalSetting
+
+
+class RetrievalRecord(BaseModel):
+    content: str
+    score: float
+    title: str
+    metadata: Dict[str, Any] = {}
+
+
+class RetrievalResponse(BaseModel):
+    records: List[RetrievalRecord]
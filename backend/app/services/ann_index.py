@@ -0,0 +1,194 @@
+"""
+In-process vector index (ANN sidecar) over memory-mapped files.
+
+`scripts/ann_exporter.py` dumps `Article.content_vector` into `index_dir`:
+
+- vectors.f32: float32 matrix, one row per article (append-only)
+- ids.i64: article id of each row (append-only)
+- wiki_ids.i64: wiki_id of each row (append-only). Article ids are reused
+  when `articles` is recreated, so a row only counts for a candidate whose
+  wiki_id matches; the exporter rebuilds the index when rows go stale.
+- meta.json: dim / count / version, replaced atomically after each write
+
+The files are opened with mmap, so all workers on a host share the same
+page-cache pages instead of each holding a copy, and vector work no longer
+competes with keyword search and chat writes on the DB host.
+"""
+
+import json
+import os
+import threading
+import time
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..common.config_loader import load_config
+
+logger = getLogger(__name__)
+
+# ========== Config ==========
+config = load_config().get("ann") or {}
+
+# ========== Constants ==========
+VECTORS_FILE = "vectors.f32"
+IDS_FILE = "ids.i64"
+WIKI_IDS_FILE = "wiki_ids.i64"
+META_FILE = "meta.json"
+
+VECTOR_DTYPE = np.float32
+ID_DTYPE = np.int64
+
+
+def read_meta(index_dir: str) -> Optional[Dict[str, Any]]:
+    """Read meta.json, or None when no index has been exported yet"""
+    try:
+        with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_meta(index_dir: str, meta: Dict[str, Any]):
+    """Replace meta.json atomically so readers never see a partial file"""
+    tmp_path = os.path.join(index_dir, f"{META_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(index_dir, META_FILE))
+
+
+class AnnIndex:
+    """
+    Read-only view of an exported index.
+
+    Row lookups go through a sorted copy of the id map (binary search),
+    which is the only per-worker allocation; vectors stay in the mmap.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.meta = read_meta(index_dir)
+        if self.meta is None:
+            raise FileNotFoundError(f"No ANN index found in {index_dir}")
+
+        count, dim = self.meta["count"], self.meta["dim"]
+        if not os.path.exists(os.path.join(index_dir, WIKI_IDS_FILE)):
+            raise FileNotFoundError(
+                f"ANN index in {index_dir} predates {WIKI_IDS_FILE}; "
+                "run scripts/ann_exporter.py"
+            )
+        if count == 0:
+            self.vectors = np.empty((0, dim), dtype=VECTOR_DTYPE)
+            self.ids = np.empty(0, dtype=ID_DTYPE)
+            self.wiki_ids = np.empty(0, dtype=ID_DTYPE)
+        else:
+            self.vectors = self._open_memmap(VECTORS_FILE, VECTOR_DTYPE, (count, dim))
+            self.ids = self._open_memmap(IDS_FILE, ID_DTYPE, (count,))
+            self.wiki_ids = self._open_memmap(WIKI_IDS_FILE, ID_DTYPE, (count,))
+
+        self._order = np.argsort(self.ids, kind="stable")
+        self._sorted_ids = np.asarray(self.ids)[self._order]
+
+    def _open_memmap(self, name: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+        return np.memmap(
+            os.path.join(self.index_dir, name), dtype=dtype, mode="r", shape=shape
+        )
+
+    @property
+    def version(self) -> int:
+        return self.meta["version"]
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def rows_for(
+        self, article_ids: Sequence[int], wiki_ids: Sequence[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Map articles (id, wiki_id) to matrix rows. A row exported for another
+        article under the same id does not count.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (found mask over `article_ids`, rows of found ids)
+        """
+        article_ids = np.asarray(article_ids, dtype=ID_DTYPE)
+        positions = np.searchsorted(self._sorted_ids, article_ids)
+        positions = np.minimum(positions, len(self._sorted_ids) - 1)
+        rows = self._order[positions]
+        found = (self._sorted_ids[positions] == article_ids) & (
+            np.asarray(self.wiki_ids)[rows] == np.asarray(wiki_ids, dtype=ID_DTYPE)
+        )
+        return found, rows[found]
+
+    def rerank(
+        self,
+        query_vector,
+        article_ids: Sequence[int],
+        wiki_ids: Sequence[int],
+        k: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Order `article_ids` (with their `wiki_ids`) by L2 distance to the
+        query (exact, in-process). Articles that have not been exported yet
+        keep their relative order and come last, as rows without a vector do
+        in pgvector's ORDER BY.
+        """
+        if len(self) == 0 or not len(article_ids):
+            return [(int(i), float("inf")) for i in article_ids][:k]
+
+        query = np.asarray(query_vector, dtype=VECTOR_DTYPE)
+        found, rows = self.rows_for(article_ids, wiki_ids)
+
+        distances = np.linalg.norm(self.vectors[rows] - query, axis=1)
+        ranked = np.argsort(distances, kind="stable")
+        found_ids = np.asarray(article_ids)[found]
+
+        results = [(int(found_ids[i]), float(distances[i])) for i in ranked]
+        results += [(int(i), float("inf")) for i in np.asarray(article_ids)[~found]]
+        return results[:k]
+
+
+# ========== Shared instance ==========
+_index: Optional[AnnIndex] = None
+_last_check: Optional[float] = None
+_lock = threading.Lock()
+
+
+def get_index() -> Optional[AnnIndex]:
+    """
+    Return the shared index, or None when the sidecar is disabled or has not
+    been exported. Picks up appends from the exporter by re-opening the files
+    when meta.json's version changes (checked every `reload_interval` seconds).
+    """
+    global _index, _last_check
+
+    if not config.get("enabled", False):
+        return None
+
+    now = time.monotonic()
+    if _last_check is not None and now - _last_check < config.get(
+        "reload_interval", 30
+    ):
+        return _index
+
+    with _lock:
+        _last_check = now
+        index_dir = config.get("index_dir", "./data/ann")
+        meta = read_meta(index_dir)
+
+        if meta is None:
+            if _index is None:
+                logger.warning(f"ANN sidecar enabled but no index in {index_dir}")
+            return _index
+
+        if _index is None or meta["version"] != _index.version:
+            try:
+                _index = AnnIndex(index_dir)
+            except FileNotFoundError as e:
+                logger.warning(f"ANN sidecar not used: {e}")
+                _index = None
+                return None
+            logger.info(f"Loaded ANN index v{_index.version} ({len(_index)} vectors)")
+
+    return _index
@@ -0,0 +1,163 @@
+"""
+Write-behind persistence of chat messages (`chat.persistence.mode: write_behind`).
+
+Request handlers enqueue finished turns and return without waiting for
+Postgres; a background task drains the bounded queue and writes the rows
+with multi-row INSERTs, one transaction per batch.
+"""
+
+import asyncio
+from logging import getLogger
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+
+from ..common import metrics
+from ..common.config_loader import load_config
+from ..database import AsyncSessionLocal
+from ..models import ChatMessage
+
+logger = getLogger(__name__)
+
+# ========== Config ==========
+config = (load_config().get("chat") or {}).get("persistence") or {}
+
+
+class ChatMessageWriter:
+    """
+    Bounded queue of chat message rows flushed in batches.
+
+    When the queue is full, `put` waits up to `enqueue_timeout` seconds for
+    room (backpressure on the request) and then gives up, so the caller can
+    write the turn itself.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        enqueue_timeout: float = 1.0,
+        max_retries: int = 3,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue[List[Dict[str, Any]]] = asyncio.Queue(queue_size)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop (graceful shutdown)"""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def put(self, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Enqueue the rows of one turn (kept together in one batch).
+
+        Returns:
+            bool: False if the queue stayed full for `enqueue_timeout` seconds
+        """
+        try:
+            await asyncio.wait_for(self._queue.put(rows), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            metrics.CHAT_WRITER_REJECTED_TOTAL.inc()
+            return False
+        metrics.CHAT_WRITER_QUEUE_SIZE.set(self._queue.qsize())
+        return True
+
+    async def _next_batch(self) -> List[List[Dict[str, Any]]]:
+        """Wait for a turn, then collect more for up to `flush_interval` seconds"""
+        turns = [await self._queue.get()]
+        row_count = len(turns[0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+
+        while row_count < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                turn = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            turns.append(turn)
+            row_count += len(turn)
+
+        return turns
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(ChatMessage), rows)
+                    with metrics.CHAT_BATCH_COMMIT_SECONDS.time():
+                        await db.commit()
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    metrics.ERRORS_TOTAL.labels(endpoint="chat", stage="persist").inc()
+                    logger.error(
+                        f"Dropping {len(rows)} chat messages after {attempt} attempts: {e}",
+                        exc_info=True,
+                    )
+                    return
+                logger.warning(f"Chat message batch failed ({e}), retrying...")
+                await asyncio.sleep(0.1 * 2**attempt)
+
+    async def _run(self):
+        while True:
+            turns = await self._next_batch()
+            try:
+                await self._write([row for turn in turns for row in turn])
+            finally:
+                for _ in turns:
+                    self._queue.task_done()
+                metrics.CHAT_WRITER_QUEUE_SIZE.set(self._queue.qsize())
+
+
+# ========== Shared instance ==========
+_writer: ChatMessageWriter | None = None
+
+
+def get_writer() -> ChatMessageWriter | None:
+    """The running writer, or None in synchronous persistence mode"""
+    return _writer if _writer is not None and _writer.running else None
+
+
+def start_writer():
+    """Start the background writer if write-behind persistence is enabled"""
+    global _writer
+    if config.get("mode", "sync") != "write_behind":
+        return
+    _writer = ChatMessageWriter(
+        queue_size=config.get("queue_size", 10000),
+        batch_size=config.get("batch_size", 500),
+        flush_interval=config.get("flush_interval", 0.05),
+        enqueue_timeout=config.get("enqueue_timeout", 1.0),
+    )
+    _writer.start()
+    logger.info("Chat messages are persisted write-behind")
+
+
+async def stop_writer():
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
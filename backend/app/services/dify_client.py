@@ -1,43 +1,140 @@
+import asyncio
 import json
 import os
+import random
 from logging import getLogger
+from typing import Any, AsyncIterator, Dict
 
-import requests
+import httpx
 
+from backend.app.common import metrics
+from backend.app.common.circuit_breaker import CircuitBreaker
 from backend.app.common.config_loader import load_config
 from backend.app.common.log_setter import setup_logger
 
+# ========== Config ==========
+dify_config = load_config().get("dify") or {}
+
 # ========== Constants ==========
 # Intra connection between containers: designate "api" container
-DIFY_API_URL = "http://api:5001/v1"
+DIFY_API_URL = os.getenv("DIFY_API_URL") or dify_config.get(
+    "api_url", "http://api:5001/v1"
+)
 
 DIFY_API_KEY = os.getenv("DIFY_API_KEY")
 
+# Events carrying a chunk of the answer in `answer`
+ANSWER_EVENTS = ("message", "agent_message")
+
+# Responses worth another attempt (Dify / its proxy overloaded or restarting)
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# Failures before the request was sent, so resending cannot duplicate it.
+# Others (read timeout, dropped connection, ...) may come after Dify took it
+RETRY_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
 # ========== Logging Config ==========
 logger = getLogger(__name__)
 config = load_config(layer="logger")
 logger = setup_logger(logger=logger, config=config)
 
 
+# ========== Exceptions ==========
+class DifyError(Exception):
+    """Dify returned an error or the answer stream broke off"""
+
+
+class DifyUnavailableError(DifyError):
+    """Dify could not be reached (retries exhausted or circuit breaker open)"""
+
+
+class _RetryableStatusError(Exception):
+    pass
+
+
 # ========== Dify API Client Class ==========
 class DifyClient:
+    """
+    Async client for the Dify chat-messages API.
+
+    Holds one pooled, keep-alive `httpx.AsyncClient` for the lifetime of the
+    app (see `get_dify_client`). Requests that never reached Dify (connect
+    errors, pool timeouts) or that it turned away with a retryable status
+    are retried with jittered exponential backoff. Any other failure is
+    final, since Dify may already have the query and resending would post
+    it to the conversation twice.
+    """
+
+    def __init__(self, settings: Dict[str, Any] | None = None):
+        settings = dify_config if settings is None else settings
+        timeouts = settings.get("timeouts") or {}
+        pool = settings.get("pool") or {}
+        retry = settings.get("retry") or {}
+        breaker = settings.get("circuit_breaker") or {}
+
+        self.client = httpx.AsyncClient(
+            base_url=DIFY_API_URL,
+            headers=self.get_headers(),
+            timeout=httpx.Timeout(
+                connect=timeouts.get("connect", 3.0),
+                # Max silence between two chunks of the stream
+                read=timeouts.get("read", 60.0),
+                write=timeouts.get("write", 10.0),
+                pool=timeouts.get("pool", 5.0),
+            ),
+            limits=httpx.Limits(
+                max_connections=pool.get("max_connections", 100),
+                max_keepalive_connections=pool.get("max_keepalive_connections", 20),
+                keepalive_expiry=pool.get("keepalive_expiry", 30.0),
+            ),
+        )
+        self.max_attempts = retry.get("max_attempts", 3)
+        self.backoff_base = retry.get("backoff_base", 0.2)
+        self.backoff_max = retry.get("backoff_max", 2.0)
+        self.breaker = CircuitBreaker(
+            failure_threshold=breaker.get("failure_threshold", 5),
+            reset_timeout=breaker.get("reset_timeout", 30.0),
+        )
+
     def get_headers(self):
         return {
             "Authorization": f"Bearer {DIFY_API_KEY}",
             "Content-Type": "application/json",
         }
 
-    def chat(self, user_input: str, user_id: str, conversation_id: str | None = None):
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max, base * 2^attempt)]"""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+    def _record_failure(self):
+        self.breaker.record_failure()
+        metrics.DIFY_CIRCUIT_OPEN.set(int(self.breaker.is_open))
+
+    def _record_success(self):
+        self.breaker.record_success()
+        metrics.DIFY_CIRCUIT_OPEN.set(0)
+
+    async def stream_chat(
+        self, user_input: str, user_id: str, conversation_id: str | None = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Call Diy chat-messages API and get response in stream
+        Call Dify chat-messages API in streaming mode and yield its events
+        (`message` / `agent_message` chunks, `message_end`, ...) as they arrive
 
         Args:
             user_input (str): User input
-            session_id (str): Session ID
-        """
-
-        url = f"{DIFY_API_URL}/chat-messages"
+            user_id (str): Session ID
+            conversation_id (str | None): Dify conversation to continue
 
+        Raises:
+            DifyUnavailableError: Dify could not be reached
+            DifyError: Dify rejected the request or the stream broke off
+        """
         payload = {
             "inputs": {},
             "query": user_input,
@@ -48,40 +145,103 @@ class DifyClient:
         if conversation_id:
             payload["conversation_id"] = conversation_id
 
-        try:
-            response = requests.post(
-                url=url, headers=self.get_headers(), json=payload, stream=True
-            )
-
-            response.raise_for_status()
-
-            # Process response line by line
-            final_answer = ""
-            dify_conversation_id = None
-            for line in response.iter_lines():
-                if line:
-                    decoded_line = line.decode("utf-8")
-                    if decoded_line.startswith("data:"):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise DifyUnavailableError("Dify circuit breaker is open")
+
+            attempt += 1
+            started = False
+            try:
+                async with self.client.stream(
+                    "POST", "/chat-messages", json=payload
+                ) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode(errors="replace")
+                        message = f"Dify returned {response.status_code}: {body}"
+                        if response.status_code in RETRY_STATUS_CODES:
+                            raise _RetryableStatusError(message)
+                        raise DifyError(message)
+
+                    # Process response line by line
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
                         # remove "data:"
-                        json_str = decoded_line[len("data:") :].strip()
+                        json_str = line[len("data:") :].strip()
                         try:
                             data = json.loads(json_str)
-                            # Extract response field from
-                            # 'agent_message' or 'message' event
-                            if data.get("event") in ["agent_message", "message"]:
-                                final_answer += data.get("answer", "")
-
-                            if data.get("event") == "message_end":
-                                dify_conversation_id = data.get("conversation_id")
                         except json.JSONDecodeError:
-                            logger.error(f"Invalid JSON: {decoded_line}")
+                            logger.error(f"Invalid JSON: {line}")
                             continue
 
-            return final_answer, dify_conversation_id
+                        if not started:
+                            started = True
+                            self._record_success()
+                        yield data
+                return
+
+            except (httpx.TransportError, _RetryableStatusError) as e:
+                self._record_failure()
+                if started:
+                    raise DifyError(f"Dify stream broke off: {e!r}") from e
+                if not isinstance(e, (*RETRY_TRANSPORT_ERRORS, _RetryableStatusError)):
+                    raise DifyError(f"Dify request failed after sending: {e!r}") from e
+                if attempt >= self.max_attempts:
+                    raise DifyUnavailableError(
+                        f"Dify unreachable after {attempt} attempts: {e!r}"
+                    ) from e
+
+                delay = self._backoff(attempt)
+                logger.warning(
+                    f"Dify request failed ({e!r}), retry {attempt} in {delay:.2f}s"
+                )
+                metrics.DIFY_RETRIES_TOTAL.inc()
+                await asyncio.sleep(delay)
+
+    async def chat(
+        self, user_input: str, user_id: str, conversation_id: str | None = None
+    ):
+        """
+        Call Diy chat-messages API and get the complete answer
+
+        Args:
+            user_input (str): User input
+            session_id (str): Session ID
+
+        Raises:
+            DifyUnavailableError: Dify could not be reached
+            DifyError: Dify rejected the request or the stream broke off
+        """
+        final_answer = ""
+        dify_conversation_id = None
+        async for data in self.stream_chat(user_input, user_id, conversation_id):
+            # Extract response field from
+            # 'agent_message' or 'message' event
+            if data.get("event") in ANSWER_EVENTS:
+                final_answer += data.get("answer", "")
+
+            if data.get("event") == "message_end":
+                dify_conversation_id = data.get("conversation_id")
+
+        return final_answer, dify_conversation_id
+
+
+# ========== Shared instance ==========
+_client: DifyClient | None = None
+
+
+def get_dify_client() -> DifyClient:
+    """App-wide client: one connection pool and circuit breaker per worker"""
+    global _client
+    if _client is None:
+        _client = DifyClient()
+    return _client
+
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Dify API: {e}")
-            if e.response is not None:
-                logger.error(f"Status code: {e.response.status_code}")
-                logger.error(f"Response: {e.response.text}")
-            return None, None
+async def close_dify_client():
+    """Close the shared client's connections (app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,162 @@
+"""
+Lazily loaded sentence embedding model shared by the API.
+
+`torch` and `sentence_transformers` are imported on first load only, so
+importing the API (e.g. for tests or workers that never search) stays cheap.
+
+Query vectors are reduced with the same projection as the stored article
+vectors (`embedding.projection`, common/vector_projection.py). It is loaded
+from the database separately from the model: a database outage or a missing
+fit fails queries (and `/ready`) until it is resolved, without dropping the
+loaded model.
+"""
+
+import threading
+import time
+from logging import getLogger
+from typing import Any, Dict, Optional
+
+from ..common.config_loader import load_config
+from ..common.vector_projection import Projection, active_projection
+
+logger = getLogger(__name__)
+
+# ========== Constants ==========
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+WARMUP_TEXT = "warmup"
+# A failed projection lookup is not retried sooner than this, so queries
+# during a database outage fail fast instead of each querying it
+PROJECTION_RETRY_SECONDS = 5.0
+
+_model = None
+_device: Optional[str] = None
+_load_seconds: Optional[float] = None
+_lock = threading.Lock()
+
+_projection: Optional[Projection] = None
+_projection_loaded = False
+_projection_error: Optional[str] = None
+_projection_failed_at = 0.0
+_projection_lock = threading.Lock()
+
+
+def _get_settings() -> Dict[str, Any]:
+    return load_config().get("embedding") or {}
+
+
+def load_model(warmup: bool = True):
+    """
+    Load the model (once) and optionally run a warmup encode so the first
+    real query does not pay for lazy kernel / tokenizer initialization.
+
+    Returns:
+        SentenceTransformer: The loaded model
+    """
+    global _model, _device, _load_seconds
+
+    if _model is not None:
+        return _model
+
+    with _lock:
+        if _model is not None:
+            return _model
+
+        settings = _get_settings()
+        model_name = settings.get("model_name", DEFAULT_MODEL_NAME)
+
+        start_time = time.perf_counter()
+
+        # Deferred heavy imports
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = settings.get("device") or (
+            "cuda" if torch.cuda.is_available() else "cpu"
+        )
+        logger.info(f"Loading embedding model {model_name} on {device}...")
+        model = SentenceTransformer(model_name, device=device)
+
+        if warmup:
+            model.encode(WARMUP_TEXT, convert_to_tensor=False, device=device)
+
+        _device = device
+        _load_seconds = time.perf_counter() - start_time
+        _model = model
+        logger.info(f"Embedding model ready in {_load_seconds:.2f} seconds.")
+
+    return _model
+
+
+def load_projection() -> Optional[Projection]:
+    """
+    Load the active projection (once; None when `method` is none).
+
+    Raises:
+        RuntimeError: The lookup failed, now or less than
+            PROJECTION_RETRY_SECONDS ago
+    """
+    global _projection, _projection_loaded, _projection_error, _projection_failed_at
+
+    if _projection_loaded:
+        return _projection
+
+    with _projection_lock:
+        if _projection_loaded:
+            return _projection
+        if (
+            _projection_error is not None
+            and time.monotonic() - _projection_failed_at < PROJECTION_RETRY_SECONDS
+        ):
+            raise RuntimeError(f"Vector projection unavailable: {_projection_error}")
+
+        from ..database import SessionLocal
+
+        try:
+            with SessionLocal() as db:
+                _projection = active_projection(db)
+        except Exception as e:
+            _projection_error = str(e)
+            _projection_failed_at = time.monotonic()
+            raise RuntimeError(f"Vector projection unavailable: {e}") from e
+
+        _projection_loaded = True
+        _projection_error = None
+
+    return _projection
+
+
+def is_ready() -> bool:
+    """Whether the model has been loaded and warmed up, and the projection loaded."""
+    return _model is not None and _projection_loaded
+
+
+def get_status() -> Dict[str, Any]:
+    """Model status for the readiness endpoint."""
+    return {
+        "model_loaded": _model is not None,
+        "model_name": _get_settings().get("model_name", DEFAULT_MODEL_NAME),
+        "device": _device,
+        "load_seconds": round(_load_seconds, 3) if _load_seconds else None,
+        "projection": (
+            {
+                "method": _projection.method,
+                "dim": _projection.dim,
+                "version": _projection.version,
+            }
+            if _projection is not None
+            else None
+        ),
+        "projection_loaded": _projection_loaded,
+        "projection_error": _projection_error,
+    }
+
+
+def encode(text: str):
+    """
+    Encode a single query into a numpy vector, projected like the stored
+    article vectors. Loads the model on first use if the lifespan hook did not.
+    """
+    model = load_model()
+    projection = load_projection()
+    vector = model.encode(text, convert_to_tensor=False, device=_device)
+    return projection.apply(vector) if projection is not None else vector
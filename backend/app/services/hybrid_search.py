@@ -0,0 +1,363 @@
+"""
+Hybrid (keyword + semantic) article search.
+
+By default the keyword stage (pg_trgm) and the vector re-rank (pgvector) are
+combined into one parameterized statement with a CTE. The statement text is
+constant, so asyncpg prepares it once per connection and reuses the
+server-side prepared statement from its statement cache on every later request.
+
+When the ANN sidecar is enabled (see services/ann_index.py), Postgres only
+runs the keyword stage and the final fetch by id; the re-rank runs in-process
+against the memory-mapped vectors.
+"""
+
+import asyncio
+import json
+from logging import getLogger
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..common import metrics
+from ..common.config_loader import load_config
+from ..common.title_normalizer import category_name, normalize_title, title_variants
+from . import ann_index, embedder
+
+logger = getLogger(__name__)
+
+# ========== Config ==========
+config = load_config().get("search") or {}
+
+# ========== Constants ==========
+CANDIDATE_LIMIT = 100  # Keyword stage candidates passed to re-ranking
+
+# Optional category scope over precomputed membership (category_members).
+# Evaluated as a hashed subplan inside each query, never as a Python post-filter.
+CATEGORY_FILTER = """(
+    CAST(:category AS text) IS NULL
+    OR {column} IN (
+        SELECT unnest(article_ids)
+        FROM category_members
+        WHERE category = CAST(:category AS text)
+    )
+)"""
+
+# Parameters are cast explicitly so their types never depend on inference.
+# Titles and bodies are matched separately (each by its own trigram index)
+# and a candidate's score is its better match.
+KEYWORD_SQL = f"""
+SELECT id, max(score) AS score
+FROM (
+    SELECT id, similarity(title, CAST(:q AS text)) AS score
+    FROM articles
+    WHERE title % CAST(:q AS text)
+    UNION ALL
+    SELECT article_id, similarity(content, CAST(:q AS text))
+    FROM article_bodies
+    WHERE content % CAST(:q AS text)
+) matches
+WHERE {CATEGORY_FILTER.format(column="id")}
+GROUP BY id
+ORDER BY max(score) DESC
+LIMIT :candidate_limit
+"""
+
+# Article bodies are only read for the final rows, and only when content or a
+# snippet is requested (snippet_size 0 disables the snippet): the condition
+# depends on parameters alone, so otherwise article_bodies is never touched.
+# One statement / plan still serves every projection.
+BODY_JOIN = """
+LEFT JOIN LATERAL (
+    SELECT
+        content,
+        CASE WHEN CAST(:snippet_size AS integer) > 0
+            THEN strpos(content, CAST(:q AS text)) ELSE 0
+        END AS match_pos
+    FROM article_bodies
+    WHERE article_id = a.id
+        AND (CAST(:include_content AS boolean) OR CAST(:snippet_size AS integer) > 0)
+) b ON true
+"""
+
+# The snippet is plain text cut from the body, centered on the first match of
+# the query (the start of the body without one); the match is given as
+# character offsets in the snippet, never as markup inside it
+SNIPPET_START = "greatest(b.match_pos - CAST(:snippet_size AS integer) / 2, 1)"
+
+RESULT_COLUMNS = f"""
+    a.id,
+    a.wiki_id,
+    a.title,
+    a.summary,
+    CASE WHEN CAST(:include_content AS boolean) THEN b.content END AS content,
+    CASE
+        WHEN b.match_pos > 0 THEN substr(
+            b.content,
+            {SNIPPET_START},
+            CAST(:snippet_size AS integer) + length(CAST(:q AS text))
+        )
+        WHEN CAST(:snippet_size AS integer) > 0
+            THEN left(b.content, CAST(:snippet_size AS integer))
+    END AS snippet,
+    CASE WHEN b.match_pos > 0 THEN b.match_pos - {SNIPPET_START} END AS match_start,
+    CASE WHEN b.match_pos > 0 THEN length(CAST(:q AS text)) END AS match_length,
+    a.created_at,
+    a.updated_at
+"""
+
+# Ranks the candidates on the hot columns, then fetches the page's rows
+SEARCH_SQL = f"""
+WITH candidates AS ({KEYWORD_SQL}),
+ranked AS (
+    SELECT
+        a.id,
+        a.content_vector <-> CAST(:query_vector AS vector) AS distance,
+        count(*) OVER () AS candidate_count
+    FROM candidates c
+    JOIN articles a ON a.id = c.id
+    ORDER BY distance
+    LIMIT :limit OFFSET :offset
+)
+SELECT
+    {RESULT_COLUMNS},
+    r.distance,
+    r.candidate_count
+FROM ranked r
+JOIN articles a ON a.id = r.id
+{BODY_JOIN}
+ORDER BY r.distance
+"""
+
+# Keyword candidates for the ANN sidecar path, with the wiki_id its rows are
+# checked against
+SIDECAR_KEYWORD_SQL = f"""
+SELECT c.id, a.wiki_id
+FROM ({KEYWORD_SQL}) c
+JOIN articles a ON a.id = c.id
+ORDER BY c.score DESC
+"""
+
+# Final page for the ANN sidecar path, ordered in Python
+FETCH_SQL = f"""
+SELECT {RESULT_COLUMNS}
+FROM articles a
+{BODY_JOIN}
+WHERE a.id = ANY(CAST(:ids AS integer[]))
+"""
+
+
+# Exact title (btree on articles.title) or redirect alias lookup
+TITLE_SQL = f"""
+WITH hits AS (
+    SELECT id, min(priority) AS priority
+    FROM (
+        SELECT id, 0 AS priority
+        FROM articles
+        WHERE title = ANY(CAST(:titles AS text[]))
+            AND {CATEGORY_FILTER.format(column="id")}
+        UNION ALL
+        SELECT a.id, 1 AS priority
+        FROM redirects r
+        JOIN articles a ON a.wiki_id = r.target_wiki_id
+        WHERE r.alias_normalized = CAST(:normalized AS text)
+            AND {CATEGORY_FILTER.format(column="a.id")}
+    ) matches
+    GROUP BY id
+)
+SELECT
+    {RESULT_COLUMNS},
+    count(*) OVER () AS candidate_count
+FROM hits h
+JOIN articles a ON a.id = h.id
+{BODY_JOIN}
+ORDER BY h.priority, a.id
+LIMIT :limit
+"""
+
+
+async def _explain(db: AsyncSession, sql: str, params: Dict[str, Any]):
+    """Log EXPLAIN ANALYZE of a search statement (debug only, runs it twice)"""
+    result = await db.execute(
+        text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params
+    )
+    logger.debug(f"EXPLAIN ANALYZE hybrid search: {json.dumps(result.scalar())}")
+
+
+async def _execute(db: AsyncSession, sql: str, params: Dict[str, Any]):
+    if config.get("explain_analyze", False):
+        await _explain(db, sql, params)
+    return await db.execute(text(sql), params)
+
+
+async def _search_with_sidecar(
+    db: AsyncSession, index: ann_index.AnnIndex, params: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    with metrics.SEARCH_KEYWORD_SECONDS.time():
+        candidates = (await _execute(db, SIDECAR_KEYWORD_SQL, params)).all()
+
+    if not candidates:
+        return []
+    candidate_ids = [row.id for row in candidates]
+
+    with metrics.SEARCH_RERANK_SECONDS.time():
+        ranked = index.rerank(
+            params["query_vector"], candidate_ids, [row.wiki_id for row in candidates]
+        )
+        start = params["offset"]
+        page = ranked[start : start + params["limit"]]
+
+    if not page:
+        return []
+
+    page_ids = [article_id for article_id, _ in page]
+    rows = (await _execute(db, FETCH_SQL, {**params, "ids": page_ids})).mappings()
+    rows_by_id = {row["id"]: dict(row) for row in rows}
+
+    return [
+        {
+            **rows_by_id[article_id],
+            # Not exported yet: no distance, as for rows without a vector
+            "distance": distance if distance != float("inf") else None,
+            "candidate_count": len(candidate_ids),
+        }
+        for article_id, distance in page
+        if article_id in rows_by_id
+    ]
+
+
+async def title_lookup(
+    db: AsyncSession,
+    q: str,
+    *,
+    limit: int,
+    include_content: bool = True,
+    snippet_size: int = 0,
+    category: str | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Exact title / redirect fast path, run before the fuzzy search.
+
+    Returns:
+        List[Dict[str, Any]]: Articles titled `q` first, then redirect targets
+    """
+    params = {
+        "q": q,
+        "titles": title_variants(q),
+        "normalized": normalize_title(q),
+        "limit": limit,
+        "include_content": include_content,
+        "snippet_size": snippet_size,
+        "category": category,
+    }
+
+    with metrics.SEARCH_TITLE_SECONDS.time():
+        result = await _execute(db, TITLE_SQL, params)
+        return [dict(row) for row in result.mappings().all()]
+
+
+async def ranked_search(
+    db: AsyncSession,
+    q: str,
+    query_vector,
+    *,
+    limit: int,
+    offset: int = 0,
+    include_content: bool = True,
+    snippet_size: int = 0,
+    category: str | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Keyword candidates re-ranked by vector distance.
+
+    Args:
+        db (AsyncSession): Database session
+        q (str): Search query
+        query_vector: Encoded query
+        limit (int): Page size
+        offset (int): Number of re-ranked results to skip
+        include_content (bool): Return the full article body
+        snippet_size (int): Snippet window size around the match, 0 to disable
+        category (str | None): Only search articles in this category (tree)
+
+    Returns:
+        List[Dict[str, Any]]: Result rows ordered by vector distance.
+            Each row carries its L2 `distance` to the query (None without a
+            vector) and `candidate_count`, the keyword stage hit count.
+    """
+    params = {
+        "q": q,
+        "candidate_limit": CANDIDATE_LIMIT,
+        "query_vector": query_vector,
+        "limit": limit,
+        "offset": offset,
+        "include_content": include_content,
+        "snippet_size": snippet_size,
+        "category": category,
+    }
+
+    index = ann_index.get_index()
+    if index is not None:
+        rows = await _search_with_sidecar(db, index, params)
+    else:
+        with metrics.SEARCH_HYBRID_QUERY_SECONDS.time():
+            result = await _execute(db, SEARCH_SQL, params)
+            rows = [dict(row) for row in result.mappings().all()]
+
+    if rows:
+        metrics.SEARCH_CANDIDATES_TOTAL.inc(rows[0]["candidate_count"])
+    return rows
+
+
+async def search(
+    db: AsyncSession,
+    q: str,
+    *,
+    limit: int,
+    offset: int = 0,
+    include_content: bool = True,
+    snippet_size: int = 0,
+    category: str | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Full search: exact title / redirect fast path (see `title_fast_path`
+    in config.yaml), then query encoding and the ranked hybrid search.
+    Arguments and result rows are the same as `ranked_search`; `category`
+    may be given with or without its "Category:" prefix.
+
+    Pages are slices of one ordering: with short_circuit, the title hits
+    only (later pages are empty); with boost, the title hits followed by the
+    hybrid results without them.
+    """
+    options = {
+        "include_content": include_content,
+        "snippet_size": snippet_size,
+        "category": category_name(category) if category else None,
+    }
+    fast_path = config.get("title_fast_path", "short_circuit")
+    end = offset + limit
+
+    title_hits = []
+    if fast_path != "off":
+        title_hits = await title_lookup(db, q, limit=end, **options)
+
+    if title_hits:
+        metrics.SEARCH_TITLE_HITS_TOTAL.inc()
+        if fast_path == "short_circuit":
+            return title_hits[offset:end]
+
+    with metrics.SEARCH_ENCODE_SECONDS.time():
+        # CPU-bound: keep it off the event loop
+        query_vector = await asyncio.to_thread(embedder.encode, q)
+
+    if not title_hits:
+        return await ranked_search(
+            db, q, query_vector, limit=limit, offset=offset, **options
+        )
+
+    # Boost: title hits first, then the remaining hybrid results. The first
+    # `end` hybrid rows are enough: each title hit removes at most one of them
+    rows = await ranked_search(db, q, query_vector, limit=end, offset=0, **options)
+    hit_ids = {row["id"] for row in title_hits}
+    rows = [row for row in rows if row["id"] not in hit_ids]
+    return (title_hits + rows)[offset:end]
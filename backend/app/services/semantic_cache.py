@@ -0,0 +1,138 @@
+"""
+Semantic answer cache for first-turn chat queries (`chat.semantic_cache`).
+
+Queries that start a new conversation are embedded with the search model
+(services/embedder.py); if a recently answered query is closer than
+`threshold` (cosine similarity), its answer is reused instead of asking Dify.
+Only the first message of a session is looked up; follow-up turns are never
+cached, their answer depends on the conversation (api/chat.py).
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from logging import getLogger
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ..common import metrics
+from ..common.config_loader import load_config
+from . import embedder
+
+logger = getLogger(__name__)
+
+# ========== Config ==========
+config = (load_config().get("chat") or {}).get("semantic_cache") or {}
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache over unit-normalized query vectors.
+
+    Vectors live in one preallocated matrix (one row per slot), so a lookup
+    is a single matrix-vector product over at most `maxsize` rows. Entries
+    expire `ttl` seconds after they were stored; beyond `maxsize` the least
+    recently used one is evicted.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 600.0, threshold=0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(maxsize, dtype=bool)
+        # slot -> (expires_at, query, answer), in LRU order
+        self._entries: OrderedDict[int, Tuple[float, str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _evict(self, slot: int):
+        del self._entries[slot]
+        self._valid[slot] = False
+
+    def get(self, vector) -> Optional[str]:
+        """Cached answer of the most similar live query, if above `threshold`"""
+        with self._lock:
+            if not self._entries:
+                return None
+
+            now = time.monotonic()
+            for slot in [s for s, e in self._entries.items() if e[0] <= now]:
+                self._evict(slot)
+
+            slots = np.flatnonzero(self._valid)
+            if not len(slots):
+                return None
+
+            similarities = self._vectors[slots] @ self._normalize(vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            return self._entries[slot][2]
+
+    def put(self, vector, query: str, answer: str):
+        vector = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+
+            if len(self._entries) >= self.maxsize:
+                self._evict(next(iter(self._entries)))
+            slot = int(np.flatnonzero(~self._valid)[0])
+
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = (time.monotonic() + self.ttl, query, answer)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._valid[:] = False
+
+
+# ========== Shared instance ==========
+_cache = SemanticCache(
+    maxsize=config.get("maxsize", 1000),
+    ttl=config.get("ttl", 600),
+    threshold=config.get("threshold", 0.95),
+)
+
+
+def is_enabled() -> bool:
+    return config.get("enabled", False)
+
+
+async def embed(query: str) -> Optional[np.ndarray]:
+    """
+    Query vector for the cache, or None when the cache is disabled or the
+    embedding model is still loading (the turn then goes straight to Dify).
+    """
+    if not is_enabled() or not embedder.is_ready():
+        return None
+    # CPU-bound: keep it off the event loop
+    return await asyncio.to_thread(embedder.encode, query)
+
+
+def get_answer(query_vector) -> Optional[str]:
+    answer = _cache.get(query_vector)
+    if answer is None:
+        metrics.SEMANTIC_CACHE_MISSES.inc()
+    else:
+        metrics.SEMANTIC_CACHE_HITS.inc()
+    return answer
+
+
+def put_answer(query_vector, query: str, answer: str):
+    _cache.put(query_vector, query, answer)
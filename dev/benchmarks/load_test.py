@@ -0,0 +1,437 @@
+"""
+Load test of the API: article search and chat under a ramp of concurrent users.
+
+Each virtual user loops: pick an endpoint by the --mix weights, pick a query
+from the corpus file, send the request, wait --think-time (exponential, 0 by
+default). Users are added following the ramp profile:
+
+- none: all --users from the start
+- linear: from 1 to --users over --ramp-time seconds
+- step: --users / --steps more users every --ramp-time / --steps seconds
+
+The report has throughput, error rate and p50/p95/p99 latency per endpoint,
+for the whole run and per --window seconds with the number of active users,
+so the concurrency where latency takes off can be read off the table.
+`chat_stream` also reports the time to the first SSE event.
+
+Usage (from the project root):
+    # Against a running API whose DIFY_API_URL points at dev/mock_dify.py
+    python dev/benchmarks/load_test.py --base-url http://localhost:8088 \\
+        --users 50 --ramp linear --ramp-time 60 --duration 180
+
+    # Start dev/mock_dify.py and the API (DATABASE_URL: the docker-compose
+    # Postgres) for the run: fully offline
+    python dev/benchmarks/load_test.py --serve --users 100 --ramp step --steps 5 \\
+        --dify-args "--chunks 100 --tokens-per-second 40 --jitter 0.3"
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import shlex
+import subprocess
+import sys
+import time
+import uuid
+from argparse import ArgumentParser
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+
+# ========== Constants ==========
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "queries.txt")
+DEFAULT_MIX = "search=8,chat=1,chat_stream=1"
+RAMPS = ("none", "linear", "step")
+PERCENTILES = (50, 95, 99)
+POLL_INTERVAL = 0.1
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    # Seconds since the start of the run
+    started: float
+    latency: float
+    ok: bool
+    status: Optional[int]
+    users: int
+
+
+# ========== Endpoints ==========
+async def search(client: httpx.AsyncClient, query: str, user: dict, options) -> int:
+    params = {"q": query, **options.search_params}
+    response = await client.get("/api/articles/search", params=params)
+    return response.status_code
+
+
+async def chat(client: httpx.AsyncClient, query: str, user: dict, options) -> int:
+    response = await client.post(
+        "/api/chat/",
+        json={
+            "session_id": user["session_id"],
+            "query": query,
+            "bypass_cache": options.bypass_cache,
+        },
+    )
+    return response.status_code
+
+
+async def chat_stream(
+    client: httpx.AsyncClient, query: str, user: dict, options
+) -> int:
+    payload = {
+        "session_id": user["session_id"],
+        "query": query,
+        "bypass_cache": options.bypass_cache,
+    }
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/chat/stream", json=payload) as response:
+        first_event = None
+        failed = response.status_code >= 400
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            if first_event is None:
+                first_event = time.perf_counter() - started
+            if '"event": "error"' in line or '"event":"error"' in line:
+                failed = True
+        if first_event is not None:
+            user["recorder"]("chat_stream:first_event", started, first_event, True)
+    # An error event after a 200 still counts as a failed request
+    return 599 if failed and response.status_code < 400 else response.status_code
+
+
+ENDPOINTS: Dict[str, Callable] = {
+    "search": search,
+    "chat": chat,
+    "chat_stream": chat_stream,
+}
+
+
+# ========== Run ==========
+def load_corpus(path: str) -> List[str]:
+    """One query per line; blank lines and lines starting with # are skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f]
+    queries = [query for query in queries if query and not query.startswith("#")]
+    if not queries:
+        raise ValueError(f"No queries in {path}")
+    return queries
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def target_users(elapsed: float, options) -> int:
+    """Users that should be active `elapsed` seconds into the run"""
+    if options.ramp == "none" or options.ramp_time <= 0:
+        return options.users
+    if options.ramp == "linear":
+        return max(1, math.ceil(options.users * min(1.0, elapsed / options.ramp_time)))
+    step_seconds = options.ramp_time / options.steps
+    step = min(options.steps, int(elapsed // step_seconds) + 1)
+    return max(1, math.ceil(options.users * step / options.steps))
+
+
+class LoadTest:
+    def __init__(self, options):
+        self.options = options
+        self.queries = load_corpus(options.corpus)
+        self.mix = parse_mix(options.mix)
+        self.rng = random.Random(options.seed)
+        self.samples: List[Sample] = []
+        self.active_users = 0
+        self.stop = asyncio.Event()
+        self.started_at = 0.0
+
+    def record(
+        self, endpoint: str, started: float, latency: float, ok: bool, status=None
+    ):
+        self.samples.append(
+            Sample(
+                endpoint=endpoint,
+                started=started - self.started_at,
+                latency=latency,
+                ok=ok,
+                status=status,
+                users=self.active_users,
+            )
+        )
+
+    async def user(self, client: httpx.AsyncClient):
+        options = self.options
+        state = {"session_id": f"loadtest-{uuid.uuid4()}", "recorder": self.record}
+        names, weights = list(self.mix), list(self.mix.values())
+        while not self.stop.is_set():
+            endpoint = self.rng.choices(names, weights)[0]
+            query = self.rng.choice(self.queries)
+            started = time.perf_counter()
+            status = None
+            try:
+                status = await ENDPOINTS[endpoint](client, query, state, options)
+                ok = status < 400
+            except httpx.HTTPError:
+                ok = False
+            if self.stop.is_set():
+                # Cut short by the end of the run: not a real measurement
+                break
+            self.record(endpoint, started, time.perf_counter() - started, ok, status)
+
+            if options.think_time > 0:
+                await asyncio.sleep(self.rng.expovariate(1.0 / options.think_time))
+
+    async def run(self):
+        options = self.options
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(
+            base_url=options.base_url, timeout=options.timeout, limits=limits
+        ) as client:
+            self.started_at = time.perf_counter()
+            users: List[asyncio.Task] = []
+            while (elapsed := time.perf_counter() - self.started_at) < options.duration:
+                while len(users) < target_users(elapsed, options):
+                    users.append(asyncio.create_task(self.user(client)))
+                    self.active_users = len(users)
+                await asyncio.sleep(POLL_INTERVAL)
+
+            self.stop.set()
+            # In-flight requests are dropped rather than waited for
+            for task in users:
+                task.cancel()
+            await asyncio.gather(*users, return_exceptions=True)
+
+
+# ========== Report ==========
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted `values`"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(samples: List[Sample], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(sample.latency for sample in samples)
+    errors = sum(1 for sample in samples if not sample.ok)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else None,
+        "throughput": round(len(samples) / seconds, 2) if seconds else None,
+        "mean_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "max_ms": _ms(latencies[-1]) if latencies else None,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = _ms(percentile(latencies, p))
+    return summary
+
+
+def build_report(test: LoadTest) -> Dict[str, Any]:
+    options = test.options
+    by_endpoint = defaultdict(list)
+    by_window = defaultdict(lambda: defaultdict(list))
+    for sample in test.samples:
+        by_endpoint[sample.endpoint].append(sample)
+        by_window[int(sample.started // options.window)][sample.endpoint].append(sample)
+
+    windows = []
+    for index in sorted(by_window):
+        endpoints = by_window[index]
+        windows.append(
+            {
+                "start": index * options.window,
+                "users": max(
+                    s.users for samples in endpoints.values() for s in samples
+                ),
+                "endpoints": {
+                    name: summarize(samples, options.window)
+                    for name, samples in sorted(endpoints.items())
+                },
+            }
+        )
+
+    return {
+        "base_url": options.base_url,
+        "users": options.users,
+        "ramp": options.ramp,
+        "ramp_time": options.ramp_time,
+        "duration": options.duration,
+        "mix": test.mix,
+        "endpoints": {
+            name: summarize(samples, options.duration)
+            for name, samples in sorted(by_endpoint.items())
+        },
+        "windows": windows,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'endpoint':24} {'req':>7} {'err%':>6} {'req/s':>8} " + " ".join(
+        f"{f'p{p} ms':>9}" for p in PERCENTILES
+    )
+    print(f"\n{report['users']} users, ramp {report['ramp']}, {report['duration']}s")
+    print(header)
+    for name, stats in report["endpoints"].items():
+        print(_row(name, stats))
+
+    print("\nPer window:")
+    print(f"{'start':>6} {'users':>6} " + header)
+    for window in report["windows"]:
+        for name, stats in window["endpoints"].items():
+            print(f"{window['start']:>5}s {window['users']:>6} " + _row(name, stats))
+
+
+def _row(name: str, stats: Dict[str, Any]) -> str:
+    error_rate = (stats["error_rate"] or 0.0) * 100
+    latencies = " ".join(f"{_format(stats[f'p{p}_ms'])}" for p in PERCENTILES)
+    return (
+        f"{name:24} {stats['requests']:>7} {error_rate:>5.1f}% "
+        f"{_format(stats['throughput'])} {latencies}"
+    )
+
+
+def _format(value: Optional[float]) -> str:
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+# ========== Local servers ==========
+def _env(**extra: str) -> Dict[str, str]:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.join(os.getcwd(), "backend"), os.getcwd(), env.get("PYTHONPATH", "")]
+    )
+    env.update(extra)
+    return env
+
+
+def _wait_ready(url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def start_servers(options) -> List[subprocess.Popen]:
+    """Starts dev/mock_dify.py and the API pointed at it"""
+    dify_port = options.dify_port
+    mock = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join("dev", "mock_dify.py"),
+            "--port",
+            str(dify_port),
+            *shlex.split(options.dify_args),
+        ],
+        env=_env(),
+    )
+    api_port = httpx.URL(options.base_url).port or 80
+    api = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "backend.app.main:app",
+            "--port",
+            str(api_port),
+            "--workers",
+            str(options.api_workers),
+            "--log-level",
+            "warning",
+        ],
+        env=_env(DIFY_API_URL=f"http://127.0.0.1:{dify_port}/v1"),
+    )
+    servers = [mock, api]
+    try:
+        _wait_ready(f"http://127.0.0.1:{dify_port}/docs", options.startup_timeout)
+        _wait_ready(f"{options.base_url}/ready", options.startup_timeout)
+    except Exception:
+        stop_servers(servers)
+        raise
+    return servers
+
+
+def stop_servers(servers: List[subprocess.Popen]):
+    for server in servers:
+        server.terminate()
+    for server in servers:
+        server.wait()
+
+
+def main():
+    parser = ArgumentParser(description="Load test of the search and chat API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8088")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds")
+    parser.add_argument("--ramp", choices=RAMPS, default="linear")
+    parser.add_argument("--ramp-time", type=float, default=30.0)
+    parser.add_argument("--steps", type=int, default=4, help="Steps of --ramp step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights")
+    parser.add_argument(
+        "--corpus", default=DEFAULT_CORPUS, help="Queries, one per line"
+    )
+    parser.add_argument(
+        "--search-params",
+        default="limit=10",
+        help="Extra query string of searches, e.g. 'limit=20&snippet=true'",
+    )
+    parser.add_argument("--bypass-cache", action="store_true")
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="Mean seconds between requests"
+    )
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout")
+    parser.add_argument("--window", type=float, default=10.0, help="Report window")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the report here")
+    parser.add_argument(
+        "--serve", action="store_true", help="Start mock Dify and the API for the run"
+    )
+    parser.add_argument("--dify-port", type=int, default=5010)
+    parser.add_argument("--dify-args", default="", help="Options of dev/mock_dify.py")
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    options = parser.parse_args()
+    options.search_params = dict(parse_qsl(options.search_params))
+
+    servers = start_servers(options) if options.serve else []
+    try:
+        test = LoadTest(options)
+        asyncio.run(test.run())
+    finally:
+        stop_servers(servers)
+
+    report = build_report(test)
+    print_report(report)
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {**report, "samples": [asdict(s) for s in test.samples]},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Recall vs. size and speed of the vector projections (`embedding.projection`,
+backend/app/common/vector_projection.py).
+
+Encodes a sample of parsed articles (data/raw/articles.jsonl) and queries
+with the embedding model, takes the exact top-k of the full 384-dim vectors
+as ground truth and reports, per method and dimension:
+
+- recall@k: share of the ground-truth top-k found in the projected top-k
+- bytes: pgvector storage per vector (4 bytes a dim + 8 byte header)
+  and for the whole sample
+- flat_ms: exact search latency per query over the sample (numpy)
+- hnsw_ms / hnsw_recall / hnsw_build_s: same with a FAISS HNSW graph
+  (--hnsw, needs `pip install faiss-cpu`)
+
+Queries are dev/benchmarks/queries.txt plus the titles of random articles.
+
+Usage (from the project root):
+    python dev/benchmarks/projection_bench.py --articles 20000 --dims 64,128,256
+    python dev/benchmarks/projection_bench.py --cache data/bench/vectors.npz --json out.json
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+sys.path[:0] = [os.getcwd(), os.path.join(os.getcwd(), "backend")]
+
+from backend.app.common.config_loader import load_config
+from backend.app.common.vector_projection import MODEL_DIM, Projection, normalize
+
+DEFAULT_INPUT = os.path.join("data/raw", "articles.jsonl")
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "queries.txt")
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# pgvector: 4-byte dimension count and 4 reserved bytes per value
+VECTOR_HEADER_BYTES = 8
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+
+def read_sample(path: str, size: int, seed: int) -> Tuple[List[str], List[str]]:
+    """(titles, contents) of `size` articles, reservoir-sampled"""
+    rng = random.Random(seed)
+    sample: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if index < size:
+                sample.append(line)
+            else:
+                slot = rng.randrange(index + 1)
+                if slot < size:
+                    sample[slot] = line
+    articles = [json.loads(line) for line in sample]
+    return [a["title"] for a in articles], [a["content"] for a in articles]
+
+
+def load_queries(path: str) -> List[str]:
+    """One query per line; blank lines and lines starting with # are skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f]
+    return [query for query in queries if query and not query.startswith("#")]
+
+
+def encode(texts: List[str], batch_size: int) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    model_name = (load_config().get("embedding") or {}).get(
+        "model_name", DEFAULT_MODEL_NAME
+    )
+    model = SentenceTransformer(model_name)
+    vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def load_vectors(options) -> Tuple[np.ndarray, np.ndarray]:
+    """(article vectors, query vectors), from --cache when it exists"""
+    if options.cache and os.path.exists(options.cache):
+        cached = np.load(options.cache)
+        return cached["articles"], cached["queries"]
+
+    titles, contents = read_sample(options.input, options.articles, options.seed)
+    rng = random.Random(options.seed)
+    queries = load_queries(options.queries)
+    queries += rng.sample(titles, min(options.title_queries, len(titles)))
+    print(f"Encoding {len(contents)} articles and {len(queries)} queries...")
+    article_vectors = encode(contents, options.batch_size)
+    query_vectors = encode(queries, options.batch_size)
+
+    if options.cache:
+        os.makedirs(os.path.dirname(options.cache) or ".", exist_ok=True)
+        np.savez(options.cache, articles=article_vectors, queries=query_vectors)
+    return article_vectors, query_vectors
+
+
+def top_k(articles: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k nearest articles (L2) of each query"""
+    # |a - q|^2 = |a|^2 - 2 a.q + |q|^2; |q|^2 does not change the order
+    distances = (articles**2).sum(axis=1) - 2 * queries @ articles.T
+    nearest = np.argpartition(distances, k, axis=1)[:, :k]
+    order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_per_query(search, queries: np.ndarray, repeat: int) -> float:
+    """Best-of-`repeat` milliseconds per query"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        search(queries)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1000
+
+
+def hnsw_stats(
+    articles: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, repeat: int
+) -> Dict[str, Any]:
+    import faiss
+
+    index = faiss.IndexHNSWFlat(articles.shape[1], HNSW_M)
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    start = time.perf_counter()
+    index.add(np.ascontiguousarray(articles))
+    build_seconds = time.perf_counter() - start
+    queries = np.ascontiguousarray(queries)
+    _, found = index.search(queries, k)
+    return {
+        "hnsw_build_s": round(build_seconds, 2),
+        "hnsw_ms": round(
+            time_per_query(lambda q: index.search(q, k), queries, repeat), 4
+        ),
+        "hnsw_recall": round(recall(found, truth), 4),
+    }
+
+
+def measure(
+    projection: Projection,
+    articles: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    options,
+) -> Dict[str, Any]:
+    projected = projection.apply(articles)
+    projected_queries = projection.apply(queries)
+    k = options.k
+    vector_bytes = 4 * projection.dim + VECTOR_HEADER_BYTES
+    result = {
+        "method": projection.method,
+        "dim": projection.dim,
+        f"recall@{k}": round(recall(top_k(projected, projected_queries, k), truth), 4),
+        "explained_variance": (
+            round(projection.explained_variance, 4)
+            if projection.explained_variance is not None
+            else None
+        ),
+        "bytes": vector_bytes,
+        "sample_mb": round(vector_bytes * len(articles) / 2**20, 2),
+        "flat_ms": round(
+            time_per_query(
+                lambda q: top_k(projected, q, k), projected_queries, options.repeat
+            ),
+            4,
+        ),
+    }
+    if options.hnsw:
+        result.update(
+            hnsw_stats(projected, projected_queries, truth, k, options.repeat)
+        )
+    return result
+
+
+def run(options) -> Dict[str, Any]:
+    articles, queries = load_vectors(options)
+    articles, queries = normalize(articles), normalize(queries)
+    k = options.k
+    truth = top_k(articles, queries, k)
+
+    rng = np.random.default_rng(options.seed)
+    fit_sample = articles[
+        rng.choice(len(articles), min(options.fit_size, len(articles)), replace=False)
+    ]
+
+    # Baseline: the full vectors (recall 1.0)
+    results = [
+        measure(Projection("none", MODEL_DIM), articles, queries, truth, options)
+    ]
+    for method in options.methods.split(","):
+        for dim in sorted(int(d) for d in options.dims.split(",")):
+            projection = Projection.fit(method, dim, fit_sample)
+            results.append(measure(projection, articles, queries, truth, options))
+    return {
+        "articles": len(articles),
+        "queries": len(queries),
+        "k": k,
+        "fit_size": len(fit_sample),
+        "results": results,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    k = report["k"]
+    print(
+        f"\n{report['articles']} articles, {report['queries']} queries, "
+        f"PCA fitted on {report['fit_size']}"
+    )
+    columns = ["method", "dim", f"recall@{k}", "explained_variance", "bytes"]
+    columns += ["sample_mb", "flat_ms", "hnsw_ms", "hnsw_recall", "hnsw_build_s"]
+    columns = [c for c in columns if any(c in r for r in report["results"])]
+    print(" ".join(f"{c:>18}" for c in columns))
+    for result in report["results"]:
+        print(" ".join(f"{_format(result.get(c)):>18}" for c in columns))
+
+
+def _format(value) -> str:
+    return "-" if value is None else str(value)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Parser output")
+    parser.add_argument("--articles", type=int, default=20000, help="Sample size")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Query corpus")
+    parser.add_argument(
+        "--title-queries", type=int, default=500, help="Article titles as queries"
+    )
+    parser.add_argument("--methods", default="pca,truncate")
+    parser.add_argument("--dims", default="64,96,128,192,256")
+    parser.add_argument("--fit-size", type=int, default=50000, help="PCA sample")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="Latency runs")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache", default=None, help="Load / save the encoded vectors here (.npz)"
+    )
+    parser.add_argument(
+        "--hnsw", action="store_true", help="Also measure a FAISS HNSW index"
+    )
+    parser.add_argument("--json", default=None, help="Also write the report here")
+    options = parser.parse_args()
+
+    report = run(options)
+    print_report(report)
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure API cold start.
+
+- import: time to `import backend.app.main` in a fresh interpreter
+- listening: time until uvicorn answers `GET /`
+- ready: time until `GET /ready` returns 200 (model loaded and warmed up)
+
+Usage (from the project root):
+    python dev/benchmarks/startup_bench.py --runs 3
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from statistics import median
+
+import requests
+
+POLL_INTERVAL = 0.05
+
+
+def _env():
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.join(os.getcwd(), "backend"), os.getcwd(), env.get("PYTHONPATH", "")]
+    )
+    return env
+
+
+def measure_import() -> float:
+    code = (
+        "import time; t = time.perf_counter(); import backend.app.main; "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(port: int, timeout: float) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    start_time = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "backend.app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    listening = ready = None
+    try:
+        while time.perf_counter() - start_time < timeout:
+            try:
+                if listening is None:
+                    requests.get(f"{base_url}/", timeout=1)
+                    listening = time.perf_counter() - start_time
+                if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                    ready = time.perf_counter() - start_time
+                    break
+            except requests.exceptions.ConnectionError:
+                pass
+            time.sleep(POLL_INTERVAL)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    return {"listening": listening, "ready": ready}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    imports, listening, ready = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        result = measure_startup(args.port, args.timeout)
+        if result["listening"] is not None:
+            listening.append(result["listening"])
+        if result["ready"] is not None:
+            ready.append(result["ready"])
+
+    report = {
+        "runs": args.runs,
+        "import_seconds_median": median(imports),
+        "listening_seconds_median": median(listening) if listening else None,
+        "ready_seconds_median": median(ready) if ready else None,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
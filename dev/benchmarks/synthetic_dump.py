@@ -0,0 +1,419 @@
+"""
+Generate a deterministic, synthetic MediaWiki export (jawiki-like) for benchmarks.
+
+The output has the same shape as `jawiki-latest-pages-articles.xml.bz2`:
+the `export-0.11` namespace, a <siteinfo> with the namespaces, and pages of
+every kind the parser handles (articles, redirects with <redirect/>, category
+pages, and Template: / Wikipedia: pages it skips). Article wikitext is
+Japanese prose with an infobox, sections, links, references, a table and
+categories; its length follows a log-normal distribution close to jawiki's.
+
+The same seed and page count always produce the same bytes. The small
+vocabulary compresses better than real text (about 11x against 4-5x), so
+bz2 decompression is somewhat cheaper than on a real dump.
+
+Usage (from the project root):
+    python dev/benchmarks/synthetic_dump.py --pages 20000 --output data/bench/small.xml.bz2
+    python dev/benchmarks/synthetic_dump.py --scale medium --multistream
+
+With --multistream the dump is written like
+`jawiki-latest-pages-articles-multistream.xml.bz2`: concatenated bz2 streams
+of PAGES_PER_STREAM pages, plus an `offset:page_id:title` index file.
+"""
+
+import bz2
+import hashlib
+import json
+import math
+import os
+import random
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+# ========== Constants ==========
+XML_NAMESPACE = "http://www.mediawiki.org/xml/export-0.11/"
+NAMESPACES = {
+    -2: "メディア",
+    -1: "特別",
+    0: "",
+    1: "ノート",
+    2: "利用者",
+    4: "Wikipedia",
+    6: "ファイル",
+    10: "Template",
+    12: "Help",
+    14: "Category",
+    100: "Portal",
+    102: "プロジェクト",
+}
+
+# Page count presets for --scale
+SCALES = {"tiny": 1_000, "small": 20_000, "medium": 200_000, "large": 2_000_000}
+
+# Share of each page kind (articles take the rest)
+REDIRECT_RATIO = 0.3
+CATEGORY_RATIO = 0.08
+SKIPPED_RATIO = 0.04
+
+# Article length in characters: log-normal, median ~2,500 characters
+# (~7 KB of UTF-8 wikitext), clipped to jawiki's practical range
+LENGTH_MEDIAN = 2_500
+LENGTH_SIGMA = 1.1
+LENGTH_MIN = 120
+LENGTH_MAX = 200_000
+
+# Pages per bz2 stream in a multistream dump (as on dumps.wikimedia.org)
+PAGES_PER_STREAM = 100
+
+BASE_TIMESTAMP = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# ========== Vocabulary ==========
+NOUNS = (
+    "日本 東京 大阪 京都 北海道 九州 政治 経済 文化 歴史 科学 技術 鉄道 駅 路線 "
+    "大学 研究 学校 教育 音楽 映画 小説 漫画 作品 作家 俳優 歌手 選手 野球 "
+    "サッカー 大会 企業 会社 製品 番組 放送 地域 都市 人口 面積 河川 山 島 "
+    "寺院 神社 城 戦争 時代 江戸 明治 昭和 平成 令和 国家 政府 議会 選挙 "
+    "法律 言語 宗教 哲学 数学 物理学 化学 生物 植物 動物 気候 自然 建築 "
+    "道路 空港 港 橋 公園 施設 病院 図書館 博物館 美術館 新聞 雑誌 記録"
+).split()
+VERBS = (
+    "設立された 建設された 発表された 開始された 放送された 発売された "
+    "開業した 誕生した 移転した 統合された 廃止された 指定された 知られる "
+    "構成される 位置する 所属する 活動している 運営されている"
+).split()
+ADJECTIVES = (
+    "大きな 主要な 有名な 独自の 歴史的な 代表的な 新たな 最初の 重要な 地方の".split()
+)
+SECTIONS = "概要 歴史 特徴 構成 作品 人物 経歴 評価 地理 交通 施設 脚注 関連項目 外部リンク".split()
+INFOBOXES = (
+    "Infobox 人物",
+    "Infobox 鉄道駅",
+    "Infobox 日本の市町村",
+    "Infobox 企業",
+    "Infobox 作品",
+)
+SURNAMES = "佐藤 鈴木 高橋 田中 伊藤 渡辺 山本 中村 小林 加藤 吉田 山田".split()
+
+
+class DumpGenerator:
+    """
+    Builds the pages of one synthetic dump.
+
+    Titles are drawn up front so redirects, links and categories can point at
+    pages that exist, like in a real dump.
+    """
+
+    def __init__(self, pages: int, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.pages = pages
+        counts = {
+            "redirect": int(pages * REDIRECT_RATIO),
+            "category": max(1, int(pages * CATEGORY_RATIO)),
+            "skipped": int(pages * SKIPPED_RATIO),
+        }
+        counts["article"] = max(1, pages - sum(counts.values()))
+        self.counts = counts
+
+        self.article_titles = self._unique_titles(
+            counts["article"], self._article_title
+        )
+        self.category_titles = self._unique_titles(
+            counts["category"],
+            lambda: self._word() + self.rng.choice(("の一覧", "史", "")),
+        )
+        kinds = (
+            ["article"] * counts["article"]
+            + ["redirect"] * counts["redirect"]
+            + ["category"] * counts["category"]
+            + ["skipped"] * counts["skipped"]
+        )
+        self.rng.shuffle(kinds)
+        self.kinds = kinds
+
+    # ========== Words ==========
+    def _word(self) -> str:
+        return self.rng.choice(NOUNS)
+
+    def _article_title(self) -> str:
+        pattern = self.rng.random()
+        if pattern < 0.3:
+            return self.rng.choice(SURNAMES) + self._word()
+        if pattern < 0.6:
+            return f"{self._word()}{self._word()}"
+        if pattern < 0.8:
+            return f"{self._word()} ({self._word()})"
+        return f"{self._word()}{self.rng.randint(1, 2024)}"
+
+    def _unique_titles(self, count: int, make) -> List[str]:
+        titles: Dict[str, None] = {}
+        while len(titles) < count:
+            title = make()
+            if title in titles:
+                title = f"{title} ({len(titles)})"
+            titles[title] = None
+        return list(titles)
+
+    def _sentence(self) -> str:
+        rng = self.rng
+        subject = (
+            rng.choice(self.article_titles) if rng.random() < 0.3 else self._word()
+        )
+        if rng.random() < 0.35:
+            subject = f"[[{subject}]]"
+        sentence = (
+            f"{subject}は{rng.choice(ADJECTIVES)}{self._word()}の{self._word()}として"
+            f"{rng.randint(1868, 2024)}年に{rng.choice(VERBS)}"
+        )
+        if rng.random() < 0.2:
+            sentence += (
+                f"<ref>{self._word()}{self._word()}、{rng.randint(1, 400)}頁。</ref>"
+            )
+        return sentence + "。"
+
+    def _paragraph(self, length: int) -> str:
+        sentences = []
+        size = 0
+        while size < length:
+            sentence = self._sentence()
+            sentences.append(sentence)
+            size += len(sentence)
+        return "".join(sentences)
+
+    # ========== Pages ==========
+    def article_text(self, title: str) -> str:
+        rng = self.rng
+        length = int(rng.lognormvariate(math.log(LENGTH_MEDIAN), LENGTH_SIGMA))
+        length = min(max(length, LENGTH_MIN), LENGTH_MAX)
+
+        parts = [
+            f"{{{{{rng.choice(INFOBOXES)}\n| 名称 = {title}\n"
+            f"| 設立 = {rng.randint(1868, 2024)}年\n| 所在地 = {self._word()}\n}}}}",
+            f"'''{title}'''は、{self._paragraph(min(length // 5, 400))}",
+        ]
+        size = sum(len(part) for part in parts)
+        while size < length:
+            section = rng.choice(SECTIONS[:-3])
+            body = self._paragraph(min(length - size, rng.randint(300, 3000)))
+            if rng.random() < 0.3:
+                body += "\n" + "\n".join(f"* {self._sentence()}" for _ in range(3))
+            parts.append(f"== {section} ==\n{body}")
+            size += len(body)
+        if length > 5_000:
+            rows = "\n".join(
+                f"|-\n| {year} || {self._word()} || {rng.randint(1, 999)}"
+                for year in range(2000, 2000 + rng.randint(3, 12))
+            )
+            parts.append(f'{{| class="wikitable"\n! 年 !! 内容 !! 数\n{rows}\n|}}')
+        parts.append("== 脚注 ==\n{{Reflist}}")
+        parts.append(
+            "== 関連項目 ==\n"
+            + "\n".join(
+                f"* [[{rng.choice(self.article_titles)}]]"
+                for _ in range(rng.randint(1, 5))
+            )
+        )
+        categories = rng.sample(
+            self.category_titles, k=min(len(self.category_titles), 3)
+        )
+        parts.append("\n".join(f"[[Category:{category}]]" for category in categories))
+        return "\n\n".join(parts)
+
+    def page_specs(self) -> Iterator[Tuple[int, str, int, Optional[str], str]]:
+        """(page id, title, namespace, redirect target, wikitext) in dump order"""
+        rng = self.rng
+        articles = iter(self.article_titles)
+        categories = iter(self.category_titles)
+        page_id = 1
+        for index, kind in enumerate(self.kinds):
+            # Page ids grow with gaps, like deleted pages leave in a real dump
+            page_id += rng.choice((1, 1, 1, 2, 5))
+            if kind == "article":
+                title = next(articles)
+                yield page_id, title, 0, None, self.article_text(title)
+            elif kind == "redirect":
+                target = rng.choice(self.article_titles)
+                keyword = rng.choice(("#REDIRECT", "#転送"))
+                title = f"{target}の別名{index}"
+                yield page_id, title, 0, target, f"{keyword} [[{target}]]"
+            elif kind == "category":
+                name = next(categories)
+                parents = rng.sample(
+                    self.category_titles, k=min(len(self.category_titles), 2)
+                )
+                text = f"{self._sentence()}\n" + "\n".join(
+                    f"[[Category:{parent}]]" for parent in parents if parent != name
+                )
+                yield page_id, f"Category:{name}", 14, None, text
+            else:
+                namespace = rng.choice((4, 10))
+                prefix = NAMESPACES[namespace]
+                yield page_id, f"{prefix}:{self._word()}{index}", namespace, None, self._paragraph(
+                    200
+                )
+
+
+# ========== XML ==========
+def siteinfo_xml() -> str:
+    namespaces = "\n".join(
+        (
+            f'      <namespace key="{key}" case="first-letter" />'
+            if not name
+            else f'      <namespace key="{key}" case="first-letter">{escape(name)}</namespace>'
+        )
+        for key, name in NAMESPACES.items()
+    )
+    return (
+        f'<mediawiki xmlns="{XML_NAMESPACE}" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        f'xsi:schemaLocation="{XML_NAMESPACE} http://www.mediawiki.org/xml/export-0.11.xsd" '
+        'version="0.11" xml:lang="ja">\n'
+        "  <siteinfo>\n"
+        "    <sitename>Wikipedia</sitename>\n"
+        "    <dbname>jawiki</dbname>\n"
+        "    <base>https://ja.wikipedia.org/wiki/</base>\n"
+        "    <generator>MediaWiki 1.42.0-wmf.1</generator>\n"
+        "    <case>first-letter</case>\n"
+        "    <namespaces>\n"
+        f"{namespaces}\n"
+        "    </namespaces>\n"
+        "  </siteinfo>\n"
+    )
+
+
+def _base36(digest: str) -> str:
+    number = int(digest, 16)
+    chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while number:
+        number, remainder = divmod(number, 36)
+        out = chars[remainder] + out
+    return out.rjust(31, "0")
+
+
+def page_xml(
+    page_id: int, title: str, namespace: int, redirect: Optional[str], text: str
+) -> str:
+    timestamp = BASE_TIMESTAMP - timedelta(seconds=page_id * 97 % 300_000_000)
+    redirect_xml = f"    <redirect title={quoteattr(redirect)} />\n" if redirect else ""
+    sha1 = _base36(hashlib.sha1(text.encode("utf-8")).hexdigest())
+    return (
+        "  <page>\n"
+        f"    <title>{escape(title)}</title>\n"
+        f"    <ns>{namespace}</ns>\n"
+        f"    <id>{page_id}</id>\n"
+        f"{redirect_xml}"
+        "    <revision>\n"
+        f"      <id>{page_id * 10 + 7}</id>\n"
+        f"      <parentid>{page_id * 10 + 3}</parentid>\n"
+        f"      <timestamp>{timestamp:%Y-%m-%dT%H:%M:%SZ}</timestamp>\n"
+        "      <contributor>\n"
+        f"        <username>Bot{page_id % 50}</username>\n"
+        f"        <id>{page_id % 50 + 1}</id>\n"
+        "      </contributor>\n"
+        "      <model>wikitext</model>\n"
+        "      <format>text/x-wiki</format>\n"
+        f'      <text bytes="{len(text.encode("utf-8"))}" xml:space="preserve">'
+        f"{escape(text)}</text>\n"
+        f"      <sha1>{sha1}</sha1>\n"
+        "    </revision>\n"
+        "  </page>\n"
+    )
+
+
+# ========== Writer ==========
+def index_path(output: str) -> str:
+    """Index file next to a multistream dump (dumps.wikimedia.org naming)"""
+    base = output.removesuffix(".bz2").removesuffix(".xml")
+    return f"{base}-index.txt.bz2"
+
+
+def generate_dump(
+    output: str, pages: int, seed: int = 0, multistream: bool = False
+) -> Dict[str, int]:
+    """
+    Writes a synthetic dump of `pages` pages to `output` (bz2).
+
+    Returns:
+        Dict[str, int]: Pages written per kind, plus the uncompressed and
+            compressed sizes (the parser's expected counts for a benchmark)
+    """
+    generator = DumpGenerator(pages, seed)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    uncompressed = 0
+    if multistream:
+        index_lines = []
+        with open(output, "wb") as f_out:
+            header = siteinfo_xml().encode("utf-8")
+            uncompressed += len(header)
+            f_out.write(bz2.compress(header))
+
+            chunk = []
+            for spec in generator.page_specs():
+                chunk.append(spec)
+                if len(chunk) == PAGES_PER_STREAM:
+                    uncompressed += _write_stream(f_out, chunk, index_lines)
+                    chunk = []
+            if chunk:
+                uncompressed += _write_stream(f_out, chunk, index_lines)
+
+            footer = b"</mediawiki>\n"
+            uncompressed += len(footer)
+            f_out.write(bz2.compress(footer))
+        with bz2.open(index_path(output), "wt", encoding="utf-8") as f_index:
+            f_index.writelines(index_lines)
+    else:
+        with bz2.open(output, "wt", encoding="utf-8") as f_out:
+            for part in _xml_parts(generator.page_specs()):
+                uncompressed += len(part.encode("utf-8"))
+                f_out.write(part)
+
+    return {
+        "articles": generator.counts["article"],
+        "redirects": generator.counts["redirect"],
+        "category_pages": generator.counts["category"],
+        "skipped_pages": generator.counts["skipped"],
+        "uncompressed_bytes": uncompressed,
+        "compressed_bytes": os.path.getsize(output),
+    }
+
+
+def _xml_parts(specs) -> Iterator[str]:
+    yield siteinfo_xml()
+    for spec in specs:
+        yield page_xml(*spec)
+    yield "</mediawiki>\n"
+
+
+def _write_stream(f_out, chunk, index_lines: list) -> int:
+    """Writes one bz2 stream of pages and their index lines"""
+    offset = f_out.tell()
+    data = "".join(page_xml(*spec) for spec in chunk).encode("utf-8")
+    f_out.write(bz2.compress(data))
+    index_lines.extend(f"{offset}:{spec[0]}:{spec[1]}\n" for spec in chunk)
+    return len(data)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Generate a synthetic jawiki-like dump")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--pages", type=int, help="Number of pages (all kinds)")
+    size.add_argument("--scale", choices=SCALES.keys(), default="tiny")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--multistream", action="store_true")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Output path (default: data/bench/synthetic-<pages>.xml.bz2)",
+    )
+    args = parser.parse_args()
+
+    pages = args.pages or SCALES[args.scale]
+    suffix = "-multistream" if args.multistream else ""
+    output = args.output or os.path.join(
+        "data/bench", f"synthetic-{pages}{suffix}.xml.bz2"
+    )
+    counts = generate_dump(output, pages, seed=args.seed, multistream=args.multistream)
+    print(json.dumps({"output": output, **counts}, indent=2))
@@ -0,0 +1,132 @@
+"""
+Local stand-in for Dify's streaming chat-messages API.
+
+Streams a canned answer as `message` events followed by `message_end`,
+with configurable latency and failures to exercise the API's Dify client
+(timeouts, retries, circuit breaker) without a Dify instance. Chunks stand
+for LLM tokens: --tokens-per-second sets the generation rate and --jitter
+varies the delays per request, as a model under load would.
+
+Usage (from the project root):
+    python dev/mock_dify.py --port 5010 --first-chunk-delay 0.5 --fail-rate 0.2
+    python dev/mock_dify.py --chunks 200 --tokens-per-second 40 --jitter 0.3
+    DIFY_API_URL=http://localhost:5010/v1 uvicorn backend.app.main:app
+"""
+
+import asyncio
+import json
+import random
+import uuid
+from argparse import ArgumentParser
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Mock Dify")
+
+settings = {
+    "chunks": 20,
+    "first_chunk_delay": 0.3,
+    "chunk_delay": 0.05,
+    # Log-normal sigma applied to the delays of each request (0: fixed)
+    "jitter": 0.0,
+    "fail_rate": 0.0,
+    "hang_rate": 0.0,
+}
+
+
+def _sse(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _jittered(delay: float) -> float:
+    if not settings["jitter"]:
+        return delay
+    return delay * random.lognormvariate(0.0, settings["jitter"])
+
+
+async def _answer_stream(query: str, conversation_id: str):
+    message_id = str(uuid.uuid4())
+    await asyncio.sleep(_jittered(settings["first_chunk_delay"]))
+    # One rate per answer: a slow request stays slow throughout
+    chunk_delay = _jittered(settings["chunk_delay"])
+
+    for i in range(settings["chunks"]):
+        if i:
+            await asyncio.sleep(chunk_delay)
+        yield _sse(
+            {
+                "event": "message",
+                "message_id": message_id,
+                "conversation_id": conversation_id,
+                "answer": f"[{i}] {query} ",
+            }
+        )
+
+    yield _sse(
+        {
+            "event": "message_end",
+            "message_id": message_id,
+            "conversation_id": conversation_id,
+        }
+    )
+
+
+@app.post("/v1/chat-messages")
+async def chat_messages(request: Request):
+    payload = await request.json()
+
+    if random.random() < settings["hang_rate"]:
+        # Accept the request but never answer (client read timeout)
+        await asyncio.sleep(3600)
+    if random.random() < settings["fail_rate"]:
+        return JSONResponse(status_code=503, content={"message": "mock failure"})
+
+    conversation_id = payload.get("conversation_id") or str(uuid.uuid4())
+    return StreamingResponse(
+        _answer_stream(payload.get("query", ""), conversation_id),
+        media_type="text/event-stream",
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5010)
+    parser.add_argument("--chunks", type=int, default=settings["chunks"])
+    parser.add_argument(
+        "--first-chunk-delay", type=float, default=settings["first_chunk_delay"]
+    )
+    parser.add_argument("--chunk-delay", type=float, default=settings["chunk_delay"])
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=None,
+        help="Chunk rate (overrides --chunk-delay)",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Log-normal sigma of the per-request delays",
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="Share of requests answered 503"
+    )
+    parser.add_argument(
+        "--hang-rate", type=float, default=0.0, help="Share of requests never answered"
+    )
+    args = parser.parse_args()
+
+    settings.update(
+        chunks=args.chunks,
+        first_chunk_delay=args.first_chunk_delay,
+        chunk_delay=(
+            1.0 / args.tokens_per_second if args.tokens_per_second else args.chunk_delay
+        ),
+        jitter=args.jitter,
+        fail_rate=args.fail_rate,
+        hang_rate=args.hang_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
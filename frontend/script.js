@@ -3,8 +3,8 @@ const chatForm = document.getElementById('chat-form');
 const messageInput = document.getElementById('message-input');
 const chatWindow = document.getElementById('chat-window');
 
-// API endpoint for our backend
-const API_URL = 'http://localhost:8088/api/chat/';
+// API endpoint for our backend (Server-Sent Events stream of the answer)
+const API_URL = 'http://localhost:8088/api/chat/stream';
 
 // Generate a unique session ID for this chat session
 const sessionId = `session_${Date.now()}_${Math.random().toString(36).substring(2, 9)}`;
@@ -42,10 +42,18 @@ chatForm.addEventListener('submit', async (e) => {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
-        
-        // Update the loading message with the actual response
-        loadingMessageElement.textContent = data.content;
+        // Append answer chunks as they arrive
+        await readEventStream(response, (data) => {
+            if (data.event === 'message') {
+                loadingMessageElement.classList.remove('loading');
+                loadingMessageElement.textContent += data.answer;
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+            } else if (data.event === 'message_end') {
+                loadingMessageElement.textContent = data.content;
+            } else if (data.event === 'error') {
+                throw new Error(data.message);
+            }
+        });
         loadingMessageElement.classList.remove('loading');
 
     } catch (error) {
@@ -65,4 +73,27 @@ function appendMessage(text, className) {
     chatWindow.scrollTop = chatWindow.scrollHeight;
 
     return messageElement;
-}
\ No newline at end of file
+}
+
+// Read a text/event-stream response and pass each `data:` JSON payload to onEvent
+async function readEventStream(response, onEvent) {
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += value;
+        const events = buffer.split('\n\n');
+        buffer = events.pop(); // Keep the incomplete event for the next chunk
+
+        for (const event of events) {
+            for (const line of event.split('\n')) {
+                if (line.startsWith('data:')) {
+                    onEvent(JSON.parse(line.slice('data:'.length)));
+                }
+            }
+        }
+    }
+}
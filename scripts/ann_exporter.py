@@ -0,0 +1,199 @@
+"""
+Export article vectors into the memory-mapped ANN sidecar index
+read by the API (see backend/app/services/ann_index.py).
+
+By default only vectors that are not in the index yet are appended,
+so it is cheap to run after every vectorizer run. Use --rebuild to
+rewrite the index from scratch. The index is also rebuilt when any
+exported row is stale: its article is gone, or its id now belongs to
+another article (ids are reused when `articles` is recreated).
+"""
+
+import os
+import shutil
+import sys
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from logging import getLogger
+
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from tqdm import tqdm
+
+sys.path.append(os.getcwd())
+
+from backend.app.common.config_loader import load_config
+from backend.app.models import Article
+from backend.app.services.ann_index import (
+    ID_DTYPE,
+    IDS_FILE,
+    VECTOR_DTYPE,
+    VECTORS_FILE,
+    WIKI_IDS_FILE,
+    read_meta,
+    write_meta,
+)
+from scripts.common.log_setting import setup_logger
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger)
+
+# ========== Constants ==========
+BATCH_SIZE = 5000
+config = load_config().get("ann") or {}
+
+
+def stale_rows(
+    exported_ids: np.ndarray,
+    exported_wiki_ids: np.ndarray,
+    ids: np.ndarray,
+    wiki_ids: np.ndarray,
+) -> int:
+    """
+    Number of exported rows whose (id, wiki_id) is not a vectorized article
+    any more. `ids` must be sorted.
+    """
+    if not len(exported_ids):
+        return 0
+    if not len(ids):
+        return len(exported_ids)
+    positions = np.minimum(np.searchsorted(ids, exported_ids), len(ids) - 1)
+    current = (ids[positions] == exported_ids) & (
+        wiki_ids[positions] == exported_wiki_ids
+    )
+    return int(np.count_nonzero(~current))
+
+
+def main(rebuild: bool = False, index_dir: str | None = None):
+    """
+    Append vectors that are not exported yet (or everything with `rebuild`,
+    or when exported rows are stale).
+
+    Data files are only ever appended to and meta.json is replaced last,
+    so API workers reading the index concurrently always see a consistent
+    prefix of the rows.
+    """
+    index_dir = index_dir or config.get("index_dir", "./data/ann")
+
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        logger.error("Database URL is not set.")
+        sys.exit(1)
+
+    engine = create_engine(db_url)
+    SessionLocal_script = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    vectors_path = os.path.join(index_dir, VECTORS_FILE)
+    ids_path = os.path.join(index_dir, IDS_FILE)
+    wiki_ids_path = os.path.join(index_dir, WIKI_IDS_FILE)
+
+    with SessionLocal_script() as db:
+        vectorized = db.execute(
+            select(Article.id, Article.wiki_id)
+            .where(Article.content_vector.isnot(None))
+            .order_by(Article.id)
+            .execution_options(yield_per=BATCH_SIZE)
+        ).all()
+        vectorized_ids = np.array([row.id for row in vectorized], dtype=ID_DTYPE)
+        vectorized_wiki_ids = np.array(
+            [row.wiki_id for row in vectorized], dtype=ID_DTYPE
+        )
+        del vectorized
+
+        meta = read_meta(index_dir)
+        # Keeps counting across rebuilds: API workers reload on a version change
+        version = (meta["version"] + 1) if meta else 1
+        if meta and not os.path.exists(wiki_ids_path):
+            logger.info(f"Index predates {WIKI_IDS_FILE}, rebuilding it...")
+            rebuild = True
+        if meta and not rebuild:
+            stale_count = stale_rows(
+                np.fromfile(ids_path, dtype=ID_DTYPE)[: meta["count"]],
+                np.fromfile(wiki_ids_path, dtype=ID_DTYPE)[: meta["count"]],
+                vectorized_ids,
+                vectorized_wiki_ids,
+            )
+            if stale_count:
+                logger.info(
+                    f"{stale_count} exported rows belong to deleted or re-inserted "
+                    "articles, rebuilding the index..."
+                )
+                rebuild = True
+
+        if rebuild and os.path.isdir(index_dir):
+            logger.info(f"Removing existing index in {index_dir}...")
+            shutil.rmtree(index_dir)
+            meta = None
+        os.makedirs(index_dir, exist_ok=True)
+
+        exported_ids = (
+            np.fromfile(ids_path, dtype=ID_DTYPE)[: meta["count"]]
+            if meta
+            else np.empty(0, dtype=ID_DTYPE)
+        )
+        new_ids = np.setdiff1d(vectorized_ids, exported_ids, assume_unique=True)
+        logger.info(
+            f"{len(vectorized_ids)} vectorized articles, "
+            f"{len(exported_ids)} already exported, {len(new_ids)} to append."
+        )
+        if not len(new_ids):
+            return
+
+        dim = None
+        with open(vectors_path, "ab") as f_vectors, open(ids_path, "ab") as f_ids, open(
+            wiki_ids_path, "ab"
+        ) as f_wiki_ids:
+            # Drop any tail left by an interrupted run (not covered by meta)
+            f_vectors.truncate(len(exported_ids) * (meta["dim"] if meta else 0) * 4)
+            f_ids.truncate(len(exported_ids) * 8)
+            f_wiki_ids.truncate(len(exported_ids) * 8)
+
+            for start in tqdm(range(0, len(new_ids), BATCH_SIZE), desc="Exporting"):
+                batch_ids = new_ids[start : start + BATCH_SIZE].tolist()
+                rows = db.execute(
+                    select(Article.id, Article.wiki_id, Article.content_vector)
+                    .where(Article.id.in_(batch_ids))
+                    .order_by(Article.id)
+                ).all()
+
+                ids = np.array([row.id for row in rows], dtype=ID_DTYPE)
+                wiki_ids = np.array([row.wiki_id for row in rows], dtype=ID_DTYPE)
+                vectors = np.vstack([row.content_vector for row in rows]).astype(
+                    VECTOR_DTYPE
+                )
+                dim = vectors.shape[1]
+                if meta and dim != meta["dim"]:
+                    logger.error(
+                        f"Vector dimension changed ({meta['dim']} -> {dim}). "
+                        "Run with --rebuild."
+                    )
+                    sys.exit(1)
+
+                f_vectors.write(vectors.tobytes())
+                f_ids.write(ids.tobytes())
+                f_wiki_ids.write(wiki_ids.tobytes())
+
+    count = len(exported_ids) + len(new_ids)
+    write_meta(
+        index_dir,
+        {
+            "dim": dim,
+            "count": count,
+            "metric": "l2",
+            "version": version,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    logger.info(f"ANN index now holds {count} vectors ({index_dir}).")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Rewrite the index from scratch"
+    )
+    parser.add_argument("--index-dir", type=str, default=None)
+    args = parser.parse_args()
+    main(rebuild=args.rebuild, index_dir=args.index_dir)
@@ -0,0 +1,308 @@
+"""
+Near-duplicate detection of parsed articles with MinHash / LSH (`dedup` config).
+
+Reads the parser output (articles.jsonl) in one streaming pass and writes
+duplicates.jsonl: one line per article whose estimated Jaccard similarity to
+an earlier article is at least `dedup.threshold`, with the article it
+duplicates. scripts/inserter.py then skips those articles, so they are not
+embedded, indexed or returned by search, and records the mapping in
+`article_duplicates`.
+
+The first article of a group in dump order is kept as the canonical one, so
+the same pass also works inline in scripts/stream_ingest.py.
+
+Memory stays bounded for the full dump: per kept article, only its MinHash
+signature's low 8 bits (b-bit MinHash, `num_perm` bytes) and its LSH band
+keys (a numpy open-addressing table) are held; the texts are not. That is
+about 210 bytes an article with the defaults, reserved up front for
+`expected_articles` (capped at the parser's ARTICLE_LIMIT).
+"""
+
+import json
+import os
+import sys
+from logging import getLogger
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from backend.app.common.config_loader import load_config
+from scripts.common.log_setting import setup_logger
+from scripts.wiki_parser import ARTICLE_LIMIT, OUTPUT_JSONL_PATH
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger)
+
+# ========== Config ==========
+config = load_config().get("dedup") or {}
+
+# ========== Constants ==========
+INPUT_JSONL_PATH = OUTPUT_JSONL_PATH
+DUPLICATES_JSONL_PATH = os.path.join("data/raw", "duplicates.jsonl")
+# Odd 64-bit multiplier of the rolling shingle hash
+SHINGLE_PRIME = np.uint64(0x100000001B3)
+# Bits of each MinHash value kept for the similarity check
+SIGNATURE_BITS = 8
+MAX_LOAD = 0.7
+
+
+def settings() -> Dict[str, object]:
+    """`dedup` config with defaults filled in"""
+    options = {
+        "enabled": config.get("enabled", False),
+        "threshold": config.get("threshold", 0.85),
+        "num_perm": config.get("num_perm", 64),
+        "bands": config.get("bands", 8),
+        "shingle_size": config.get("shingle_size", 5),
+        "max_chars": config.get("max_chars", 20000),
+        "expected_articles": config.get("expected_articles", 1_500_000),
+        "seed": config.get("seed", 1),
+    }
+    if options["num_perm"] % options["bands"]:
+        raise ValueError("dedup.num_perm must be a multiple of dedup.bands")
+    # The parser stops at ARTICLE_LIMIT: no need to reserve for the full dump
+    if ARTICLE_LIMIT:
+        options["expected_articles"] = min(options["expected_articles"], ARTICLE_LIMIT)
+    return options
+
+
+def shingle_hashes(text: str, size: int) -> np.ndarray:
+    """Distinct 64-bit hashes of the character `size`-grams of `text`"""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return codes
+    size = min(size, len(codes))
+    count = len(codes) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    # Polynomial hash of each window, all windows at once (wraps mod 2**64)
+    for offset in range(size):
+        hashes = hashes * SHINGLE_PRIME + codes[offset : offset + count]
+    return np.unique(hashes)
+
+
+class BandTable:
+    """
+    LSH buckets: band key -> index of the first kept article with that key.
+
+    Open addressing with linear probing over two numpy arrays (12 bytes a
+    slot) instead of a dict per band, which would take ~10x the memory.
+    """
+
+    def __init__(self, capacity: int):
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.values = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+
+    def _slot(self, key: int) -> int:
+        capacity = len(self.keys)
+        slot = key % capacity
+        while True:
+            stored = int(self.keys[slot])
+            if stored == 0 or stored == key:
+                return slot
+            slot = (slot + 1) % capacity
+
+    def get(self, key: int) -> Optional[int]:
+        slot = self._slot(key)
+        return int(self.values[slot]) if self.keys[slot] else None
+
+    def add(self, key: int, value: int):
+        """Keeps the existing value if `key` is already there"""
+        slot = self._slot(key)
+        if self.keys[slot]:
+            return
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.size += 1
+        if self.size > MAX_LOAD * len(self.keys):
+            self._grow()
+
+    def _grow(self):
+        keys, values = self.keys, self.values
+        logger.info(f"Growing the LSH band table to {2 * len(keys)} slots")
+        self.keys = np.zeros(2 * len(keys), dtype=np.uint64)
+        self.values = np.zeros(2 * len(keys), dtype=np.int32)
+        for index in np.flatnonzero(keys):
+            key = int(keys[index])
+            slot = self._slot(key)
+            self.keys[slot] = key
+            self.values[slot] = values[index]
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.values.nbytes
+
+
+class Deduplicator:
+    """
+    Online near-duplicate detection: `check` each article once, in order.
+
+    MinHash over character shingles of the wikitext; `bands` LSH bands of
+    num_perm / bands rows pick candidates, whose similarity is then
+    estimated from the stored 8-bit signatures.
+    """
+
+    def __init__(self, options: Optional[Dict[str, object]] = None):
+        options = options or settings()
+        self.threshold = options["threshold"]
+        self.num_perm = options["num_perm"]
+        self.bands = options["bands"]
+        self.rows = self.num_perm // self.bands
+        self.shingle_size = options["shingle_size"]
+        self.max_chars = options["max_chars"]
+
+        rng = np.random.default_rng(options["seed"])
+        # Multiply-shift hash family: (a * x + b) >> 32 with odd a
+        self._a = rng.integers(1, 2**63, size=(self.num_perm, 1), dtype=np.uint64)
+        self._a |= np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=(self.num_perm, 1), dtype=np.uint64)
+        self._row_weights = rng.integers(1, 2**63, size=self.rows, dtype=np.uint64)
+        self._band_salts = rng.integers(1, 2**63, size=self.bands, dtype=np.uint64)
+
+        expected = options["expected_articles"]
+        self._signatures = np.zeros((expected, self.num_perm), dtype=np.uint8)
+        self._wiki_ids = np.zeros(expected, dtype=np.int64)
+        self._kept = 0
+        self._table = BandTable(int(expected * self.bands / MAX_LOAD) + 1)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature (uint32), None for texts shorter than a shingle"""
+        hashes = shingle_hashes(
+            " ".join(text[: self.max_chars].split()), self.shingle_size
+        )
+        if len(hashes) == 0:
+            return None
+        with np.errstate(over="ignore"):
+            permuted = (self._a * hashes + self._b) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            keys = (rows * self._row_weights).sum(axis=1) ^ self._band_salts
+        # 0 marks an empty slot in BandTable
+        return [int(key) or 1 for key in keys]
+
+    def similarity(self, index: int, signature: np.ndarray) -> float:
+        """Jaccard estimate from b-bit signatures, corrected for chance matches"""
+        matches = np.count_nonzero(
+            self._signatures[index] == signature.astype(np.uint8)
+        )
+        chance = 1.0 / 2**SIGNATURE_BITS
+        return float(max(0.0, (matches / self.num_perm - chance) / (1.0 - chance)))
+
+    def check(self, wiki_id: int, text: str) -> Optional[Tuple[int, float]]:
+        """
+        Returns:
+            Optional[Tuple[int, float]]: (wiki_id of the kept article, estimated
+                similarity) if the article duplicates one seen before; otherwise
+                None, and the article is kept
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        keys = self.band_keys(signature)
+        best: Optional[Tuple[int, float]] = None
+        checked = set()
+        for key in keys:
+            index = self._table.get(key)
+            if index is None or index in checked:
+                continue
+            checked.add(index)
+            similarity = self.similarity(index, signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (int(self._wiki_ids[index]), similarity)
+        if best is not None:
+            return best
+
+        self._keep(wiki_id, signature, keys)
+        return None
+
+    def _keep(self, wiki_id: int, signature: np.ndarray, keys: List[int]):
+        index = self._kept
+        if index == len(self._wiki_ids):
+            # More articles than dedup.expected_articles
+            self._signatures = np.resize(self._signatures, (2 * index, self.num_perm))
+            self._wiki_ids = np.resize(self._wiki_ids, 2 * index)
+        self._signatures[index] = signature.astype(np.uint8)
+        self._wiki_ids[index] = wiki_id
+        self._kept += 1
+        for key in keys:
+            self._table.add(key, index)
+
+    @property
+    def nbytes(self) -> int:
+        return self._signatures.nbytes + self._wiki_ids.nbytes + self._table.nbytes
+
+
+def duplicate_record(article: dict, match: Tuple[int, float]) -> dict:
+    """Line of duplicates.jsonl / row of `article_duplicates`"""
+    canonical_wiki_id, similarity = match
+    return {
+        "wiki_id": article["wiki_id"],
+        "title": article["title"],
+        "canonical_wiki_id": canonical_wiki_id,
+        "similarity": round(similarity, 4),
+    }
+
+
+def read_articles(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def main() -> Dict[str, int]:
+    """
+    Writes duplicates.jsonl for the parser output; an empty file when
+    `dedup.enabled` is false.
+
+    Returns:
+        Dict[str, int]: Number of articles read and of duplicates found
+    """
+    options = settings()
+    article_count = 0
+    duplicate_count = 0
+
+    with open(DUPLICATES_JSONL_PATH, "w", encoding="utf-8") as f_out:
+        if not options["enabled"]:
+            logger.info("Deduplication is disabled (dedup.enabled). Skipping.")
+            return {"articles": 0, "duplicates": 0}
+
+        logger.info(
+            f"Finding near-duplicates of {INPUT_JSONL_PATH} "
+            f"(threshold {options['threshold']}, {options['num_perm']} permutations, "
+            f"{options['bands']} bands)..."
+        )
+        deduplicator = Deduplicator(options)
+        try:
+            for article in read_articles(INPUT_JSONL_PATH):
+                article_count += 1
+                match = deduplicator.check(article["wiki_id"], article["content"])
+                if match is not None:
+                    record = duplicate_record(article, match)
+                    f_out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    duplicate_count += 1
+                if article_count % 100000 == 0:
+                    logger.info(
+                        f"{article_count} articles checked, {duplicate_count} duplicates"
+                    )
+        except FileNotFoundError:
+            logger.error(
+                f"Input file not found: {INPUT_JSONL_PATH}. Please run the parser script first."
+            )
+            sys.exit(1)
+
+    logger.info(
+        f"{duplicate_count} of {article_count} articles are near-duplicates "
+        f"({deduplicator.nbytes / 2**20:.0f} MB of LSH state)."
+    )
+    return {"articles": article_count, "duplicates": duplicate_count}
+
+
+if __name__ == "__main__":
+    main()
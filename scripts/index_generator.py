@@ -1,5 +1,6 @@
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 
 from sqlalchemy import text
@@ -9,28 +10,94 @@ sys.path.append(os.getcwd())
 
 from backend.app.database import SessionLocal
 from scripts.common.log_setting import setup_logger
+from scripts.partitioning import TABLE, config, list_partitions
 
 # ========== SQL Commands ==========
+# Indexes on `articles`: on a partitioned table they are built partition by
+# partition, in parallel (see build_partitioned_indexes)
+ARTICLE_INDEXES = {
+    "idx_articles_title_gin": "USING gin (title gin_trgm_ops)",
+    "idx_articles_vector": "USING hnsw (content_vector vector_l2_ops)",
+}
+
 SQL_COMMANDS = [
-    "CREATE INDEX IF NOT EXISTS idx_articles_title_gin \
-        ON articles USING gin (title gin_trgm_ops);",
-    "CREATE INDEX IF NOT EXISTS idx_articles_content_gin \
-        ON articles USING gin (content gin_trgm_ops);",
-    "CREATE INDEX IF NOT EXISTS idx_articles_vector \
-        ON articles USING hnsw (content_vector vector_l2_ops);",
+    *(
+        f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} {definition};"
+        for name, definition in ARTICLE_INDEXES.items()
+    ),
+    "CREATE INDEX IF NOT EXISTS idx_article_bodies_content_gin \
+        ON article_bodies USING gin (content gin_trgm_ops);",
+    # Also declared on the model; creates them on databases set up before they existed
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_role_created \
+        ON chat_messages (session_id, role, created_at);",
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_created_id \
+        ON chat_messages (session_id, created_at, id);",
 ]
 
+IS_ATTACHED_SQL = """
+SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = CAST(:index AS regclass))
+"""
+
 # ========== Logging Config ==========
 logger = getLogger(__name__)
 logger = setup_logger(logger=logger)
 
 
+def build_partition_index(name: str, definition: str, partition: str):
+    """Builds one index on one partition and attaches it to the parent index"""
+    index = f"{partition}_{name.removeprefix(f'idx_{TABLE}_')}"
+    with SessionLocal() as db:
+        db.execute(text("SET statement_timeout = 0;"))
+        logger.info(f"Building {index}...")
+        db.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {index} ON {partition} {definition};")
+        )
+        if not db.execute(text(IS_ATTACHED_SQL), {"index": index}).scalar():
+            db.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {index};"))
+        db.commit()
+        logger.info(f"Built {index}")
+
+
+def build_partitioned_indexes(partitions: list, workers: int):
+    """
+    Creates the `articles` indexes as invalid parent indexes (ON ONLY), then
+    builds the partition indexes with `workers` connections in parallel.
+    A parent index becomes valid once every partition's index is attached.
+    """
+    with SessionLocal() as db:
+        for name, definition in ARTICLE_INDEXES.items():
+            db.execute(
+                text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {TABLE} {definition};")
+            )
+        db.commit()
+
+    jobs = [
+        (name, definition, partition)
+        for name, definition in ARTICLE_INDEXES.items()
+        for partition in partitions
+    ]
+    logger.info(
+        f"Building {len(jobs)} partition indexes with {workers} parallel workers..."
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list(): re-raises the first failure
+        list(executor.map(lambda job: build_partition_index(*job), jobs))
+
+
 def main():
     logger.info("Creating GIN indexes (this may take a while)...")
     try:
+        with SessionLocal() as db:
+            partitions = list_partitions(db.connection())
+
+        sql_commands = SQL_COMMANDS
+        if partitions != [TABLE]:
+            build_partitioned_indexes(partitions, config.get("index_workers", 4))
+            sql_commands = SQL_COMMANDS[len(ARTICLE_INDEXES) :]
+
         with SessionLocal() as db:
             db.execute(text("SET statement_timeout = 0;"))
-            for sql_command in SQL_COMMANDS:
+            for sql_command in sql_commands:
                 db.execute(text(sql_command))
                 db.commit()
 
@@ -6,15 +6,26 @@ import json
 import os
 import sys
 from logging import getLogger
+from typing import Dict, List, Set
 
 from tqdm import tqdm
 
 sys.path.append(os.getcwd())
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session, sessionmaker
 
-from backend.app.models import Article
+from backend.app.common.config_loader import load_config
+from backend.app.common.title_normalizer import canonical_title, normalize_title
+from backend.app.common.wiki_text import summarize
+from backend.app.models import (
+    Article,
+    ArticleBody,
+    ArticleDuplicate,
+    CategoryLink,
+    Page,
+    Redirect,
+)
 from scripts.common.log_setting import setup_logger
 
 # --- Logger Setup ---
@@ -23,10 +34,179 @@ logger = setup_logger(logger=logger)
 
 # --- Constants ---
 INPUT_JSONL_PATH = os.path.join("data/raw", "articles.jsonl")
+REDIRECTS_JSONL_PATH = os.path.join("data/raw", "redirects.jsonl")
+PAGES_JSONL_PATH = os.path.join("data/raw", "pages.jsonl")
+CATEGORYLINKS_JSONL_PATH = os.path.join("data/raw", "categorylinks.jsonl")
+DUPLICATES_JSONL_PATH = os.path.join("data/raw", "duplicates.jsonl")
 BATCH_SIZE = 1000
+SUMMARY_CHARS = (load_config().get("articles") or {}).get("summary_chars", 300)
 
+# Resolve redirect target titles to wiki_id inside Postgres;
+# redirects to articles that were not inserted are dropped by the join
+INSERT_REDIRECTS_SQL = """
+INSERT INTO redirects (alias, alias_normalized, target_wiki_id)
+SELECT v.alias, v.alias_normalized, a.wiki_id
+FROM unnest(
+    CAST(:aliases AS text[]), CAST(:normalized AS text[]), CAST(:targets AS text[])
+) AS v(alias, alias_normalized, target)
+JOIN articles a ON a.title = v.target
+"""
+
+
+def delete_articles(db: Session):
+    logger.info("Deleting old article data...")
+    db.query(ArticleBody).delete()
+    num_deleted = db.query(Article).delete()
+    db.commit()
+    logger.info(f"{num_deleted} articles deleted.")
+
+
+def insert_articles(db: Session, batch: List[dict]) -> List[int]:
+    """
+    Inserts one batch of parsed articles with multi-row INSERTs: title and
+    plaintext summary into `articles`, the markup into `article_bodies`.
 
-def main():
+    Returns:
+        List[int]: `articles.id` of the new rows, in the order of `batch`
+    """
+    result = db.execute(
+        insert(Article).returning(Article.id, sort_by_parameter_order=True),
+        [
+            {
+                "wiki_id": article["wiki_id"],
+                "title": article["title"],
+                "summary": summarize(article["content"], SUMMARY_CHARS),
+            }
+            for article in batch
+        ],
+    )
+    article_ids = result.scalars().all()
+    db.execute(
+        insert(ArticleBody),
+        [
+            {"article_id": article_id, "content": article["content"]}
+            for article_id, article in zip(article_ids, batch)
+        ],
+    )
+    db.commit()
+    return article_ids
+
+
+def insert_rows(db: Session, model, path: str) -> int:
+    """
+    Replaces the rows of `model` with the parser output in `path` (JSON Lines).
+    """
+    table = model.__tablename__
+    logger.info(f"Deleting old {table} data...")
+    db.query(model).delete()
+    db.commit()
+
+    if not os.path.exists(path):
+        logger.warning(f"Input file not found: {path}. Skipping {table}.")
+        return 0
+
+    saved_count = 0
+    batch = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in tqdm(f, desc=f"Inserting {table}"):
+            batch.append(json.loads(line))
+            if len(batch) >= BATCH_SIZE:
+                db.execute(insert(model), batch)
+                db.commit()
+                saved_count += len(batch)
+                batch = []
+
+    if batch:
+        db.execute(insert(model), batch)
+        db.commit()
+        saved_count += len(batch)
+
+    logger.info(f"A total of {saved_count} {table} rows have been inserted.")
+    return saved_count
+
+
+def insert_redirects(db: Session) -> int:
+    """
+    Inserts the redirect map (alias -> target wiki_id) from the parser output.
+    """
+    logger.info("Deleting old redirect data...")
+    db.query(Redirect).delete()
+    db.commit()
+
+    if not os.path.exists(REDIRECTS_JSONL_PATH):
+        logger.warning(f"Redirects file not found: {REDIRECTS_JSONL_PATH}. Skipping.")
+        return 0
+
+    logger.info(f"Starting to insert redirects from {REDIRECTS_JSONL_PATH}...")
+    saved_count = 0
+    read_count = 0
+    batch = []
+
+    def flush():
+        nonlocal saved_count, read_count
+        result = db.execute(
+            text(INSERT_REDIRECTS_SQL),
+            {
+                "aliases": [r["alias"] for r in batch],
+                "normalized": [normalize_title(r["alias"]) for r in batch],
+                "targets": [canonical_title(r["target"]) for r in batch],
+            },
+        )
+        db.commit()
+        saved_count += result.rowcount
+        read_count += len(batch)
+        batch.clear()
+
+    with open(REDIRECTS_JSONL_PATH, "r", encoding="utf-8") as f:
+        for line in tqdm(f, desc="Inserting redirects"):
+            batch.append(json.loads(line))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+
+    if batch:
+        flush()
+
+    logger.info(f"A total of {saved_count} redirects have been inserted.")
+    if read_count > saved_count:
+        logger.info(
+            f"{read_count - saved_count} redirects were skipped: their target is not in "
+            "articles (e.g. a left-out near-duplicate)."
+        )
+    return saved_count
+
+
+def duplicate_wiki_ids() -> Set[int]:
+    """wiki_ids of the near-duplicates scripts/deduplicator.py left out"""
+    if not os.path.exists(DUPLICATES_JSONL_PATH):
+        return set()
+    with open(DUPLICATES_JSONL_PATH, "r", encoding="utf-8") as f:
+        return {json.loads(line)["wiki_id"] for line in f}
+
+
+def insert_duplicates(db: Session) -> int:
+    """
+    Records the near-duplicates left out of `articles`. Their titles are not
+    added as redirects: a near-duplicate stub is usually another entity made
+    from the same template, so its title must not find the kept article.
+    """
+    return insert_rows(db, ArticleDuplicate, DUPLICATES_JSONL_PATH)
+
+
+def insert_metadata(db: Session) -> Dict[str, int]:
+    """
+    Inserts redirects, the category graph and the near-duplicate mapping.
+    Redirects are resolved against `articles`, so this runs once all
+    articles are in.
+    """
+    return {
+        "redirects": insert_redirects(db),
+        "pages": insert_rows(db, Page, PAGES_JSONL_PATH),
+        "categorylinks": insert_rows(db, CategoryLink, CATEGORYLINKS_JSONL_PATH),
+        "duplicates": insert_duplicates(db),
+    }
+
+
+def main() -> Dict[str, int]:
     """
     Sets up the database and inserts articles from the JSONL file.
     """
@@ -38,12 +218,12 @@ def main():
 
     SessionLocal_script = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     with SessionLocal_script() as db:
-        logger.info("Deleting old article data...")
-        num_deleted = db.query(Article).delete()
-        db.commit()
-        logger.info(f"{num_deleted} articles deleted.")
+        delete_articles(db)
 
         logger.info(f"Starting to insert articles from {INPUT_JSONL_PATH}...")
+        skipped_wiki_ids = duplicate_wiki_ids()
+        if skipped_wiki_ids:
+            logger.info(f"Skipping {len(skipped_wiki_ids)} near-duplicate articles.")
         article_buffer = []
         saved_count = 0
         try:
@@ -53,24 +233,25 @@ def main():
                 f.seek(0)
 
                 for line in tqdm(f, total=total_lines, desc="Inserting articles"):
-                    data = json.loads(line)
-                    new_article = Article(**data)
-                    article_buffer.append(new_article)
+                    article = json.loads(line)
+                    if article["wiki_id"] in skipped_wiki_ids:
+                        continue
+                    article_buffer.append(article)
 
                     if len(article_buffer) >= BATCH_SIZE:
-                        db.bulk_save_objects(article_buffer)
-                        db.commit()
+                        insert_articles(db, article_buffer)
                         saved_count += len(article_buffer)
                         article_buffer = []
 
             if article_buffer:
-                db.bulk_save_objects(article_buffer)
-                db.commit()
+                insert_articles(db, article_buffer)
                 saved_count += len(article_buffer)
 
             logger.info(
                 f"Process complete. A total of {saved_count} articles have been inserted."
             )
+
+            return {"articles": saved_count, **insert_metadata(db)}
         except FileNotFoundError:
             logger.error(
                 f"Input file not found: {INPUT_JSONL_PATH}. Please run the parser script first."
@@ -0,0 +1,140 @@
+"""
+Declarative partitioning of `articles` by id (`database.partitioning`).
+
+With `strategy: hash` or `range`, scripts/setup_db.py creates `articles` as a
+partitioned table with partitions `articles_p0`, `articles_p1`, ... so that
+VACUUM, index builds (scripts/index_generator.py) and the vectorizer can work
+on partitions in parallel. Queries keep going through `articles`.
+
+Postgres only allows unique indexes that contain the partition key, so on a
+partitioned table `wiki_id` gets a plain index (the parser never emits the
+same page twice).
+"""
+
+import os
+import sys
+from logging import getLogger
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+sys.path.append(os.getcwd())
+
+from backend.app.common.config_loader import load_config
+from backend.app.models import Article
+from scripts.common.log_setting import setup_logger
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger)
+
+# ========== Config ==========
+config = (load_config().get("database") or {}).get("partitioning") or {}
+
+# ========== Constants ==========
+TABLE = Article.__tablename__
+STRATEGIES = ("none", "hash", "range")
+# pg_partitioned_table.partstrat
+STRATEGY_CODES = {"h": "hash", "r": "range", "l": "list"}
+
+PARTITIONS_SQL = """
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = CAST(:table AS regclass)
+ORDER BY c.relname
+"""
+
+STRATEGY_SQL = """
+SELECT pt.partstrat
+FROM pg_partitioned_table pt
+WHERE pt.partrelid = CAST(:table AS regclass)
+"""
+
+
+def settings() -> Dict[str, Any]:
+    """`database.partitioning` with defaults filled in"""
+    strategy = config.get("strategy", "none") or "none"
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Invalid partitioning strategy: {strategy}")
+    return {
+        "strategy": strategy,
+        "partitions": config.get("partitions", 8),
+        "range_size": config.get("range_size", 500000),
+    }
+
+
+def current_strategy(connection: Connection) -> Optional[str]:
+    """
+    Returns:
+        Optional[str]: None if `articles` does not exist, "none" if it is a
+            plain table, otherwise its partitioning strategy
+    """
+    exists = connection.execute(
+        text("SELECT to_regclass(:table)"), {"table": TABLE}
+    ).scalar()
+    if exists is None:
+        return None
+    code = connection.execute(text(STRATEGY_SQL), {"table": TABLE}).scalar()
+    return STRATEGY_CODES.get(code, code) if code else "none"
+
+
+def list_partitions(connection: Connection) -> List[str]:
+    """Partition tables of `articles`; ["articles"] if it is not partitioned"""
+    partitions = connection.execute(text(PARTITIONS_SQL), {"table": TABLE})
+    return [row[0] for row in partitions] or [TABLE]
+
+
+def partition_bounds(strategy: str, partitions: int, range_size: int) -> List[str]:
+    """FOR VALUES clauses of the partitions, in order"""
+    if strategy == "hash":
+        return [
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+            for i in range(partitions)
+        ]
+    # Serial ids start at 1; ids beyond the last range go to the default partition
+    return [
+        f"FOR VALUES FROM ({i * range_size + 1}) TO ({(i + 1) * range_size + 1})"
+        for i in range(partitions)
+    ]
+
+
+def create_partitioned_articles(connection: Connection, strategy: str):
+    """
+    Creates `articles` partitioned by id, its partitions and its indexes
+    (created on the parent, so every partition gets them).
+    """
+    options = settings()
+    table = Article.__table__
+    dialect = postgresql.dialect()
+
+    create_table = str(CreateTable(table).compile(dialect=dialect)).rstrip()
+    connection.execute(text(f"{create_table} PARTITION BY {strategy.upper()} (id)"))
+
+    bounds = partition_bounds(strategy, options["partitions"], options["range_size"])
+    for i, bound in enumerate(bounds):
+        connection.execute(
+            text(f"CREATE TABLE {TABLE}_p{i} PARTITION OF {TABLE} {bound}")
+        )
+    if strategy == "range":
+        connection.execute(
+            text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+        )
+
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        if index.unique and "id" not in index.columns:
+            # Unique indexes must contain the partition key
+            columns = ", ".join(column.name for column in index.columns)
+            connection.execute(
+                text(f"CREATE INDEX {index.name} ON {TABLE} ({columns})")
+            )
+            continue
+        connection.execute(text(str(CreateIndex(index).compile(dialect=dialect))))
+
+    logger.info(
+        f"Created {TABLE} with {len(bounds)} {strategy} partitions"
+        + (" and a default partition" if strategy == "range" else "")
+    )
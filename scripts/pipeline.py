@@ -0,0 +1,307 @@
+"""
+Dependency-aware runner for the data preparation stages (scripts/init_pipeline.py).
+
+Every completed stage leaves a manifest in `pipeline.manifest_dir`: the
+fingerprint of its inputs (input file sizes / mtimes, stage parameters and
+when its upstream stages last ran), its output row counts and timestamps.
+A stage is skipped when its fingerprint is unchanged and its outputs are
+still there; a stage that runs makes everything downstream of it stale.
+
+Stages whose dependencies are done run concurrently. A group of stages can
+also be fused into one streaming step (see `Pipeline.fuse`), which runs
+whenever all of its members are stale.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from scripts.common.log_setting import setup_logger
+from scripts.profiler import PipelineProfiler
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger)
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step.
+
+    `func` returns the stage's output row counts (or None). `verify` gets
+    the stage's last manifest and checks that its outputs still exist, for
+    outputs that are not files (e.g. tables). With `adopt_outputs`, existing
+    output files count as fresh even without a manifest (e.g. a dump that
+    was downloaded by hand).
+    """
+
+    name: str
+    func: Callable[[], Optional[Dict[str, int]]]
+    deps: Sequence[str] = ()
+    inputs: Sequence[str] = ()
+    outputs: Sequence[str] = ()
+    params: Dict[str, Any] = field(default_factory=dict)
+    verify: Optional[Callable[[Dict[str, Any]], bool]] = None
+    adopt_outputs: bool = False
+
+
+# Called by a fused step each time one of its stages completes
+CompleteFn = Callable[[str, Optional[Dict[str, int]]], None]
+
+
+@dataclass
+class FusedStages:
+    """Stages run together by `func(complete)` as one streaming step"""
+
+    names: Sequence[str]
+    func: Callable[[CompleteFn], None]
+
+
+class StageFailedError(Exception):
+    pass
+
+
+def file_stat(path: str) -> Optional[Dict[str, int]]:
+    """Size and mtime of an input file (content hashing a dump takes minutes)"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class Pipeline:
+    def __init__(self, stages: Iterable[Stage], manifest_dir: str):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"{stage.name} depends on unknown stages: {missing}")
+            self.stages[stage.name] = stage
+
+        self.manifest_dir = manifest_dir
+        self._fused: List[FusedStages] = []
+        self._events: Dict[str, threading.Event] = {}
+        self._failed: Dict[str, BaseException] = {}
+        self.profiler: Optional[PipelineProfiler] = None
+
+    def fuse(self, names: Sequence[str], func: Callable[[CompleteFn], None]):
+        unknown = [name for name in names if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages: {unknown}")
+        self._fused.append(FusedStages(names, func))
+
+    # ========== Manifests ==========
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifest_dir, f"{name}.json")
+
+    def load_manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save_manifest(self, name: str, manifest: Dict[str, Any]):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        path = self._manifest_path(name)
+        # Write-then-rename: an interrupted run never leaves a half manifest
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _fingerprint_inputs(self, stage: Stage) -> Dict[str, Any]:
+        upstream = {}
+        for dep in stage.deps:
+            manifest = self.load_manifest(dep)
+            upstream[dep] = manifest["finished_at"] if manifest else None
+
+        return {
+            "files": {path: file_stat(path) for path in stage.inputs},
+            "params": stage.params,
+            "upstream": upstream,
+        }
+
+    def fingerprint(self, stage: Stage) -> str:
+        inputs = self._fingerprint_inputs(stage)
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    # ========== Planning ==========
+    def stale_reason(self, stage: Stage) -> Optional[str]:
+        """Why `stage` has to run on its own account, None if it is fresh"""
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        manifest = self.load_manifest(stage.name)
+        if manifest is None:
+            if stage.adopt_outputs and stage.outputs and not missing:
+                return None
+            return "no manifest"
+        if manifest.get("fingerprint") != self.fingerprint(stage):
+            return "inputs changed"
+        if missing:
+            return f"missing outputs: {missing}"
+        if stage.verify is not None and not stage.verify(manifest):
+            return "outputs not found"
+        return None
+
+    def plan(self, force: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Returns:
+            Dict[str, str]: Stages to run (in dependency order) and why
+        """
+        force = set(force)
+        to_run: Dict[str, str] = {}
+        for name, stage in self.stages.items():
+            if name in force:
+                to_run[name] = "forced"
+                continue
+            stale_deps = [dep for dep in stage.deps if dep in to_run]
+            if stale_deps:
+                to_run[name] = f"upstream {stale_deps} runs"
+                continue
+            reason = self.stale_reason(stage)
+            if reason is not None:
+                to_run[name] = reason
+        return to_run
+
+    # ========== Execution ==========
+    def _complete(self, name: str, started_at: float, outputs: Optional[dict], mode):
+        stage = self.stages[name]
+        finished_at = time.time()
+        self._save_manifest(
+            name,
+            {
+                "stage": name,
+                "fingerprint": self.fingerprint(stage),
+                "inputs": self._fingerprint_inputs(stage),
+                "outputs": outputs or {},
+                "mode": mode,
+                "started_at": _isoformat(started_at),
+                "finished_at": _isoformat(finished_at),
+                "duration_seconds": round(finished_at - started_at, 3),
+            },
+        )
+        logger.info(
+            f"Completed: {name} in {finished_at - started_at:.1f}s {outputs or ''}"
+        )
+        if self.profiler is not None:
+            self.profiler.add_outputs(name, outputs)
+        self._events[name].set()
+
+    def _run_task(self, names: Sequence[str], run: Callable[[], None]):
+        """Waits for the upstream stages of `names`, then runs them"""
+        deps = {dep for name in names for dep in self.stages[name].deps} - set(names)
+        for dep in deps:
+            self._events[dep].wait()
+        failed_deps = [dep for dep in deps if dep in self._failed]
+        if failed_deps:
+            self._fail(names, StageFailedError(f"upstream {failed_deps} failed"))
+            return
+
+        # A stage interrupted halfway must not look fresh next time
+        for name in names:
+            if os.path.exists(self._manifest_path(name)):
+                os.remove(self._manifest_path(name))
+
+        profile = nullcontext()
+        if self.profiler is not None:
+            input_bytes = sum(
+                (file_stat(path) or {}).get("size", 0)
+                for name in names
+                for path in self.stages[name].inputs
+            )
+            profile = self.profiler.stage(names, input_bytes)
+
+        try:
+            with profile:
+                run()
+        except BaseException as e:
+            # SystemExit too: the stage scripts exit(1) on errors
+            logger.error(f"Error in step {', '.join(names)}: {e!r}")
+            self._fail(names, e)
+
+    def _fail(self, names: Sequence[str], error: BaseException):
+        for name in names:
+            if not self._events[name].is_set():
+                self._failed[name] = error
+                self._events[name].set()
+
+    def _run_stage(self, name: str):
+        logger.info(f"Running: {name}")
+        started_at = time.time()
+        outputs = self.stages[name].func()
+        self._complete(name, started_at, outputs, mode="standalone")
+
+    def _run_fused(self, fused: FusedStages):
+        logger.info(f"Running streamed: {' -> '.join(fused.names)}")
+        started_at = time.time()
+
+        def complete(name: str, outputs: Optional[Dict[str, int]]):
+            self._complete(name, started_at, outputs, mode="streamed")
+
+        fused.func(complete)
+        unfinished = [name for name in fused.names if not self._events[name].is_set()]
+        if unfinished:
+            raise StageFailedError(f"Streamed stages did not complete: {unfinished}")
+
+    def run(
+        self,
+        force: Iterable[str] = (),
+        streaming: bool = True,
+        dry_run: bool = False,
+        profiler: Optional[PipelineProfiler] = None,
+    ) -> Dict[str, str]:
+        """
+        Runs the stale stages (and the ones in `force`), each as soon as its
+        upstream stages are done. With a started `profiler`, each stage's
+        resource use is recorded in it.
+
+        Raises:
+            StageFailedError: A stage failed (its downstream stages are skipped)
+        """
+        to_run = self.plan(force)
+        for name in self.stages:
+            if name in to_run:
+                logger.info(f"Stage {name}: run ({to_run[name]})")
+            else:
+                logger.info(f"Stage {name}: up to date, skipping")
+        if dry_run or not to_run:
+            return to_run
+
+        self._events = {name: threading.Event() for name in self.stages}
+        self._failed = {}
+        self.profiler = profiler
+        for name in self.stages:
+            if name not in to_run:
+                self._events[name].set()
+
+        tasks = []
+        pending = set(to_run)
+        for fused in self._fused if streaming else ():
+            if set(fused.names) <= pending:
+                tasks.append((fused.names, lambda f=fused: self._run_fused(f)))
+                pending -= set(fused.names)
+        for name in to_run:
+            if name in pending:
+                tasks.append(([name], lambda n=name: self._run_stage(n)))
+
+        # One thread per task: most of them only wait for their upstream
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            for names, run in tasks:
+                executor.submit(self._run_task, names, run)
+
+        if self._failed:
+            raise StageFailedError(f"Failed stages: {sorted(self._failed)}")
+        return to_run
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
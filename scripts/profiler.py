@@ -0,0 +1,348 @@
+"""
+Per-stage profile of a pipeline run (`scripts/init_pipeline.py --profile`).
+
+For every stage (or streamed group of stages) the report records wall time,
+CPU time of its threads, peak RSS of the process while it ran, time spent
+waiting on SQL statements, output rows and input bytes per second, and
+optionally the most frequent sampled stacks. Reports are JSON, so two runs
+can be compared with:
+
+    python scripts/profiler.py compare data/profiles/old.json data/profiles/new.json
+
+Work is attributed to a stage by thread name: the pipeline runs each stage
+in a thread named "stage:<stage>", and threads started by a stage are named
+"stage:<stage>/<step>" (see scripts/stream_ingest.py).
+"""
+
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.append(os.getcwd())
+
+from scripts.common.log_setting import setup_logger
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger)
+
+# ========== Constants ==========
+THREAD_PREFIX = "stage:"
+# Stacks kept per stage in the JSON report (all of them go to the .folded file)
+TOP_STACKS = 30
+# Relative slowdown `compare` reports as a regression
+REGRESSION_THRESHOLD = 0.1
+
+# The profiler of the current run, if any
+_active: Optional["PipelineProfiler"] = None
+
+
+def stage_thread_name(label: str) -> str:
+    return f"{THREAD_PREFIX}{label}"
+
+
+def stage_of_thread(thread_name: str) -> Optional[str]:
+    if not thread_name.startswith(THREAD_PREFIX):
+        return None
+    return thread_name[len(THREAD_PREFIX) :].split("/", 1)[0]
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size in bytes (Linux), None elsewhere"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def thread_cpu() -> Iterator[None]:
+    """Adds the CPU time of the calling thread to its stage's profile"""
+    start = time.thread_time()
+    try:
+        yield
+    finally:
+        if _active is not None:
+            _active.add(
+                threading.current_thread().name,
+                cpu_seconds=time.thread_time() - start,
+            )
+
+
+class PipelineProfiler:
+    """
+    Collects the per-stage measurements of one pipeline run.
+
+    A background thread samples RSS (and stacks, with `sample_stacks`)
+    every `interval` seconds; SQL time comes from SQLAlchemy cursor events
+    on every engine in the process.
+    """
+
+    def __init__(self, sample_stacks: bool = False, interval: float = 0.01):
+        self.sample_stacks = sample_stacks
+        self.interval = interval if sample_stacks else max(interval, 0.1)
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._stage_labels: Dict[str, str] = {}
+        self._stacks: Dict[str, Counter] = defaultdict(Counter)
+        self._running: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._peak_rss = 0
+        self._started_at = 0.0
+        self._finished_at = 0.0
+        self._rusage_start = None
+
+    # ========== Lifecycle ==========
+    def start(self):
+        global _active
+        _active = self
+        self._started_at = time.time()
+        self._rusage_start = resource.getrusage(resource.RUSAGE_SELF)
+        event.listen(Engine, "before_cursor_execute", self._before_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_execute)
+        self._sampler = threading.Thread(
+            target=self._sample, name="profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self):
+        global _active
+        self._stop.set()
+        self._sampler.join()
+        event.remove(Engine, "before_cursor_execute", self._before_execute)
+        event.remove(Engine, "after_cursor_execute", self._after_execute)
+        self._finished_at = time.time()
+        _active = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ========== Measurements ==========
+    def add(self, thread_name: str, **values: float):
+        label = stage_of_thread(thread_name)
+        if label is None:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(label, {})
+            for key, value in values.items():
+                stats[key] = stats.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, names: Sequence[str], input_bytes: int = 0) -> Iterator[None]:
+        """Profiles the stages `names`, run by the calling thread"""
+        label = "+".join(names)
+        threading.current_thread().name = stage_thread_name(label)
+        with self._lock:
+            self._stats.setdefault(label, {})
+            self._stage_labels.update({name: label for name in names})
+            self._running.add(label)
+
+        started_at = time.perf_counter()
+        try:
+            with thread_cpu():
+                yield
+        finally:
+            with self._lock:
+                self._running.discard(label)
+                self._stats[label].update(
+                    stages=list(names),
+                    wall_seconds=time.perf_counter() - started_at,
+                    input_bytes=input_bytes,
+                )
+
+    def add_outputs(self, name: str, outputs: Optional[Dict[str, int]]):
+        with self._lock:
+            label = self._stage_labels.get(name, name)
+            self._stats.setdefault(label, {}).setdefault("rows", {})[name] = (
+                outputs or {}
+            )
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("profiler_query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, many):
+        started = conn.info.get("profiler_query_start")
+        if not started:
+            # Statement began before the profiler was started
+            return
+        elapsed = time.perf_counter() - started.pop()
+        self.add(threading.current_thread().name, db_seconds=elapsed, db_statements=1)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None:
+                with self._lock:
+                    self._peak_rss = max(self._peak_rss, rss)
+                    for label in self._running:
+                        stats = self._stats[label]
+                        stats["peak_rss_bytes"] = max(
+                            stats.get("peak_rss_bytes", 0), rss
+                        )
+
+            if self.sample_stacks:
+                self._sample_stacks()
+
+    def _sample_stacks(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            label = stage_of_thread(names.get(ident, ""))
+            if label is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            # Folded format (flamegraph.pl / speedscope): root first
+            self._stacks[label][";".join(reversed(stack))] += 1
+
+    # ========== Report ==========
+    def report(self) -> Dict[str, Any]:
+        stages = {}
+        for label, stats in self._stats.items():
+            wall = stats.get("wall_seconds", 0.0)
+            rows = sum(
+                value
+                for outputs in stats.get("rows", {}).values()
+                for value in outputs.values()
+                if isinstance(value, (int, float))
+            )
+            cpu = stats.get("cpu_seconds", 0.0)
+            db = stats.get("db_seconds", 0.0)
+            stages[label] = {
+                "stages": stats.get("stages", [label]),
+                "wall_seconds": round(wall, 3),
+                # Summed over the stage's threads: can exceed wall time
+                "cpu_seconds": round(cpu, 3),
+                "db_seconds": round(db, 3),
+                "db_statements": stats.get("db_statements", 0),
+                # Share of the threads' busy time spent waiting on SQL
+                "db_fraction": round(db / (cpu + db), 3) if cpu + db else None,
+                "peak_rss_mb": _mb(stats.get("peak_rss_bytes")),
+                "rows": stats.get("rows", {}),
+                "rows_per_second": round(rows / wall, 1) if wall else None,
+                "input_bytes": stats.get("input_bytes", 0),
+                "bytes_per_second": (
+                    round(stats.get("input_bytes", 0) / wall, 1) if wall else None
+                ),
+            }
+            if self.sample_stacks:
+                stages[label]["top_stacks"] = [
+                    {"stack": stack, "samples": count}
+                    for stack, count in self._stacks[label].most_common(TOP_STACKS)
+                ]
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            "started_at": _isoformat(self._started_at),
+            "finished_at": _isoformat(self._finished_at or time.time()),
+            "wall_seconds": round(
+                (self._finished_at or time.time()) - self._started_at, 3
+            ),
+            "cpu_seconds": round(
+                usage.ru_utime
+                + usage.ru_stime
+                - self._rusage_start.ru_utime
+                - self._rusage_start.ru_stime,
+                3,
+            ),
+            "peak_rss_mb": _mb(self._peak_rss),
+            "host": {
+                "hostname": platform.node(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+            },
+            "argv": sys.argv,
+            "stack_sample_interval": self.interval if self.sample_stacks else None,
+            "stages": stages,
+        }
+
+    def write(self, path: str) -> Dict[str, Any]:
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        if self.sample_stacks:
+            folded_path = f"{os.path.splitext(path)[0]}.folded"
+            with open(folded_path, "w", encoding="utf-8") as f:
+                for label, stacks in self._stacks.items():
+                    for stack, count in stacks.items():
+                        f.write(f"{label};{stack} {count}\n")
+            logger.info(f"Sampled stacks written to {folded_path}")
+
+        logger.info(f"Profile written to {path}")
+        for label, stats in report["stages"].items():
+            logger.info(
+                f"{label}: {stats['wall_seconds']:.1f}s wall, "
+                f"{stats['cpu_seconds']:.1f}s CPU, {stats['db_seconds']:.1f}s SQL, "
+                f"peak RSS {stats['peak_rss_mb']} MB, "
+                f"{stats['rows_per_second']} rows/s"
+            )
+        return report
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return round(value / 2**20, 1) if value else None
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+# ========== Comparison ==========
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """
+    Returns:
+        List[str]: Stages whose wall time grew by more than REGRESSION_THRESHOLD
+    """
+    regressions = []
+    for label in sorted(set(old["stages"]) | set(new["stages"])):
+        before = old["stages"].get(label, {}).get("wall_seconds")
+        after = new["stages"].get(label, {}).get("wall_seconds")
+        if before is None or after is None:
+            print(f"{label:40} {before!s:>10} -> {after!s:>10}")
+            continue
+        change = (after - before) / before if before else 0.0
+        marker = ""
+        if change > REGRESSION_THRESHOLD:
+            regressions.append(label)
+            marker = "  REGRESSION"
+        print(f"{label:40} {before:>9.1f}s -> {after:>9.1f}s {change:+8.1%}{marker}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compare two pipeline profile reports")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    args = parser.parse_args()
+
+    with open(args.old, "r", encoding="utf-8") as f_old, open(
+        args.new, "r", encoding="utf-8"
+    ) as f_new:
+        regressions = compare(json.load(f_old), json.load(f_new))
+    # Non-zero exit status for CI when a stage got slower
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,190 @@
+"""
+Fits the projection of article vectors (`embedding.projection` config,
+backend/app/common/vector_projection.py) and prepares `articles` for it.
+
+pca is fitted on the model vectors of `sample_size` random articles;
+truncate needs no fitting. Either way a new version is stored in
+`vector_projections`, `articles.content_vector` is resized to the new
+dimension and the existing vectors are cleared: scripts/vectorizer.py
+then encodes the articles again with the new version. The HNSW index and
+the ANN sidecar are dropped too, since they hold the old vectors;
+scripts/index_generator.py and the vectorizer rebuild them.
+
+scripts/stream_ingest.py fits pca inline instead, on the vectors of the
+first `sample_size` articles of the dump.
+"""
+
+import os
+import shutil
+import sys
+from logging import getLogger
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.append(os.getcwd())
+
+from backend.app.common.config_loader import load_config
+from backend.app.common.vector_projection import MODEL_DIM, Projection, settings
+from backend.app.models import VectorProjection
+from scripts.common.log_setting import setup_logger
+from scripts.partitioning import TABLE
+
+# ========== Logging Config ==========
+logger = getLogger(__name__)
+logger = setup_logger(logger=logger)
+
+# ========== Constants ==========
+VECTOR_INDEX = "idx_articles_vector"
+FETCH_SIZE = 1000
+
+# pgvector stores the dimension as the column's type modifier
+VECTOR_DIM_SQL = f"""
+SELECT atttypmod FROM pg_attribute
+WHERE attrelid = CAST('{TABLE}' AS regclass) AND attname = 'content_vector'
+"""
+
+
+def sample_vectors(db: Session, model, size: int) -> np.ndarray:
+    """Model vectors of up to `size` random articles"""
+    from scripts import vectorizer
+
+    article_ids = db.scalars(
+        text("SELECT article_id FROM article_bodies ORDER BY random() LIMIT :size"),
+        {"size": size},
+    ).all()
+    logger.info(f"Encoding {len(article_ids)} sampled articles...")
+    vectors: List[np.ndarray] = []
+    for start in range(0, len(article_ids), FETCH_SIZE):
+        contents = db.scalars(
+            text("SELECT content FROM article_bodies WHERE article_id = ANY(:ids)"),
+            {"ids": article_ids[start : start + FETCH_SIZE]},
+        ).all()
+        vectors.append(vectorizer.encode(model, contents))
+    return np.vstack(vectors) if vectors else np.empty((0, MODEL_DIM), np.float32)
+
+
+def store(db: Session, projection: Projection) -> Projection:
+    """Adds `projection` as the newest version; the caller commits"""
+    projection.version = db.execute(
+        insert(VectorProjection)
+        .values(**projection.to_row())
+        .returning(VectorProjection.version)
+    ).scalar_one()
+    return projection
+
+
+def remove_ann_sidecar():
+    ann_config = load_config().get("ann") or {}
+    index_dir = ann_config.get("index_dir", "./data/ann")
+    if ann_config.get("enabled", False) and os.path.isdir(index_dir):
+        logger.info(f"Removing the ANN sidecar index in {index_dir}...")
+        shutil.rmtree(index_dir)
+
+
+def resize_column(db: Session, dim: int) -> bool:
+    """
+    Changes `articles.content_vector` to `dim` dims, clearing its vectors,
+    if it has another dimension; the caller commits.
+
+    Returns:
+        bool: Whether the column was resized
+    """
+    current_dim = db.execute(text(VECTOR_DIM_SQL)).scalar()
+    if current_dim == dim:
+        return False
+    logger.info(f"Resizing {TABLE}.content_vector: {current_dim} -> {dim} dims")
+    db.execute(text(f"DROP INDEX IF EXISTS {VECTOR_INDEX}"))
+    db.execute(
+        text(
+            f"ALTER TABLE {TABLE} ALTER COLUMN content_vector "
+            f"TYPE vector({dim}) USING NULL"
+        )
+    )
+    remove_ann_sidecar()
+    return True
+
+
+def reset_vectors(db: Session, dim: int):
+    """
+    Clears `articles.content_vector` (resized to `dim` if needed), its HNSW
+    index and the ANN sidecar; the caller commits.
+    """
+    if resize_column(db, dim):
+        return
+    db.execute(text(f"DROP INDEX IF EXISTS {VECTOR_INDEX}"))
+    db.execute(text(f"UPDATE {TABLE} SET content_vector = NULL"))
+    remove_ann_sidecar()
+
+
+def fit_projection(
+    db: Session, sample: Optional[np.ndarray] = None, model=None
+) -> Projection:
+    """
+    Fits and stores a new version for the current settings; the caller
+    commits. The article vectors are left as they are.
+
+    Args:
+        sample: Model vectors to fit pca on; by default `sample_size`
+            random articles are encoded with `model`
+    """
+    options = settings()
+    if options["method"] == "pca" and sample is None:
+        if model is None:
+            from scripts import vectorizer
+
+            model = vectorizer.load_model()
+        sample = sample_vectors(db, model, options["sample_size"])
+    if sample is None:
+        sample = np.empty((0, MODEL_DIM), np.float32)
+
+    projection = store(db, Projection.fit(options["method"], options["dim"], sample))
+    if projection.explained_variance is not None:
+        logger.info(
+            f"PCA on {len(sample)} vectors keeps "
+            f"{projection.explained_variance:.1%} of the variance."
+        )
+    logger.info(
+        f"Projection version {projection.version}: {projection.method}, "
+        f"{projection.source_dim} -> {projection.dim} dims"
+    )
+    return projection
+
+
+def main() -> Dict[str, int]:
+    """
+    Fits a new version for the current settings and clears the article
+    vectors for it; with `method` none, only makes sure
+    `articles.content_vector` has the model's dimension.
+
+    Returns:
+        Dict[str, int]: Version (0 for none) and dimension of the stored vectors
+    """
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        logger.error("Database URL is not set.")
+        sys.exit(1)
+
+    engine = create_engine(db_url)
+    SessionLocal_script = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    options = settings()
+
+    with SessionLocal_script() as db:
+        if options["method"] == "none":
+            resize_column(db, MODEL_DIM)
+            db.commit()
+            logger.info("No projection (embedding.projection.method is none).")
+            outputs = {"version": 0, "dim": MODEL_DIM}
+        else:
+            projection = fit_projection(db)
+            reset_vectors(db, projection.dim)
+            db.commit()
+            outputs = {"version": projection.version, "dim": projection.dim}
+    engine.dispose()
+    return outputs
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,27 @@
 import gc
+import multiprocessing
 import os
 import sys
 from logging import getLogger
+from typing import Dict, List, Optional
 
+import numpy as np
 import torch
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.orm import Session, sessionmaker
 from tqdm import tqdm
 
 sys.path.append(os.getcwd())
 
 from sentence_transformers import SentenceTransformer
 
+from backend.app.common.config_loader import load_config
+from backend.app.common.vector_projection import Projection, active_projection
 from backend.app.models import Article
+from scripts import partitioning
+from scripts.ann_exporter import main as export_ann
 from scripts.common.log_setting import setup_logger
+from scripts.partitioning import list_partitions
 
 # from sqlalchemy.orm import Session
 
@@ -32,7 +40,118 @@ device = "cuda" if torch.cuda.is_available() else "cpu"
 
 
 # ========== Functions ==========
-def main():
+def load_model() -> SentenceTransformer:
+    logger.info(f"Using device: {device}")
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    logger.info("Model loaded.")
+    return model
+
+
+def encode(model: SentenceTransformer, contents: List[str]) -> np.ndarray:
+    vectors_tensor = model.encode(
+        contents,
+        show_progress_bar=False,
+        batch_size=32,
+        device=device,
+        convert_to_tensor=True,
+    )
+    vectors_numpy = vectors_tensor.cpu().numpy()
+    del vectors_tensor
+    # Release GPU memory
+    if device == "cuda":
+        torch.cuda.empty_cache()
+    return vectors_numpy
+
+
+def save_vectors(db: Session, article_ids: List[int], vectors: np.ndarray):
+    """Bulk UPDATE by primary key; the caller commits"""
+    db.execute(
+        update(Article),
+        [
+            {"id": article_id, "content_vector": vector}
+            for article_id, vector in zip(article_ids, vectors)
+        ],
+    )
+
+
+def vectorize_partition(
+    db: Session,
+    model: SentenceTransformer,
+    partition: str,
+    projection: Optional[Projection] = None,
+) -> int:
+    """
+    Encodes the articles of one partition (or of `articles`) that have no
+    vector yet, walking it in primary key order. The vectors are reduced
+    with `projection` (scripts/projector.py) if given.
+
+    Returns:
+        int: Number of articles vectorized
+    """
+    processed_count = 0
+    since_last_commit = 0
+    last_id = 0
+
+    with tqdm(desc=f"Vectorizing {partition}") as pbar:
+        while True:
+            rows = db.execute(
+                text(
+                    f"SELECT a.id, b.content FROM {partition} a "
+                    "JOIN article_bodies b ON b.article_id = a.id "
+                    "WHERE a.content_vector IS NULL AND a.id > :last_id "
+                    "ORDER BY a.id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+
+            article_ids = [row.id for row in rows]
+            vectors_numpy = encode(model, [row.content for row in rows])
+            if projection is not None:
+                vectors_numpy = projection.apply(vectors_numpy)
+            save_vectors(db, article_ids, vectors_numpy)
+            last_id = article_ids[-1]
+
+            since_last_commit += len(rows)
+            processed_count += len(rows)
+            pbar.update(len(rows))
+
+            # Commit every INTERVAL
+            if since_last_commit >= INTERVAL:
+                logger.info(f"Committing {since_last_commit} articles to DB...")
+                db.commit()
+                logger.info("Committed...")
+                since_last_commit = 0
+
+            del rows, vectors_numpy
+            # Force garbage collection
+            gc.collect()
+
+    if since_last_commit > 0:
+        logger.info(f"Committing final {since_last_commit} articles to DB...")
+        db.commit()
+        logger.info("Committed...")
+
+    return processed_count
+
+
+def vectorize_partitions(partitions: List[str]) -> int:
+    """Worker: loads the model once and vectorizes `partitions` one by one"""
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    SessionLocal_script = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    model = load_model()
+    processed_count = 0
+    with SessionLocal_script() as db:
+        projection = active_projection(db)
+        for partition in partitions:
+            processed_count += vectorize_partition(db, model, partition, projection)
+    engine.dispose()
+    return processed_count
+
+
+def main() -> Dict[str, int]:
     logger.info(f"Vectorize articles with model: {MODEL_NAME}")
 
     db_url = os.getenv("DATABASE_URL")
@@ -42,100 +161,37 @@ def main():
         sys.exit(1)
 
     engine = create_engine(db_url)
-    SessionLocal_script = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-    # Load model
-    logger.info(f"Using device: {device}")
-    model = SentenceTransformer(MODEL_NAME, device=device)
-    logger.info("Model loaded.")
-
-    with SessionLocal_script() as db:
-        logger.info("Processing articles in batches by primary key...")
-
-        min_id, mx_id = db.query(func.min(Article.id), func.max(Article.id)).one()
-
-        if not min_id:
+    with engine.connect() as connection:
+        if not connection.execute(
+            text("SELECT EXISTS (SELECT 1 FROM articles)")
+        ).scalar():
             logger.error("Database is empty.")
             sys.exit(1)
-
-        logger.info(f"Processing articles from ID {min_id} to {mx_id}")
-
-        total_processed_count = 0
-        since_last_commit = 0
-
-        with tqdm(total=(mx_id - min_id) + 1, desc="Vectorizing articles") as pbar:
-
-            for offset in range(0, mx_id - min_id + 1, BATCH_SIZE):
-                current_id_start = min_id + offset
-
-                articles_batch = (
-                    db.query(Article)
-                    .filter(
-                        Article.id >= current_id_start,
-                        Article.id < current_id_start + BATCH_SIZE,
-                    )
-                    .all()
-                )
-
-                if not articles_batch:
-                    pbar.update(BATCH_SIZE)
-                    continue
-
-                articles_to_process = [
-                    a for a in articles_batch if a.content_vector is None
-                ]
-
-                if not articles_to_process:
-                    pbar.update(len(articles_batch))
-                    continue
-
-                contents = [article.content for article in articles_to_process]
-
-                vectors_tensor = model.encode(
-                    contents,
-                    show_progress_bar=False,
-                    batch_size=32,
-                    device=device,
-                    convert_to_tensor=True,
-                )
-
-                vectors_numpy = vectors_tensor.cpu().numpy()
-
-                for article, vector in zip(articles_to_process, vectors_numpy):
-                    article.content_vector = vector
-
-                since_last_commit += len(articles_to_process)
-                total_processed_count += len(articles_to_process)
-                pbar.update(len(articles_batch))
-
-                # Commit every INTERVAL
-                if since_last_commit >= INTERVAL:
-                    logger.info(f"Committing {since_last_commit} articles to DB...")
-                    db.commit()
-                    logger.info("Committed...")
-                    since_last_commit = 0
-
-                del (
-                    vectors_tensor,
-                    vectors_numpy,
-                    contents,
-                    articles_to_process,
-                    articles_batch,
-                )
-                # Release GPU memory
-                if device == "cuda":
-                    torch.cuda.empty_cache()
-                # Force garbage collection
-                gc.collect()
-
-            if since_last_commit > 0:
-                logger.info(f"Committing final {since_last_commit} articles to DB...")
-                db.commit()
-                logger.info("Committed...")
-
-        logger.info(
-            f"Vectorizing completed. Total articles processed: {total_processed_count}"
-        )
+        partitions = list_partitions(connection)
+    engine.dispose()
+
+    # Partitions are dealt round-robin to worker processes, one model each
+    workers = min(partitioning.config.get("vectorize_workers", 1), len(partitions))
+    groups = [partitions[i::workers] for i in range(workers)]
+    logger.info(f"Vectorizing {len(partitions)} partition(s) with {workers} worker(s)")
+
+    if workers == 1:
+        total_processed_count = vectorize_partitions(partitions)
+    else:
+        # spawn: CUDA cannot be used in forked processes
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            total_processed_count = sum(pool.map(vectorize_partitions, groups))
+
+    logger.info(
+        f"Vectorizing completed. Total articles processed: {total_processed_count}"
+    )
+
+    # Append the new vectors to the API's ANN sidecar index
+    if (load_config().get("ann") or {}).get("enabled", False):
+        logger.info("Appending new vectors to the ANN sidecar index...")
+        export_ann()
+
+    return {"vectorized": total_processed_count}
 
 
 if __name__ == "__main__":
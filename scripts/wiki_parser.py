@@ -7,12 +7,15 @@ It can process a limited number of articles for testing purposes if ARTICLE_LIMI
 import bz2
 import json
 import os
+import re
 import sys
 import xml.etree.ElementTree as ET
 from logging import getLogger
+from typing import Callable, Dict, Optional
 
 from tqdm import tqdm
 
+from backend.app.common.title_normalizer import CATEGORY_PREFIXES, canonical_title
 from scripts.common.log_setting import setup_logger
 
 # --- Logger Setup ---
@@ -22,6 +25,10 @@ logger = setup_logger(logger=logger)
 # --- Constants ---
 XML_FILE_PATH = os.path.join("data/raw", "jawiki-latest-pages-articles.xml.bz2")
 OUTPUT_JSONL_PATH = os.path.join("data/raw", "articles.jsonl")
+REDIRECTS_JSONL_PATH = os.path.join("data/raw", "redirects.jsonl")
+PAGES_JSONL_PATH = os.path.join("data/raw", "pages.jsonl")
+CATEGORYLINKS_JSONL_PATH = os.path.join("data/raw", "categorylinks.jsonl")
+CATEGORY_NAMESPACE = 14
 XML_NAMESPACE = "{http://www.mediawiki.org/xml/export-0.11/}"
 SKIP_PREFIXES = (
     "Wikipedia:",
@@ -34,14 +41,45 @@ SKIP_PREFIXES = (
     "カテゴリ:",
 )
 
+# "#REDIRECT [[Target#Section|label]]" (jawiki also uses "#転送")
+REDIRECT_PATTERN = re.compile(
+    r"^\s*#(?:REDIRECT|転送)\s*:?\s*\[\[([^\]|#]+)", re.IGNORECASE
+)
+
+# "[[Category:Name|sort key]]" (jawiki also uses "カテゴリ")
+CATEGORY_PATTERN = re.compile(
+    r"\[\[\s*(?:Category|カテゴリ)\s*:\s*([^\]|]+)", re.IGNORECASE
+)
+
 # To process all articles, set this to None or comment it out.
 # For testing, set it to a number e.g., 50000.
 ARTICLE_LIMIT = 10000
 
 
-def main():
+def write_categorylinks(f_out, page_id: int, text: str) -> int:
+    """
+    Writes the categories a page belongs to (cl_from -> cl_to), deduplicated.
+    """
+    categories = dict.fromkeys(
+        canonical_title(m.group(1)) for m in CATEGORY_PATTERN.finditer(text)
+    )
+    categories.pop("", None)
+    for category in categories:
+        link = {"cl_from": page_id, "cl_to": category}
+        f_out.write(json.dumps(link, ensure_ascii=False) + "\n")
+    return len(categories)
+
+
+def main(on_article: Optional[Callable[[dict], None]] = None) -> Dict[str, int]:
     """
     Parses the Wikipedia XML dump and writes article data to a JSON Lines file.
+
+    Args:
+        on_article: Also called with each article as it is written, so the
+            next steps can start before the parse ends (scripts/stream_ingest.py)
+
+    Returns:
+        Dict[str, int]: Number of articles, redirects and category pages written
     """
     if ARTICLE_LIMIT:
         logger.info(f"STARTING PARSE (TEST MODE: First {ARTICLE_LIMIT} articles)")
@@ -50,12 +88,22 @@ def main():
 
     logger.info(f"Input: {XML_FILE_PATH}")
     logger.info(f"Output: {OUTPUT_JSONL_PATH}")
+    logger.info(f"Redirects: {REDIRECTS_JSONL_PATH}")
+    logger.info(f"Categories: {PAGES_JSONL_PATH}, {CATEGORYLINKS_JSONL_PATH}")
 
     article_count = 0
+    redirect_count = 0
+    category_count = 0
     try:
         with bz2.open(XML_FILE_PATH, "rt", encoding="utf-8") as f_in, open(
             OUTPUT_JSONL_PATH, "w", encoding="utf-8"
-        ) as f_out:
+        ) as f_out, open(
+            REDIRECTS_JSONL_PATH, "w", encoding="utf-8"
+        ) as f_redirects, open(
+            PAGES_JSONL_PATH, "w", encoding="utf-8"
+        ) as f_pages, open(
+            CATEGORYLINKS_JSONL_PATH, "w", encoding="utf-8"
+        ) as f_links:
 
             context = ET.iterparse(f_in, events=("end",))
 
@@ -65,6 +113,7 @@ def main():
                 if tag == "page":
                     title_elem = elem.find(f"./{XML_NAMESPACE}title")
                     id_elem = elem.find(f"./{XML_NAMESPACE}id")
+                    ns_elem = elem.find(f"./{XML_NAMESPACE}ns")
                     text_elem = elem.find(
                         f"./{XML_NAMESPACE}revision/{XML_NAMESPACE}text"
                     )
@@ -81,9 +130,41 @@ def main():
                         title = title_elem.text
                         text = text_elem.text
 
-                        if title.startswith(
-                            SKIP_PREFIXES
-                        ) or text.strip().upper().startswith("#REDIRECT"):
+                        # Category pages: keep the page and its parent categories
+                        # to build the category tree (scripts/category_builder.py)
+                        if (
+                            ns_elem is not None
+                            and ns_elem.text == str(CATEGORY_NAMESPACE)
+                        ) or title.startswith(CATEGORY_PREFIXES):
+                            page_data = {
+                                "id": int(id_elem.text),
+                                "namespace": CATEGORY_NAMESPACE,
+                                "title": title.split(":", 1)[-1],
+                            }
+                            f_pages.write(
+                                json.dumps(page_data, ensure_ascii=False) + "\n"
+                            )
+                            write_categorylinks(f_links, int(id_elem.text), text)
+                            category_count += 1
+                            elem.clear()
+                            continue
+
+                        if title.startswith(SKIP_PREFIXES):
+                            elem.clear()
+                            continue
+
+                        # Keep redirects as aliases instead of articles
+                        redirect = REDIRECT_PATTERN.match(text)
+                        if redirect or text.strip().upper().startswith("#REDIRECT"):
+                            if redirect:
+                                redirect_data = {
+                                    "alias": title,
+                                    "target": redirect.group(1).strip(),
+                                }
+                                f_redirects.write(
+                                    json.dumps(redirect_data, ensure_ascii=False) + "\n"
+                                )
+                                redirect_count += 1
                             elem.clear()
                             continue
 
@@ -93,7 +174,10 @@ def main():
                             "content": text,
                         }
                         f_out.write(json.dumps(article_data, ensure_ascii=False) + "\n")
+                        write_categorylinks(f_links, article_data["wiki_id"], text)
                         article_count += 1
+                        if on_article is not None:
+                            on_article(article_data)
 
                     elem.clear()
 
@@ -106,6 +190,14 @@ def main():
         logger.info(
             f"Parsing complete. {article_count} articles written to {OUTPUT_JSONL_PATH}"
         )
+        logger.info(f"{redirect_count} redirects written to {REDIRECTS_JSONL_PATH}")
+        logger.info(f"{category_count} category pages written to {PAGES_JSONL_PATH}")
+
+        return {
+            "articles": article_count,
+            "redirects": redirect_count,
+            "category_pages": category_count,
+        }
 
     except Exception as e:
         logger.error(f"An unexpected error occurred during parsing: {e}", exc_info=True)
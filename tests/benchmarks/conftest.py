@@ -0,0 +1,115 @@
+"""
+Fixtures of the ingest benchmarks: a synthetic dump (dev/benchmarks/synthetic_dump.py)
+and a scratch Postgres database with pgvector.
+
+Settings (environment variables):
+    BENCH_DATABASE_URL: Database the insert / vectorize benchmarks write to.
+        Its articles are DELETED. Those benchmarks are skipped when unset.
+    BENCH_PAGES: Pages in the synthetic dump (default 2000)
+    BENCH_SEED: Seed of the synthetic dump (default 0)
+    BENCH_ROUNDS: Rounds of the parse and insert benchmarks (default 3)
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "backend")]
+
+# The scripts read DATABASE_URL when they run; never fall back to the dev database
+if os.getenv("BENCH_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+
+from dev.benchmarks.synthetic_dump import generate_dump  # noqa: E402
+
+PAGES = int(os.getenv("BENCH_PAGES", "2000"))
+SEED = int(os.getenv("BENCH_SEED", "0"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "3"))
+
+PARSER_OUTPUTS = {
+    "OUTPUT_JSONL_PATH": "articles.jsonl",
+    "REDIRECTS_JSONL_PATH": "redirects.jsonl",
+    "PAGES_JSONL_PATH": "pages.jsonl",
+    "CATEGORYLINKS_JSONL_PATH": "categorylinks.jsonl",
+}
+# inserter.py names the article file INPUT_JSONL_PATH; no duplicates.jsonl is
+# written, so every article is inserted
+INSERTER_INPUTS = {
+    **PARSER_OUTPUTS,
+    "INPUT_JSONL_PATH": "articles.jsonl",
+    "DUPLICATES_JSONL_PATH": "duplicates.jsonl",
+}
+del INSERTER_INPUTS["OUTPUT_JSONL_PATH"]
+
+
+def redirect_paths(monkeypatch, module, names: dict, directory: str):
+    """Points the module-level file paths of a pipeline script at `directory`"""
+    for attribute, filename in names.items():
+        monkeypatch.setattr(module, attribute, os.path.join(directory, filename))
+
+
+@pytest.fixture(scope="session", params=[False, True], ids=["bz2", "multistream"])
+def synthetic_dump(request, tmp_path_factory):
+    """(path, expected counts) of a synthetic dump, single- and multistream"""
+    multistream = request.param
+    name = "multistream" if multistream else "single"
+    path = str(tmp_path_factory.mktemp("dump") / f"synthetic-{name}.xml.bz2")
+    counts = generate_dump(path, PAGES, seed=SEED, multistream=multistream)
+    return path, counts
+
+
+@pytest.fixture(scope="session")
+def parsed_dump(tmp_path_factory):
+    """Directory with the parser output of a (single-stream) synthetic dump"""
+    from scripts import wiki_parser
+
+    directory = str(tmp_path_factory.mktemp("parsed"))
+    dump = os.path.join(directory, "synthetic.xml.bz2")
+    generate_dump(dump, PAGES, seed=SEED)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        redirect_paths(monkeypatch, wiki_parser, PARSER_OUTPUTS, directory)
+        monkeypatch.setattr(wiki_parser, "XML_FILE_PATH", dump)
+        monkeypatch.setattr(wiki_parser, "ARTICLE_LIMIT", None)
+        wiki_parser.main()
+    return directory
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Engine of the scratch database, with the schema set up"""
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        pytest.skip("BENCH_DATABASE_URL is not set")
+
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(url)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Benchmark database is not reachable: {e}")
+
+    from scripts.setup_db import main as setup_db
+
+    setup_db(recreate_articles=True)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def record_throughput(benchmark):
+    """Stores counts and count / median seconds in the benchmark's extra_info"""
+
+    def record(**counts: int):
+        benchmark.extra_info.update(counts)
+        # None with --benchmark-disable
+        if benchmark.stats is None:
+            return
+        seconds = benchmark.stats.stats.median
+        for name, count in counts.items():
+            benchmark.extra_info[f"{name}_per_second"] = round(count / seconds, 1)
+
+    return record
@@ -0,0 +1,95 @@
+"""
+Throughput of each ingest stage on a synthetic dump.
+
+    pytest tests/benchmarks --benchmark-autosave --benchmark-storage=data/benchmarks
+    pytest tests/benchmarks --benchmark-compare --benchmark-storage=data/benchmarks
+
+pages/sec, rows/sec and vectors/sec are stored in each benchmark's extra_info.
+"""
+
+import os
+
+import pytest
+from conftest import INSERTER_INPUTS, PARSER_OUTPUTS, ROUNDS, redirect_paths
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_parse_dump(
+    benchmark, record_throughput, synthetic_dump, tmp_path, monkeypatch
+):
+    from scripts import wiki_parser
+
+    path, expected = synthetic_dump
+    redirect_paths(monkeypatch, wiki_parser, PARSER_OUTPUTS, str(tmp_path))
+    monkeypatch.setattr(wiki_parser, "XML_FILE_PATH", path)
+    monkeypatch.setattr(wiki_parser, "ARTICLE_LIMIT", None)
+
+    counts = benchmark.pedantic(wiki_parser.main, rounds=ROUNDS, iterations=1)
+
+    assert counts == {
+        "articles": expected["articles"],
+        "redirects": expected["redirects"],
+        "category_pages": expected["category_pages"],
+    }
+    record_throughput(
+        pages=sum(
+            expected[kind]
+            for kind in ("articles", "redirects", "category_pages", "skipped_pages")
+        ),
+        bytes=expected["uncompressed_bytes"],
+    )
+
+
+def test_insert(benchmark, record_throughput, database, parsed_dump, monkeypatch):
+    from scripts import inserter
+
+    redirect_paths(monkeypatch, inserter, INSERTER_INPUTS, parsed_dump)
+    with open(os.path.join(parsed_dump, "articles.jsonl"), "rb") as f:
+        expected_articles = sum(1 for _ in f)
+
+    # main() deletes the previous round's rows first
+    counts = benchmark.pedantic(inserter.main, rounds=ROUNDS, iterations=1)
+
+    assert counts["articles"] == expected_articles
+    record_throughput(rows=sum(counts.values()), articles=counts["articles"])
+
+
+@pytest.fixture(scope="module")
+def inserted(database, parsed_dump):
+    from scripts import inserter
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        redirect_paths(monkeypatch, inserter, INSERTER_INPUTS, parsed_dump)
+        return inserter.main()["articles"]
+
+
+def test_vectorize(benchmark, record_throughput, database, inserted):
+    pytest.importorskip("sentence_transformers")
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+
+    from scripts import vectorizer
+    from scripts.partitioning import list_partitions
+
+    model = vectorizer.load_model()
+    # Warm-up outside the timing (CUDA context, lazy weights)
+    vectorizer.encode(model, ["ウォームアップ"])
+
+    def reset():
+        with database.begin() as connection:
+            connection.execute(text("UPDATE articles SET content_vector = NULL"))
+
+    def vectorize() -> int:
+        with Session(database) as db:
+            partitions = list_partitions(db.connection())
+            return sum(
+                vectorizer.vectorize_partition(db, model, partition)
+                for partition in partitions
+            )
+
+    # One round: encoding dominates and barely varies between rounds
+    vectorized = benchmark.pedantic(vectorize, setup=reset, rounds=1, iterations=1)
+
+    assert vectorized == inserted
+    record_throughput(vectors=vectorized)